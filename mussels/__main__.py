@@ -35,6 +35,7 @@ limitations under the License.
 import logging
 import os
 import sys
+from typing import *
 
 import click
 import coloredlogs
@@ -213,7 +214,7 @@ def recipe_show(recipe: str, version: str, verbose: bool, all: bool):
     """
     Show details about a specific recipe.
     """
-    my_mussels = Mussels(load_all_recipes=all)
+    my_mussels = Mussels(load_all_recipes=all, lazy=True)
 
     my_mussels.show_recipe(recipe, version, verbose)
 
@@ -231,7 +232,7 @@ def recipe_clone(recipe: str, version: str, cookbook: str, dest: str):
     """
     Copy a recipe to the current directory or to a specific directory.
     """
-    my_mussels = Mussels(load_all_recipes=True)
+    my_mussels = Mussels(load_all_recipes=True, lazy=True)
 
     my_mussels.clone_recipe(recipe, version, cookbook, dest)
 
@@ -258,7 +259,7 @@ def recipe_clone(recipe: str, version: str, cookbook: str, dest: str):
     "--rebuild",
     "-r",
     is_flag=True,
-    help="Re-build a recipe, even if already built. [optional]",
+    help="Re-build every recipe, even if nothing has changed since it was last built. [optional]",
 )
 @click.option(
     "--install", "-i", default="", help="Install directory. [optional] Default is: ~/.mussels/install/<target>"
@@ -272,6 +273,26 @@ def recipe_clone(recipe: str, version: str, cookbook: str, dest: str):
 @click.option(
     "--download-dir", "-D", default="", help="Downloads directory. [optional] Default is: ~/.mussels/cache/downloads"
 )
+@click.option(
+    "--jobs", "-j", default=1, type=int, help="Number of independent recipes to build concurrently. [optional] Default is: 1"
+)
+@click.option(
+    "--fetch-jobs", default=4, type=int, help="Number of sources to download or clone concurrently, ahead of the build. [optional] Default is: 4"
+)
+@click.option(
+    "--retries", default=3, type=int, help="Number of times to retry a failed download. [optional] Default is: 3"
+)
+@click.option(
+    "--artifact-cache",
+    multiple=True,
+    help="Directory or HTTP(S) URL of a cache of built recipes. May be given more than once. [optional]",
+)
+@click.option(
+    "--compiler-cache",
+    type=click.Choice(["auto", "ccache", "sccache"]),
+    default=None,
+    help="Let build scripts use a compiler cache, through the {compiler_cache} and {cmake_launcher} variables. Use 'auto' for whichever is installed. [optional]",
+)
 def recipe_build(
     recipe: str,
     version: str,
@@ -283,6 +304,11 @@ def recipe_build(
     work_dir: str,
     log_dir: str,
     download_dir: str,
+    jobs: int,
+    fetch_jobs: int,
+    retries: int,
+    artifact_cache: tuple,
+    compiler_cache: Optional[str],
 ):
     """
     Download, extract, build, and install a recipe.
@@ -293,12 +319,16 @@ def recipe_build(
         work_dir=work_dir,
         log_dir=log_dir,
         download_dir=download_dir,
+        lazy=True,
+        download_retries=retries,
+        artifact_caches=list(artifact_cache),
+        compiler_cache=compiler_cache if compiler_cache != None else "",
     )
 
     results = []
 
     success = my_mussels.build_recipe(
-        recipe, version, cookbook, target, results, dry_run, rebuild
+        recipe, version, cookbook, target, results, dry_run, rebuild, jobs, fetch_jobs
     )
     if success == False:
         sys.exit(1)
@@ -469,7 +499,7 @@ def clean_all():
     "--rebuild",
     "-r",
     is_flag=True,
-    help="Re-build a recipe, even if already built. [optional]",
+    help="Re-build every recipe, even if nothing has changed since it was last built. [optional]",
 )
 @click.option(
     "--install", "-i", default="", help="Install directory. [optional] Default is: ~/.mussels/install/<target>"
@@ -483,6 +513,26 @@ def clean_all():
 @click.option(
     "--download-dir", "-D", default="", help="Downloads directory. [optional] Default is: ~/.mussels/cache/downloads"
 )
+@click.option(
+    "--jobs", "-j", default=1, type=int, help="Number of independent recipes to build concurrently. [optional] Default is: 1"
+)
+@click.option(
+    "--fetch-jobs", default=4, type=int, help="Number of sources to download or clone concurrently, ahead of the build. [optional] Default is: 4"
+)
+@click.option(
+    "--retries", default=3, type=int, help="Number of times to retry a failed download. [optional] Default is: 3"
+)
+@click.option(
+    "--artifact-cache",
+    multiple=True,
+    help="Directory or HTTP(S) URL of a cache of built recipes. May be given more than once. [optional]",
+)
+@click.option(
+    "--compiler-cache",
+    type=click.Choice(["auto", "ccache", "sccache"]),
+    default=None,
+    help="Let build scripts use a compiler cache, through the {compiler_cache} and {cmake_launcher} variables. Use 'auto' for whichever is installed. [optional]",
+)
 @click.pass_context
 def build_alias(
     ctx,
@@ -496,6 +546,11 @@ def build_alias(
     work_dir: str,
     log_dir: str,
     download_dir: str,
+    jobs: int,
+    fetch_jobs: int,
+    retries: int,
+    artifact_cache: tuple,
+    compiler_cache: Optional[str],
 ):
     """
     Download, extract, build, and install a recipe.
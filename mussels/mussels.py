@@ -17,16 +17,20 @@ limitations under the License.
 """
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import datetime
 import fnmatch
+import hashlib
 import json
 import logging
 import os
 import platform
 import shutil
 import sys
+import tempfile
+import threading
 import time
 from typing import *
 
@@ -45,17 +49,100 @@ import yaml
 import mussels.bookshelf
 import mussels.recipe
 import mussels.tool
+from mussels.utils.artifacts import artifact_name, open_artifact_cache, pack_artifact, unpack_artifact
+from mussels.utils.compiler_cache import COMPILER_CACHES, CompilerCache, compiler_cache_tool
+from mussels.utils.download import DEFAULT_RETRIES, create_session, is_sha256
+from mussels.utils.fileops import remove_tree
+from mussels.utils.scheduler import find_cycles, get_batches, run_graph
+from mussels.utils.solver import Unsatisfiable, requirement, solve
+from mussels.utils.tool_cache import ToolDetectionCache
 from mussels.utils.versions import (
     NVC,
     nvc_str,
     sort_cookbook_by_version,
-    version_keys,
-    get_item_version,
+    parse_version,
+    VersionResolver,
     platform_is,
     platform_matches,
     pick_platform,
 )
 
+# Bump this whenever the format of the cookbook index files changes.
+INDEX_VERSION = 1
+
+# Files modified more recently than this when indexed will be parsed again next time.
+RACY_INTERVAL_NS = 2 * 1000 * 1000 * 1000
+
+# Parse YAML files in a process pool when there are at least this many to parse.
+PARALLEL_PARSE_THRESHOLD = 200
+
+# Max number of cookbook repositories to clone or pull at once.
+UPDATE_JOBS = 8
+
+# Max number of tools to detect at once.
+DETECT_JOBS = 8
+
+# Prefer the libyaml-based loader, which is much faster than the pure-Python one.
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def read_yaml_file(fpath: str) -> dict:
+    """
+    Parse a YAML file.
+
+    This is a module-level function so it may be run in a process pool.
+
+    Returns:    A dictionary with the parsed "doc" if the file is a Mussels recipe or tool,
+                or with None if it isn't, and an "error" string if it failed to parse.
+    """
+    with open(fpath, "rb") as fd:
+        try:
+            yaml_file = yaml.load(fd, Loader=YamlLoader)
+        except Exception as exc:
+            return {"doc": None, "error": f"{exc}"}
+
+    if not isinstance(yaml_file, dict) or "mussels_version" not in yaml_file:
+        # Not a Mussels YAML file.
+        return {"doc": None}
+
+    return {"doc": yaml_file}
+
+
+class LazyItems(dict):
+    """
+    A table of sorted recipes or tools, where each item is only loaded the first time it's looked up.
+    """
+
+    def __init__(self, load_item: Callable[[str], Optional[list]]) -> None:
+        """
+        Args:
+            load_item:  Function that loads an item, and returns its sorted versions, or None if it doesn't exist.
+        """
+        super().__init__()
+        self.load_item = load_item
+        self.attempted: set = set()
+        self.lock = threading.RLock()
+
+    def _load(self, name) -> bool:
+        with self.lock:
+            if name not in self.attempted:
+                self.attempted.add(name)
+                sorted_item = self.load_item(name)
+                if sorted_item:
+                    dict.__setitem__(self, name, sorted_item)
+            return dict.__contains__(self, name)
+
+    def __missing__(self, name):
+        if self._load(name):
+            return dict.__getitem__(self, name)
+        raise KeyError(name)
+
+    def __contains__(self, name) -> bool:
+        return dict.__contains__(self, name) or self._load(name)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
 
 class Mussels:
     config: dict = {}
@@ -78,6 +165,10 @@ class Mussels:
         log_dir: str = "",
         download_dir: str = "",
         log_level: str = "DEBUG",
+        lazy: bool = False,
+        download_retries: int = DEFAULT_RETRIES,
+        artifact_caches: Optional[list] = None,
+        compiler_cache: str = "",
     ) -> None:
         """
         Mussels class.
@@ -86,6 +177,14 @@ class Mussels:
             data_dir:   path where ClamAV should be installed.
             log_file:   path output log.
             log_level:  log level ("DEBUG", "INFO", "WARNING", "ERROR").
+            lazy:       only load the recipes and tools that are actually used.
+                        Use this for commands that work with a specific recipe.
+            download_retries:   number of times to retry a failed download.
+            artifact_caches:    directories or HTTP(S) URLs of caches of built recipes.
+                                Recipes are restored from the first cache that has them,
+                                and stored in every cache after they're built.
+            compiler_cache:     compiler cache for build scripts to use: "ccache", "sccache",
+                                or "auto" for whichever is installed. Leave empty ("") for none.
         """
         if log_dir != "":
             self.log_file = os.path.join(log_dir, "mussels.log")
@@ -105,8 +204,32 @@ class Mussels:
         self.work_dir = "" if work_dir == "" else os.path.abspath(work_dir)
         self.log_dir = "" if log_dir == "" else os.path.abspath(log_dir)
         self.download_dir = "" if download_dir == "" else os.path.abspath(download_dir)
+        self.download_retries = download_retries
+
+        # All recipe downloads share one connection pool.
+        self.session = create_session()
+
+        self.artifact_caches = [
+            open_artifact_cache(location, session=self.session)
+            for location in (artifact_caches if artifact_caches != None else [])
+        ]
+
+        # The compiler cache is detected when a build starts.
+        self.compiler_cache_choice = compiler_cache
+        self.compiler_cache: Optional[CompilerCache] = None
+
+        # Tools are only detected again if something they depend on has changed.
+        self.tool_cache = ToolDetectionCache(os.path.join(self.app_data_dir, "cache", "tools.json"))
+
+        # In lazy mode, the parsed YAML for each recipe and tool waits here until it's needed.
+        self.lazy = lazy
+        self.unloaded_items: dict = {"recipe": defaultdict(list), "tool": defaultdict(list)}
+
+        # Cookbooks that this instance has read, so they needn't be read again if they haven't changed.
+        self.cookbooks_read: set = set()
 
         self._load_config("cookbooks.json", self.cookbooks)
+        self._create_version_resolvers()
         self._load_recipes(all=load_all_recipes)
 
     def _init_logging(self, level="DEBUG"):
@@ -177,196 +300,441 @@ class Mussels:
 
         return True
 
-    def load_directory(self, cookbook: str, load_path: str) -> tuple:
+    def _index_path(self, cookbook: str, load_path: str) -> str:
         """
-        Load all recipes and tools in a directory.
-        This function reads in YAML files and assigns each to a new Recipe or Tool class, accordingly.
-        The classes are returned in a tuple.
+        Get the path of the index file for a cookbook directory.
         """
-        minimum_version = "0.1"
-        recipes = defaultdict(dict)
-        tools = defaultdict(dict)
+        path_hash = hashlib.sha1(os.path.abspath(load_path).encode("utf-8")).hexdigest()
+        return os.path.join(
+            self.app_data_dir, "cache", "index", f"{cookbook}-{path_hash[:12]}.json"
+        )
 
-        if not os.path.exists(load_path):
-            return recipes, tools
+    def _load_index(self, cookbook: str, load_path: str) -> dict:
+        """
+        Load the index of previously parsed YAML files for a cookbook directory.
+        """
+        try:
+            with open(self._index_path(cookbook, load_path), "r") as index_file:
+                index = json.load(index_file)
+        except Exception:
+            # No existing index to load, that's ok. Every file will be parsed.
+            return {}
+
+        if index.get("index_version") != INDEX_VERSION:
+            return {}
+
+        return index["files"]
+
+    def _store_index(self, cookbook: str, load_path: str, files: dict) -> bool:
+        """
+        Store the index of parsed YAML files for a cookbook directory.
+        """
+        index_path = self._index_path(cookbook, load_path)
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(os.path.split(index_path)[0], exist_ok=True)
+
+            # Write to a temp file first, so a reader never sees a partial index.
+            with open(temp_path, "w") as index_file:
+                json.dump({"index_version": INDEX_VERSION, "files": files}, index_file)
+            os.replace(temp_path, index_path)
+        except Exception as exc:
+            self.logger.debug(f"Failed to update index for cookbook {cookbook}.  Exception: {exc}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        return True
+
+    def _read_yaml_file(self, fpath: str) -> dict:
+        """
+        Parse a YAML file.
+        """
+        return read_yaml_file(fpath)
+
+    def _read_directory(self, cookbook: str, load_path: str) -> list:
+        """
+        Read all YAML files in a directory.
+
+        Files are only parsed if they're new or have changed since they were last indexed.
+        The index is keyed on each file's path, modification time, and size.
+
+        Returns:    A list of (path, parsed YAML) tuples, for each Mussels YAML file.
+        """
+        index = self._load_index(cookbook, load_path)
+        now = time.time_ns()
+
+        files: dict = {}
+        stale: list = []
 
         for root, dirs, filenames in os.walk(load_path):
             for fname in filenames:
                 if not fname.endswith(".yaml"):
                     continue
                 fpath = os.path.abspath(os.path.join(root, fname))
-                with open(fpath, "r") as fd:
-                    try:
-                        yaml_file = yaml.load(fd.read(), Loader=yaml.SafeLoader)
-                    except Exception as exc:
-                        self.logger.warning(f"Failed to load YAML file: {fpath}")
-                        self.logger.warning(f"Exception occured: \n{exc}")
-                        continue
-                    if yaml_file == None:
-                        continue
 
-                    if (
-                        "mussels_version" in yaml_file
-                        and yaml_file["mussels_version"] >= minimum_version
-                    ):
-                        if not "type" in yaml_file:
-                            self.logger.warning(f"Failed to load recipe: {fpath}")
-                            self.logger.warning(f"Missing required 'type' field.")
-                            continue
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
 
-                        if (
-                            yaml_file["type"] == "recipe"
-                            or yaml_file["type"] == "collection"
+                entry = index.get(fpath)
+                if (
+                    entry == None
+                    or entry["mtime"] != st.st_mtime_ns
+                    or entry["size"] != st.st_size
+                    or entry.get("racy", False)
+                ):
+                    entry = {"mtime": st.st_mtime_ns, "size": st.st_size}
+
+                    # A file modified just now could change again without a new mtime.
+                    # Don't trust the index entry for it until next time.
+                    if now - st.st_mtime_ns < RACY_INTERVAL_NS:
+                        entry["racy"] = True
+
+                    stale.append(fpath)
+
+                files[fpath] = entry
+
+        # Parse the new and modified files.
+        parsed = False
+        if len(stale) >= PARALLEL_PARSE_THRESHOLD and (os.cpu_count() or 1) > 1:
+            self.logger.debug(f"Parsing {len(stale)} YAML files from cookbook {cookbook} in parallel...")
+            workers = os.cpu_count() or 1
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = executor.map(
+                        read_yaml_file, stale, chunksize=max(1, len(stale) // (workers * 4))
+                    )
+                    for fpath, result in zip(stale, results):
+                        files[fpath].update(result)
+                parsed = True
+            except Exception as exc:
+                self.logger.debug(f"Failed to parse YAML files in parallel, falling back to serial.  Exception: {exc}")
+
+        if not parsed:
+            for fpath in stale:
+                files[fpath].update(self._read_yaml_file(fpath))
+
+        index_changed = len(stale) > 0
+
+        yaml_files: list = []
+        for fpath, entry in files.items():
+            if "error" in entry:
+                self.logger.warning(f"Failed to load YAML file: {fpath}")
+                self.logger.warning(f"Exception occured: \n{entry['error']}")
+                continue
+
+            if entry["doc"] != None:
+                yaml_files.append((fpath, entry["doc"]))
+
+        if index_changed or len(files) != len(index):
+            self._store_index(cookbook, load_path, files)
+
+        return yaml_files
+
+    def _create_item_class(self, cookbook: str, fpath: str, yaml_file: dict) -> Optional[tuple]:
+        """
+        Create a new Recipe or Tool class from a parsed YAML file.
+
+        Returns:    A ("recipe" or "tool", class) tuple, or None if the file isn't a valid recipe or tool.
+        """
+        minimum_version = "0.1"
+
+        if (
+            "mussels_version" in yaml_file
+            and yaml_file["mussels_version"] >= minimum_version
+        ):
+            if not "type" in yaml_file:
+                self.logger.warning(f"Failed to load recipe: {fpath}")
+                self.logger.warning(f"Missing required 'type' field.")
+                return None
+
+            if (
+                yaml_file["type"] == "recipe"
+                or yaml_file["type"] == "collection"
+            ):
+                if not "name" in yaml_file:
+                    self.logger.warning(f"Failed to load recipe: {fpath}")
+                    self.logger.warning(f"Missing required 'name' field.")
+                    return None
+                name = f"{cookbook}__{yaml_file['name']}"
+
+                if not "version" in yaml_file:
+                    self.logger.warning(f"Failed to load recipe: {fpath}")
+                    self.logger.warning(
+                        f"Missing required 'version' field."
+                    )
+                    return None
+                else:
+                    name = f"{name}_{yaml_file['version']}"
+
+                recipe_class = type(
+                    name,
+                    (mussels.recipe.BaseRecipe,),
+                    {"__doc__": f"{yaml_file['name']} recipe class."},
+                )
+
+                recipe_class.module_file = fpath
+
+                recipe_class.name = yaml_file["name"]
+
+                recipe_class.version = yaml_file["version"]
+
+                if yaml_file["type"] == "collection":
+                    recipe_class.is_collection = True
+                else:
+                    recipe_class.is_collection = False
+
+                    # Check for source field with valid configuration
+                    if "source" not in yaml_file and "url" in yaml_file:
+                        source = {
+                            'uri': yaml_file['url']
+                        }
+                    elif "source" not in yaml_file:
+                        self.logger.warning(
+                            f"Failed to load recipe: {fpath}"
+                        )
+                        self.logger.warning(
+                            f"Recipe must have a 'source' or 'url' field."
+                        )
+                        return None
+                    else:
+                        source = yaml_file["source"]
+
+                    # Validate source structure
+                    has_uri = "uri" in source
+                    has_git = "git" in source
+                    has_none = "none" in source
+
+                    # Count how many source types are specified
+                    source_types = sum([has_uri, has_git, has_none])
+
+                    if source_types == 0:
+                        self.logger.warning(
+                            f"Failed to load recipe: {fpath}"
+                        )
+                        self.logger.warning(
+                            f"Source field must specify one of: 'uri', 'git', or 'none'."
+                        )
+                        return None
+                    elif source_types > 1:
+                        self.logger.warning(
+                            f"Failed to load recipe: {fpath}"
+                        )
+                        self.logger.warning(
+                            f"Source field can only specify one of: 'uri', 'git', or 'none'."
+                        )
+                        return None
+
+                    # Validate git source has tag or branch
+                    if has_git:
+                        if "tag" not in source and "branch" not in source:
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Git source must specify either 'tag' or 'branch'."
+                            )
+                            return None
+                        if "tag" in source and "branch" in source:
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Git source cannot specify both 'tag' and 'branch'."
+                            )
+                            return None
+                        if "depth" in source and (
+                            not isinstance(source["depth"], int)
+                            or isinstance(source["depth"], bool)
+                            or source["depth"] < 0
                         ):
-                            if not "name" in yaml_file:
-                                self.logger.warning(f"Failed to load recipe: {fpath}")
-                                self.logger.warning(f"Missing required 'name' field.")
-                                continue
-                            name = f"{cookbook}__{yaml_file['name']}"
-
-                            if not "version" in yaml_file:
-                                self.logger.warning(f"Failed to load recipe: {fpath}")
-                                self.logger.warning(
-                                    f"Missing required 'version' field."
-                                )
-                                continue
-                            else:
-                                name = f"{name}_{yaml_file['version']}"
-
-                            recipe_class = type(
-                                name,
-                                (mussels.recipe.BaseRecipe,),
-                                {"__doc__": f"{yaml_file['name']} recipe class."},
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Git source 'depth' must be a number of commits, or 0 for the full history."
+                            )
+                            return None
+                        if "filter" in source and not isinstance(source["filter"], str):
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Git source 'filter' must be a git filter-spec, like 'blob:none'."
                             )
+                            return None
 
-                            recipe_class.module_file = fpath
+                    # Validate the optional checksum for uri sources
+                    if "sha256" in source:
+                        if not has_uri:
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Only 'uri' sources may specify a 'sha256' checksum."
+                            )
+                            return None
+                        if not is_sha256(source["sha256"]):
+                            self.logger.warning(
+                                f"Failed to load recipe: {fpath}"
+                            )
+                            self.logger.warning(
+                                f"Source 'sha256' must be a 64 character hex SHA256 digest."
+                            )
+                            return None
 
-                            recipe_class.name = yaml_file["name"]
+                    recipe_class.source = source
 
-                            recipe_class.version = yaml_file["version"]
+                if "archive_name_change" in yaml_file:
+                    recipe_class.archive_name_change = (
+                        yaml_file["archive_name_change"][0],
+                        yaml_file["archive_name_change"][1],
+                    )
 
-                            if yaml_file["type"] == "collection":
-                                recipe_class.is_collection = True
-                            else:
-                                recipe_class.is_collection = False
+                if not "platforms" in yaml_file:
+                    self.logger.warning(f"Failed to load recipe: {fpath}")
+                    self.logger.warning(
+                        f"Missing required 'platforms' field."
+                    )
+                    return None
+                else:
+                    recipe_class.platforms = yaml_file["platforms"]
 
-                                # Check for source field with valid configuration
-                                if "source" not in yaml_file and "url" in yaml_file:
-                                    source = {
-                                        'uri': yaml_file['url']
-                                    }
-                                elif "source" not in yaml_file:
-                                    self.logger.warning(
-                                        f"Failed to load recipe: {fpath}"
-                                    )
-                                    self.logger.warning(
-                                        f"Recipe must have a 'source' or 'url' field."
-                                    )
-                                    continue
-                                else:
-                                    source = yaml_file["source"]
+                return "recipe", recipe_class
 
-                                # Validate source structure
-                                has_uri = "uri" in source
-                                has_git = "git" in source
-                                has_none = "none" in source
+            elif yaml_file["type"] == "tool":
+                if not "name" in yaml_file:
+                    self.logger.warning(f"Failed to load tool: {fpath}")
+                    self.logger.warning(f"Missing required 'name' field.")
+                    return None
+                name = f"{cookbook}__{yaml_file['name']}"
 
-                                # Count how many source types are specified
-                                source_types = sum([has_uri, has_git, has_none])
+                if "version" in yaml_file:
+                    name = f"{name}_{yaml_file['version']}"
 
-                                if source_types == 0:
-                                    self.logger.warning(
-                                        f"Failed to load recipe: {fpath}"
-                                    )
-                                    self.logger.warning(
-                                        f"Source field must specify one of: 'uri', 'git', or 'none'."
-                                    )
-                                    continue
-                                elif source_types > 1:
-                                    self.logger.warning(
-                                        f"Failed to load recipe: {fpath}"
-                                    )
-                                    self.logger.warning(
-                                        f"Source field can only specify one of: 'uri', 'git', or 'none'."
-                                    )
-                                    continue
-
-                                # Validate git source has tag or branch
-                                if has_git:
-                                    if "tag" not in source and "branch" not in source:
-                                        self.logger.warning(
-                                            f"Failed to load recipe: {fpath}"
-                                        )
-                                        self.logger.warning(
-                                            f"Git source must specify either 'tag' or 'branch'."
-                                        )
-                                        continue
-                                    if "tag" in source and "branch" in source:
-                                        self.logger.warning(
-                                            f"Failed to load recipe: {fpath}"
-                                        )
-                                        self.logger.warning(
-                                            f"Git source cannot specify both 'tag' and 'branch'."
-                                        )
-                                        continue
-
-                                recipe_class.source = source
-
-                            if "archive_name_change" in yaml_file:
-                                recipe_class.archive_name_change = (
-                                    yaml_file["archive_name_change"][0],
-                                    yaml_file["archive_name_change"][1],
-                                )
+                tool_class = type(
+                    name,
+                    (mussels.tool.BaseTool,),
+                    {"__doc__": f"{yaml_file['name']} tool class."},
+                )
 
-                            if not "platforms" in yaml_file:
-                                self.logger.warning(f"Failed to load recipe: {fpath}")
-                                self.logger.warning(
-                                    f"Missing required 'platforms' field."
-                                )
-                                continue
-                            else:
-                                recipe_class.platforms = yaml_file["platforms"]
-
-                            recipes[recipe_class.name][
-                                recipe_class.version
-                            ] = recipe_class
-
-                        elif yaml_file["type"] == "tool":
-                            if not "name" in yaml_file:
-                                self.logger.warning(f"Failed to load tool: {fpath}")
-                                self.logger.warning(f"Missing required 'name' field.")
-                                continue
-                            name = f"{cookbook}__{yaml_file['name']}"
-
-                            if "version" in yaml_file:
-                                name = f"{name}_{yaml_file['version']}"
-
-                            tool_class = type(
-                                name,
-                                (mussels.tool.BaseTool,),
-                                {"__doc__": f"{yaml_file['name']} tool class."},
-                            )
+                tool_class.module_file = fpath
 
-                            tool_class.module_file = fpath
+                tool_class.name = yaml_file["name"]
 
-                            tool_class.name = yaml_file["name"]
+                if "version" in yaml_file:
+                    tool_class.version = yaml_file["version"]
 
-                            if "version" in yaml_file:
-                                tool_class.version = yaml_file["version"]
+                if not "platforms" in yaml_file:
+                    self.logger.warning(f"Failed to load tool: {fpath}")
+                    self.logger.warning(
+                        f"Missing required 'platforms' field."
+                    )
+                    return None
+                else:
+                    tool_class.platforms = yaml_file["platforms"]
 
-                            if not "platforms" in yaml_file:
-                                self.logger.warning(f"Failed to load tool: {fpath}")
-                                self.logger.warning(
-                                    f"Missing required 'platforms' field."
-                                )
-                                continue
-                            else:
-                                tool_class.platforms = yaml_file["platforms"]
+                return "tool", tool_class
 
-                            tools[tool_class.name][tool_class.version] = tool_class
+        return None
+
+    def load_directory(self, cookbook: str, load_path: str) -> tuple:
+        """
+        Load all recipes and tools in a directory.
+        This function reads in YAML files and assigns each to a new Recipe or Tool class, accordingly.
+        The classes are returned in a tuple.
+        """
+        recipes = defaultdict(dict)
+        tools = defaultdict(dict)
+
+        if not os.path.exists(load_path):
+            return recipes, tools
+
+        for fpath, yaml_file in self._read_directory(cookbook, load_path):
+            item = self._create_item_class(cookbook, fpath, yaml_file)
+            if item == None:
+                continue
+
+            item_type, item_class = item
+            if item_type == "recipe":
+                recipes[item_class.name][item_class.version] = item_class
+            else:
+                tools[item_class.name][item_class.version] = item_class
 
         return recipes, tools
 
+    def _index_directory(self, cookbook: str, load_path: str) -> tuple:
+        """
+        Index the recipes and tools in a directory by name, without creating their classes.
+        The parsed YAML is kept in `unloaded_items` until the recipe or tool is needed.
+
+        The name->version dictionaries for the recipes and tools are returned in a tuple.
+        """
+        recipes = defaultdict(dict)
+        tools = defaultdict(dict)
+
+        if not os.path.exists(load_path):
+            return recipes, tools
+
+        for fpath, yaml_file in self._read_directory(cookbook, load_path):
+            item_type = "tool" if yaml_file.get("type") == "tool" else "recipe"
+
+            if (
+                yaml_file.get("type") not in ["recipe", "collection", "tool"]
+                or "name" not in yaml_file
+                or (item_type == "recipe" and "version" not in yaml_file)
+            ):
+                # Not something we can index. Let the class loader explain what's wrong with it.
+                self._create_item_class(cookbook, fpath, yaml_file)
+                continue
+
+            self.unloaded_items[item_type][yaml_file["name"]].append((cookbook, fpath, yaml_file))
+
+            if item_type == "recipe":
+                recipes[yaml_file["name"]][yaml_file["version"]] = None
+            else:
+                tools[yaml_file["name"]][yaml_file.get("version", "")] = None
+
+        return recipes, tools
+
+    def _load_item(self, item_type: str, name: str, all: bool) -> Optional[list]:
+        """
+        Create the classes for every version of a lazily indexed recipe or tool.
+
+        Returns:    The sorted versions of the recipe or tool, or None if there aren't any.
+        """
+        items = self.recipes if item_type == "recipe" else self.tools
+
+        for cookbook, fpath, yaml_file in self.unloaded_items[item_type].pop(name, []):
+            item = self._create_item_class(cookbook, fpath, yaml_file)
+            if item == None:
+                continue
+
+            _, item_class = item
+            if item_class.version not in items[name].keys():
+                items[name][item_class.version] = {}
+            items[name][item_class.version][cookbook] = item_class
+
+        if name not in items:
+            return None
+
+        sorted_items = self._sort_items_by_version(
+            {name: items[name]}, all=all, has_target=(item_type == "recipe")
+        )
+        return sorted_items.get(name)
+
+    def _item_names(self, sorted_items: dict, item_type: str) -> list:
+        """
+        Get the names of all recipes or tools, including any that haven't been loaded yet.
+        """
+        names = list(sorted_items.keys())
+        if self.lazy:
+            names += [name for name in self.unloaded_items[item_type] if name not in names]
+        return names
+
     def _read_cookbook(self, cookbook: str, cookbook_path: str) -> bool:
         """
         Load the recipes and tools from a single cookbook.
@@ -375,10 +743,18 @@ class Mussels:
         sorted_recipes: defaultdict = defaultdict(list)
         sorted_tools: defaultdict = defaultdict(list)
 
-        # Load the recipes and the tools
-        recipes, tools = self.load_directory(
-            cookbook=cookbook, load_path=os.path.join(cookbook_path)
-        )
+        self.cookbooks_read.add(cookbook)
+
+        if self.lazy:
+            # Only index the recipes and the tools. Their classes will be created when needed.
+            recipes, tools = self._index_directory(
+                cookbook=cookbook, load_path=os.path.join(cookbook_path)
+            )
+        else:
+            # Load the recipes and the tools
+            recipes, tools = self.load_directory(
+                cookbook=cookbook, load_path=os.path.join(cookbook_path)
+            )
 
         # Sort the recipes
         sorted_recipes = sort_cookbook_by_version(recipes)
@@ -386,6 +762,8 @@ class Mussels:
         if len(sorted_recipes) > 0:
             self.cookbooks[cookbook]["recipes"] = sorted_recipes
             for recipe in recipes.keys():
+                if self.lazy:
+                    break
                 for version in recipes[recipe]:
                     if version not in self.recipes[recipe].keys():
                         self.recipes[recipe][version] = {}
@@ -397,6 +775,8 @@ class Mussels:
         if len(sorted_tools) > 0:
             self.cookbooks[cookbook]["tools"] = sorted_tools
             for tool in tools.keys():
+                if self.lazy:
+                    break
                 for version in tools[tool]:
                     if version not in self.tools[tool].keys():
                         self.tools[tool][version] = {}
@@ -456,9 +836,9 @@ class Mussels:
         sorted_items: dict = {}
 
         for item in items:
-            versions_list = list(items[item].keys())
-            versions_list.sort(key=version_keys)
-            versions_list.reverse()
+            versions_list = sorted(
+                (parse_version(version) for version in items[item].keys()), reverse=True
+            )
 
             sorted_item_list = []
 
@@ -503,13 +883,21 @@ class Mussels:
         Load the recipes and tools.
         """
         # If the cache is empty, try reading from the local bookshelf.
-        if len(self.recipes) == 0 or len(self.tools) == 0:
+        if self.lazy or len(self.recipes) == 0 or len(self.tools) == 0:
             self._read_bookshelf()
 
         # Load recipes from the local mussels directory, if those exists.
         if not self._read_local_recipes() and "local" in self.cookbooks:
             self.cookbooks.pop("local")
 
+        if self.lazy:
+            # Each recipe and tool is loaded and sorted the first time it's looked up.
+            self.sorted_recipes = LazyItems(lambda name: self._load_item("recipe", name, all))
+            self.sorted_tools = LazyItems(lambda name: self._load_item("tool", name, all))
+            self._create_version_resolvers()
+
+            return len(self.unloaded_items["recipe"]) > 0
+
         if len(self.recipes) == 0:
             return False
 
@@ -517,12 +905,175 @@ class Mussels:
             self.recipes, all=all, has_target=True
         )
         self.sorted_tools = self._sort_items_by_version(self.tools, all=all)
+        self._create_version_resolvers()
 
         if len(self.sorted_recipes) == 0 or len(self.sorted_tools) == 0:
             return False
 
         return True
 
+    def _create_version_resolvers(self) -> None:
+        """
+        Start selecting recipe and tool versions afresh, from the sorted recipes and tools.
+        """
+        self.recipe_versions = VersionResolver(self.sorted_recipes, logger=self.logger)
+        self.tool_versions = VersionResolver(self.sorted_tools, logger=self.logger)
+
+    def _create_recipe_object(
+        self, recipe_class, platform: str, target: str, toolchain: dict
+    ) -> mussels.recipe.BaseRecipe:
+        """
+        Create an instance of a recipe class, ready to fetch and build.
+        """
+        # If the user specified a custom install directory, then don't add the target arch subdirectory.
+        if self.custom_install_dir == True:
+            install_dir = self.install_dir
+        else:
+            install_dir = os.path.join(self.install_dir, target)
+
+        return recipe_class(
+            toolchain=toolchain,
+            platform=platform,
+            target=target,
+            data_dir=self.app_data_dir,
+            install_dir=install_dir,
+            work_dir=self.work_dir,
+            log_dir=self.log_dir,
+            download_dir=self.download_dir,
+            log_level=self.log_level,
+            download_retries=self.download_retries,
+            session=self.session,
+            track_installs=len(self.artifact_caches) > 0,
+            compiler_cache=self.compiler_cache,
+        )
+
+    def _detect_tools(self, tools: list) -> list:
+        """
+        Detect tools concurrently, reusing earlier results from the tool detection cache.
+
+        Args:
+            tools:  Tool objects to detect.
+
+        Returns:    Whether each tool was found, in the same order.
+        """
+
+        def detect(tool: mussels.tool.BaseTool) -> bool:
+            cached = self.tool_cache.lookup(tool)
+            if cached != None:
+                tool.tool_path = cached["tool_path"]
+                return cached["found"]
+
+            found = tool.detect()
+            self.tool_cache.store(tool, found)
+            return found
+
+        if len(tools) == 0:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(DETECT_JOBS, len(tools))) as executor:
+            found = list(executor.map(detect, tools))
+
+        self.tool_cache.save()
+        return found
+
+    def _detect_compiler_cache(self) -> Optional[CompilerCache]:
+        """
+        Find the compiler cache that was asked for.
+
+        A ccache or sccache tool from a cookbook is used to detect it, if there is one.
+
+        Returns:    The compiler cache, or None if it isn't installed.
+        """
+        if self.compiler_cache_choice == "auto":
+            candidates = COMPILER_CACHES
+        else:
+            candidates = [self.compiler_cache_choice]
+
+        for name in candidates:
+            if name in self.sorted_tools:
+                tool_nvc = self.tool_versions.resolve(name)
+                tool = self.tools[tool_nvc.name][tool_nvc.version][tool_nvc.cookbook](self.app_data_dir)
+            else:
+                tool = compiler_cache_tool(name)(self.app_data_dir)
+
+            if not self._detect_tools([tool])[0]:
+                continue
+
+            path = None
+            if tool.tool_path != "":
+                path = shutil.which(name, path=tool.tool_path)
+            if path == None:
+                path = shutil.which(name)
+            if path == None:
+                continue
+
+            return CompilerCache(name, path)
+
+        return None
+
+    def _restore_artifact(self, recipe_object: mussels.recipe.BaseRecipe, fingerprint: str) -> bool:
+        """
+        Install a recipe from the first artifact cache that has a build with the same fingerprint.
+
+        Returns:    True if the recipe was restored, else False.
+        """
+        name = artifact_name(recipe_object.name, fingerprint)
+
+        for cache in self.artifact_caches:
+            os.makedirs(os.path.join(recipe_object.install_dir, ".mussels"), exist_ok=True)
+            with tempfile.TemporaryDirectory(
+                dir=os.path.join(recipe_object.install_dir, ".mussels")
+            ) as temp_dir:
+                archive_path = os.path.join(temp_dir, os.path.basename(name))
+                try:
+                    if not cache.fetch(name, archive_path):
+                        self.logger.debug(f"{name} not found in artifact cache {cache.location}")
+                        continue
+
+                    unpack_artifact(archive_path, recipe_object.install_dir)
+                except Exception as exc:
+                    self.logger.warning(
+                        f"Failed to restore {nvc_str(recipe_object.name, recipe_object.version)} from artifact cache {cache.location}: {exc}"
+                    )
+                    continue
+
+            self.logger.info(
+                f"Restored {nvc_str(recipe_object.name, recipe_object.version)} from artifact cache {cache.location}"
+            )
+            return True
+
+        return False
+
+    def _store_artifact(self, recipe_object: mussels.recipe.BaseRecipe, fingerprint: str) -> None:
+        """
+        Store the files a recipe installed in every artifact cache.
+        """
+        name = artifact_name(recipe_object.name, fingerprint)
+
+        os.makedirs(os.path.join(recipe_object.install_dir, ".mussels"), exist_ok=True)
+        with tempfile.TemporaryDirectory(
+            dir=os.path.join(recipe_object.install_dir, ".mussels")
+        ) as temp_dir:
+            archive_path = os.path.join(temp_dir, os.path.basename(name))
+            try:
+                pack_artifact(recipe_object.install_dir, recipe_object.installed_files, archive_path)
+            except Exception as exc:
+                self.logger.warning(
+                    f"Failed to pack {nvc_str(recipe_object.name, recipe_object.version)} for the artifact cache: {exc}"
+                )
+                return
+
+            for cache in self.artifact_caches:
+                try:
+                    cache.store(name, archive_path)
+                except Exception as exc:
+                    self.logger.warning(
+                        f"Failed to store {nvc_str(recipe_object.name, recipe_object.version)} in artifact cache {cache.location}: {exc}"
+                    )
+                    continue
+
+                self.logger.debug(f"Stored {name} in artifact cache {cache.location}")
+
     def _build_recipe(
         self,
         recipe: str,
@@ -532,13 +1083,15 @@ class Mussels:
         target: str,
         toolchain: dict,
         rebuild: bool = False,
+        recipe_object: Optional[mussels.recipe.BaseRecipe] = None,
     ) -> dict:
         """
         Build a specific recipe.
 
         Args:
-            recipe:     The recipe name with no version information.
-            version:    The recipe version.
+            recipe:         The recipe name with no version information.
+            version:        The recipe version.
+            recipe_object:  (optional) The recipe instance to build, if one was already created.
 
         Returns:    A dictionary of build results
         """
@@ -595,23 +1148,8 @@ class Mussels:
             result["time elapsed"] = time.time() - start
             return result
 
-        # If the user specified a custom install directory, then don't add the target arch subdirectory.
-        if self.custom_install_dir == True:
-            install_dir = self.install_dir
-        else:
-            install_dir = os.path.join(self.install_dir, target)
-
-        recipe_object = recipe_class(
-            toolchain=toolchain,
-            platform=platform,
-            target=target,
-            data_dir=self.app_data_dir,
-            install_dir=install_dir,
-            work_dir=self.work_dir,
-            log_dir=self.log_dir,
-            download_dir=self.download_dir,
-            log_level=self.log_level,
-        )
+        if recipe_object == None:
+            recipe_object = self._create_recipe_object(recipe_class, platform, target, toolchain)
 
         if not recipe_object.build(rebuild):
             self.logger.error(f"FAILURE: {nvc_str(recipe, version)} build failed!\n")
@@ -621,6 +1159,9 @@ class Mussels:
             )
             result["success"] = True
 
+        if recipe_object.compiler_cache_stats != None:
+            result["compiler cache"] = recipe_object.compiler_cache_stats
+
         result["time elapsed"] = time.time() - start
 
         return result
@@ -643,9 +1184,9 @@ class Mussels:
             )
         """
         # Select the recipe
-        nvc = get_item_version(recipe, self.sorted_recipes, target, logger=self.logger)
+        nvc = self.recipe_versions.resolve(recipe, target)
 
-        # Use "get_item_version()" to prune the list of sorted_tools based on the required tools for the selected recipe.
+        # Prune the tool versions based on the required tools for the selected recipe.
         recipe_class = self.recipes[nvc.name][nvc.version][nvc.cookbook]
 
         for each_platform in recipe_class.platforms:
@@ -657,134 +1198,223 @@ class Mussels:
                     if "required_tools" in build_target.keys():
                         for tool in build_target["required_tools"]:
                             try:
-                                get_item_version(tool, self.sorted_tools, logger=self.logger)
+                                self.tool_versions.resolve(tool)
                             except Exception as exc:
                                 raise Exception(f"The {tool} tool, required by {nvc_str(nvc.name, nvc.version, nvc.cookbook)} is not available...\n{exc}")
                     break
         return nvc
 
-    def _identify_build_recipes(
-        self, recipe: str, chain: list, platform: str, target: str
-    ) -> list:
+    def _solve_versions(self, recipe: str, platform: str, target: str) -> None:
         """
-        Identify all recipes that must be built given a specific recipe.
+        Select versions of every recipe and tool in a recipe's dependency chain that satisfy
+        all of their requirements at once, and pin the recipe and tool versions to them.
 
         Args:
-            recipe:     A specific recipe to build.
-            chain:      (in,out) A dependency chain starting from the first
-                        recursive call used to identify circular dependencies.
+            recipe:    A recipes string in the format [cookbook:]recipe[==version].
+
+        Raises:     Unsatisfiable, explaining which requirements conflict.
         """
-        recipe_nvc = self._get_recipe_version(recipe, platform, target)
 
-        if (len(chain) > 0) and (recipe_nvc.name == chain[0]):
-            raise ValueError(f"Circular dependencies found! {chain}")
-        chain.append(recipe_nvc.name)
+        def candidates(kind: str, name: str) -> list:
+            sorted_items = self.sorted_recipes if kind == "recipe" else self.sorted_tools
+            if name not in sorted_items:
+                return []
+
+            choices = []
+            for item_version in sorted_items[name]:
+                cookbooks = item_version["cookbooks"]
+
+                # Prefer local over all else, the same as when selecting versions greedily.
+                for cookbook in sorted(cookbooks, key=lambda cookbook: cookbook != "local"):
+                    if kind == "recipe" and not any(
+                        target in cookbooks[cookbook][each_platform]
+                        for each_platform in cookbooks[cookbook]
+                    ):
+                        continue
+                    choices.append((item_version["version"], cookbook))
+            return choices
 
-        recipes = []
+        def dependencies(kind: str, name: str, version: str, cookbook: str) -> list:
+            if kind == "tool":
+                return []
 
-        recipes.append(recipe)
+            recipe_class = self.recipes[name][version][cookbook]
+            for each_platform in recipe_class.platforms:
+                if platform_matches(each_platform, platform):
+                    variant = recipe_class.platforms[each_platform]
+                    if target in variant.keys():
+                        build_target = variant[target]
+
+                        requirements = []
+                        for dependency in build_target.get("dependencies", []):
+                            if ":" not in dependency:
+                                # If the cookbook isn't explicitly specified for the dependency,
+                                # select the recipe from the current cookbook.
+                                dependency = f"{cookbook}:{dependency}"
+                            requirements.append(requirement("recipe", dependency))
+                        for tool in build_target.get("required_tools", []):
+                            requirements.append(requirement("tool", tool))
+                        return requirements
+            return []
+
+        solution = solve([requirement("recipe", recipe)], candidates, dependencies)
+
+        self._create_version_resolvers()
+        for (kind, name), (version, cookbook) in solution.items():
+            self.logger.debug(f"Selected {nvc_str(name, version, cookbook)}")
+            if kind == "recipe":
+                self.recipe_versions.resolve(f"{cookbook}:{name}=={version}", target)
+            else:
+                self.tool_versions.resolve(f"{cookbook}:{name}=={version}")
+
+    def _recipe_dependencies(self, recipe_nvc: NVC, platform: str, target: str) -> list:
+        """
+        Get the dependencies of a recipe version, each with the cookbook to select it from.
+        """
+        recipe_class = self.recipes[recipe_nvc.name][recipe_nvc.version][recipe_nvc.cookbook]
 
         # Verify that recipe supports current platform.
-        platform_options = self.recipes[recipe_nvc.name][recipe_nvc.version][
-            recipe_nvc.cookbook
-        ].platforms.keys()
-        matching_platform = pick_platform(platform, platform_options)
+        matching_platform = pick_platform(platform, recipe_class.platforms.keys())
         if matching_platform == "":
             # recipe doesn't support current platform.
             # TODO: see if next recipe does.
             pass
 
         # verify that recipe supports requested target architecture
+        build_target = recipe_class.platforms[matching_platform][target]
 
-        if (
-            "dependencies"
-            in self.recipes[recipe_nvc.name][recipe_nvc.version][
-                recipe_nvc.cookbook
-            ].platforms[matching_platform][target]
-        ):
-            dependencies = self.recipes[recipe_nvc.name][recipe_nvc.version][
-                recipe_nvc.cookbook
-            ].platforms[matching_platform][target]["dependencies"]
-            for dependency in dependencies:
-                if ":" not in dependency:
-                    # If the cookbook isn't explicitly specified for the dependency,
-                    # select the recipe from the current cookbook.
-                    dependency = f"{recipe_nvc.cookbook}:{dependency}"
+        dependencies = []
+        for dependency in build_target.get("dependencies", []):
+            if ":" not in dependency:
+                # If the cookbook isn't explicitly specified for the dependency,
+                # select the recipe from the current cookbook.
+                dependency = f"{recipe_nvc.cookbook}:{dependency}"
+            dependencies.append(dependency)
+        return dependencies
 
+    def _identify_build_recipes(self, recipe: str, platform: str, target: str) -> dict:
+        """
+        Identify all recipes that must be built given a specific recipe.
+
+        Each requirement is only resolved and expanded once, however many recipes depend on it,
+        so diamond-shaped dependencies don't multiply the work. Requirements are resolved in the
+        same depth-first order as the dependency lists, which determines which versions are
+        selected when requirements for the same recipe differ.
+
+        Args:
+            recipe:     A specific recipe to build.
+
+        Returns:    A dictionary mapping each requirement string to the recipe NVC that satisfies
+                    it, given every other requirement.
+        """
+        # Requirement -> (requirement that required it, NVC that required it), for error messages.
+        required_by: dict = {recipe: None}
+
+        # NVC -> its dependency requirements
+        expanded: dict = {}
+
+        def explain(recipe_req: str, exc: Exception) -> str:
+            msg = str(exc)
+            while required_by[recipe_req] != None:
+                recipe_req_parent, nvc_parent = required_by[recipe_req]
+                msg = f"The {recipe_req} recipe, required by {nvc_str(nvc_parent.name, nvc_parent.version, nvc_parent.cookbook)} has dependency issues...\n{msg}"
+                recipe_req = recipe_req_parent
+            return msg
+
+        def expand(recipe_req: str, recipe_nvc: NVC) -> list:
+            if recipe_nvc not in expanded:
+                expanded[recipe_nvc] = self._recipe_dependencies(recipe_nvc, platform, target)
+
+            new_requirements = []
+            for dependency in expanded[recipe_nvc]:
+                if dependency not in required_by:
+                    required_by[dependency] = (recipe_req, recipe_nvc)
+                    new_requirements.append(dependency)
+            return new_requirements
+
+        def walk(requirements: list) -> None:
+            # Depth-first, without recursion, in the order the dependencies are listed.
+            stack = list(reversed(requirements))
+            while stack:
+                recipe_req = stack.pop()
                 try:
-                    recipes += self._identify_build_recipes(
-                        dependency, chain, platform, target
-                    )
+                    recipe_nvc = self._get_recipe_version(recipe_req, platform, target)
+                    stack += reversed(expand(recipe_req, recipe_nvc))
                 except Exception as exc:
-                    raise Exception(f"The {dependency} recipe, required by {nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)} has dependency issues...\n{exc}")
+                    raise Exception(explain(recipe_req, exc))
 
-        return recipes
+        walk([recipe])
 
-    def _get_build_batches(self, recipe: str, platform: str, target: str) -> list:
+        # Later requirements may have ruled out the version selected for an earlier one.
+        # Resolve them all again, and walk the dependencies of any newly selected versions,
+        # until nothing changes.
+        while True:
+            selected = {}
+            new_requirements = []
+            for recipe_req in list(required_by):
+                try:
+                    selected[recipe_req] = self._get_recipe_version(recipe_req, platform, target)
+                    new_requirements += expand(recipe_req, selected[recipe_req])
+                except Exception as exc:
+                    raise Exception(explain(recipe_req, exc))
+
+            if len(new_requirements) == 0:
+                return selected
+
+            walk(new_requirements)
+
+    def _get_build_graph(self, recipe: str, platform: str, target: str) -> dict:
         """
-        Get list of build batches that can be built concurrently.
+        Get the dependency graph for a recipe.
 
         Args:
             recipe:    A recipes string in the format [cookbook:]recipe[==version].
+
+        Returns:    A dictionary mapping each recipe NVC to the set of recipe NVCs it depends on.
         """
         # Identify all recipes that must be built given list of desired builds.
         try:
-            all_recipes = set(self._identify_build_recipes(recipe, [], platform, target))
+            selected = self._identify_build_recipes(recipe, platform, target)
         except Exception as exc:
-            raise Exception(f"Failed to assemble dependency chain for {recipe} on {platform} ({target}):\n{exc}")
+            # The versions are selected greedily, so an early selection may rule out the
+            # versions a later requirement needs. Search for versions that satisfy everything.
+            self.logger.debug(f"Failed to select versions for {recipe} one requirement at a time:\n{exc}")
+            self.logger.debug(f"Searching for versions that satisfy every requirement...")
+            try:
+                self._solve_versions(recipe, platform, target)
+                selected = self._identify_build_recipes(recipe, platform, target)
+            except Unsatisfiable as unsat:
+                raise Exception(f"Failed to assemble dependency chain for {recipe} on {platform} ({target}):\n{unsat}")
+            except Exception:
+                raise Exception(f"Failed to assemble dependency chain for {recipe} on {platform} ({target}):\n{exc}")
 
         # Build a map of recipes (name,version) tuples to sets of dependency (name,version,cookbook) tuples
         nvc_to_deps = {}
-        for recipe in all_recipes:
-            recipe_nvc = self._get_recipe_version(recipe, platform, target)
-            platform_options = self.recipes[recipe_nvc.name][recipe_nvc.version][
-                recipe_nvc.cookbook
-            ].platforms.keys()
-            matching_platform = pick_platform(platform, platform_options)
-
-            if (
-                "dependencies"
-                in self.recipes[recipe_nvc.name][recipe_nvc.version][
-                    recipe_nvc.cookbook
-                ].platforms[matching_platform][target]
-            ):
-                dependencies = self.recipes[recipe_nvc.name][recipe_nvc.version][
-                    recipe_nvc.cookbook
-                ].platforms[matching_platform][target]["dependencies"]
-            else:
-                dependencies = []
+        for recipe_nvc in set(selected.values()):
             nvc_to_deps[recipe_nvc] = set(
                 [
-                    self._get_recipe_version(dependency, platform, target)
-                    for dependency in dependencies
+                    selected[dependency]
+                    for dependency in self._recipe_dependencies(recipe_nvc, platform, target)
                 ]
             )
 
-        batches = []
-
-        # While there are dependencies to solve...
-        while nvc_to_deps:
+        cycles = find_cycles(nvc_to_deps)
+        if len(cycles) > 0:
+            msg = f"Failed to assemble dependency chain for {recipe} on {platform} ({target}):\nCircular dependencies found!"
+            for cycle in cycles:
+                msg += f"\n    {', '.join(sorted(nvc_str(nvc.name, nvc.version, nvc.cookbook) for nvc in cycle))}"
+            raise ValueError(msg)
 
-            # Get all recipes with no dependencies
-            ready = {recipe for recipe, deps in nvc_to_deps.items() if not deps}
+        return nvc_to_deps
 
-            # If there aren't any, we have a loop in the graph
-            if not ready:
-                msg = "Circular dependencies found!\n"
-                msg += json.dumps(nvc_to_deps, indent=4)
-                raise ValueError(msg)
-
-            # Remove them from the dependency graph
-            for recipe in ready:
-                del nvc_to_deps[recipe]
-            for deps in nvc_to_deps.values():
-                deps.difference_update(ready)
-
-            # Add the batch to the list
-            batches.append(ready)
+    def _get_build_batches(self, recipe: str, platform: str, target: str) -> list:
+        """
+        Get list of build batches that can be built concurrently.
 
-        # Return the list of batches
-        return batches
+        Args:
+            recipe:    A recipes string in the format [cookbook:]recipe[==version].
+        """
+        return get_batches(self._get_build_graph(recipe, platform, target))
 
     def _select_cookbook(
         self, recipe: str, recipe_version: dict, preferred_book: str = ""
@@ -848,6 +1478,7 @@ class Mussels:
             results:    (out) A list of dictionaries describing the results of the build.
         """
         found_tool = False
+        tool_objects = []
 
         for each_tool in self.sorted_tools:
             if tool == "" or tool == each_tool:
@@ -858,21 +1489,26 @@ class Mussels:
                                 found_tool = True
 
                                 tool_class = self.tools[each_tool][each_version["version"]][each_cookbook]
-                                tool_object = tool_class(
-                                    self.app_data_dir,
-                                    log_level=self.log_level,
+                                tool_objects.append(
+                                    (
+                                        nvc_str(each_tool, each_version["version"], each_cookbook),
+                                        tool_class(
+                                            self.app_data_dir,
+                                            log_level=self.log_level,
+                                        ),
+                                    )
                                 )
 
-                                if tool_object.detect():
-                                    # Found!
-                                    self.logger.warning(
-                                        f"    {nvc_str(each_tool, each_version['version'], each_cookbook)} FOUND."
-                                    )
-                                else:
-                                    # Not found.
-                                    self.logger.error(
-                                        f"    {nvc_str(each_tool, each_version['version'], each_cookbook)} NOT found."
-                                    )
+        detected = self._detect_tools([tool_object for _, tool_object in tool_objects])
+
+        for (tool_str, _), found in zip(tool_objects, detected):
+            if found:
+                # Found!
+                self.logger.warning(f"    {tool_str} FOUND.")
+            else:
+                # Not found.
+                self.logger.error(f"    {tool_str} NOT found.")
+
         if not found_tool:
             self.logger.warning(
                 f"    Unable to find tool definition matching: {nvc_str(tool, version, cookbook)}."
@@ -887,6 +1523,8 @@ class Mussels:
         results: list,
         dry_run: bool = False,
         rebuild: bool = False,
+        jobs: int = 1,
+        fetch_jobs: int = 4,
     ) -> bool:
         """
         Execute a build of a recipe.
@@ -899,6 +1537,10 @@ class Mussels:
             results:    (out) A list of dictionaries describing the results of the build.
             dry_run:    (optional) Don't actually build, just print the build chain.
             rebuild:    (optional) Rebuild the entire dependency chain.
+            jobs:       (optional) Max number of recipes to build concurrently.
+                        Each recipe is started as soon as its own dependencies are built.
+            fetch_jobs: (optional) Max number of sources to download or clone concurrently.
+                        Sources are fetched ahead of time, while earlier recipes build.
         """
 
         def print_results(results: list):
@@ -909,9 +1551,23 @@ class Mussels:
                 results:    (out) A list of dictionaries describing the results of the build.
             """
             for result in results:
-                if result["success"]:
+                if result.get("up to date", False):
+                    self.logger.info(
+                        f"{nvc_str(result['name'], result['version'])} was already up to date."
+                    )
+                elif result.get("restored", False):
+                    self.logger.info(
+                        f"{nvc_str(result['name'], result['version'])} was restored from an artifact cache in {datetime.timedelta(0, result['time elapsed'])}."
+                    )
+                elif result["success"]:
+                    compiler_cache_stats = ""
+                    if result.get("compiler cache") != None:
+                        compiler_cache_stats = (
+                            f" ({self.compiler_cache.name}: {result['compiler cache']['hits']} hits,"
+                            + f" {result['compiler cache']['misses']} misses)"
+                        )
                     self.logger.info(
-                        f"Successful build of {nvc_str(result['name'], result['version'])} completed in {datetime.timedelta(0, result['time elapsed'])}."
+                        f"Successful build of {nvc_str(result['name'], result['version'])} completed in {datetime.timedelta(0, result['time elapsed'])}.{compiler_cache_stats}"
                     )
                 else:
                     self.logger.error(
@@ -926,7 +1582,8 @@ class Mussels:
             return False
 
 
-        batches: List[dict] = []
+        graph: dict = {}
+        batches: List[set] = []
 
         recipe_str = nvc_str(recipe, version, cookbook)
 
@@ -939,9 +1596,10 @@ class Mussels:
                 target = "host"
 
         try:
-            batches = self._get_build_batches(
+            graph = self._get_build_graph(
                 recipe_str, platform=platform.system(), target=target
             )
+            batches = get_batches(graph)
         except Exception as exc:
             self.logger.error(f"{recipe_str} build failed!")
             for line in str(exc).split('\n'):
@@ -969,18 +1627,39 @@ class Mussels:
                             for tool in recipe_class.platforms[each_platform][target][
                                 "required_tools"
                             ]:
-                                tool_nvc = get_item_version(tool, self.sorted_tools, logger=self.logger)
+                                tool_nvc = self.tool_versions.resolve(tool)
                                 preferred_tool_versions.add(tool_nvc)
 
         # Check if required tools are installed
         missing_tools = []
-        for tool_nvc in preferred_tool_versions:
+        preferred_tool_nvcs = list(preferred_tool_versions)
+        preferred_tools = [
+            self.tools[tool_nvc.name][tool_nvc.version][tool_nvc.cookbook](self.app_data_dir)
+            for tool_nvc in preferred_tool_nvcs
+        ]
+        preferred_found = self._detect_tools(preferred_tools)
+
+        # Check for every non-preferred (older, but compatible) version of the missing tools at once.
+        alternatives: dict = {}
+        for tool_nvc, found in zip(preferred_tool_nvcs, preferred_found):
+            if not found and len(self.tool_versions.candidates(tool_nvc.name)) > 1:
+                alternatives[tool_nvc] = []
+                for alt_version in self.tool_versions.candidates(tool_nvc.name)[1:]:
+                    alt_version_cookbook = self._select_cookbook(
+                        tool_nvc.name, alt_version, cookbook
+                    )
+                    alt_tool = self.tools[tool_nvc.name][alt_version["version"]][
+                        alt_version_cookbook
+                    ](self.app_data_dir)
+                    alternatives[tool_nvc].append((alt_version, alt_version_cookbook, alt_tool))
+
+        alt_tools = [alt_tool for tool_alternatives in alternatives.values() for _, _, alt_tool in tool_alternatives]
+        alt_found = dict(zip(alt_tools, self._detect_tools(alt_tools)))
+
+        for tool_nvc, preferred_tool, found in zip(preferred_tool_nvcs, preferred_tools, preferred_found):
             tool_found = False
-            preferred_tool = self.tools[tool_nvc.name][tool_nvc.version][
-                tool_nvc.cookbook
-            ](self.app_data_dir)
 
-            if preferred_tool.detect():
+            if found:
                 # Preferred tool version is available.
                 tool_found = True
                 toolchain[tool_nvc.name] = preferred_tool
@@ -988,37 +1667,27 @@ class Mussels:
                     f"    {nvc_str(tool_nvc.name, tool_nvc.version, tool_nvc.cookbook)} found."
                 )
             else:
-                # Check if non-preferred (older, but compatible) version is available.
                 self.logger.debug(
                     f"    {nvc_str(tool_nvc.name, tool_nvc.version, tool_nvc.cookbook)} not found."
                 )
 
-                if len(self.sorted_tools[tool_nvc.name]) > 1:
+                if tool_nvc in alternatives:
                     self.logger.debug(f"        Checking for alternative versions...")
-                    alt_versions = self.sorted_tools[tool_nvc.name][1:]
-
-                    for alt_version in alt_versions:
-                        alt_version_cookbook = self._select_cookbook(
-                            tool_nvc.name, alt_version, cookbook
-                        )
-                        alt_tool = self.tools[tool_nvc.name][alt_version["version"]][
-                            alt_version_cookbook
-                        ](self.app_data_dir)
 
-                        if alt_tool.detect():
+                    for alt_version, alt_version_cookbook, alt_tool in alternatives[tool_nvc]:
+                        if alt_found[alt_tool]:
                             # Found a compatible version to use.
                             tool_found = True
                             toolchain[tool_nvc.name] = alt_tool
 
                             # Select the exact version (pruning all other options) so it will be the default.
-                            get_item_version(
-                                f"{nvc_str(tool_nvc.name, alt_version['version'], alt_version_cookbook)}",
-                                self.sorted_tools,
-                                logger=self.logger
+                            self.tool_versions.resolve(
+                                f"{nvc_str(tool_nvc.name, alt_version['version'], alt_version_cookbook)}"
                             )
                             self.logger.info(
                                 f"    Alternative version {nvc_str(tool_nvc.name, alt_version['version'], alt_version_cookbook)} found."
                             )
+                            break
                         else:
                             self.logger.debug(
                                 f"    Alternative version {nvc_str(tool_nvc.name, alt_version['version'], alt_version_cookbook)} not found."
@@ -1042,6 +1711,18 @@ class Mussels:
         for tool in toolchain:
             self.logger.info(f"   {nvc_str(tool, toolchain[tool].version)}")
 
+        if self.compiler_cache_choice != "":
+            self.compiler_cache = self._detect_compiler_cache()
+            if self.compiler_cache != None:
+                self.logger.info(f"Compiler cache: {self.compiler_cache.name} ({self.compiler_cache.path})")
+            elif self.compiler_cache_choice == "auto":
+                self.logger.warning(
+                    f"No compiler cache found. Install one of: {', '.join(COMPILER_CACHES)}"
+                )
+            else:
+                self.logger.error(f"Compiler cache {self.compiler_cache_choice} not found.")
+                return False
+
         #FF
         # Perform Build
         #
@@ -1053,18 +1734,17 @@ class Mussels:
             self.logger.warning("")
             self.logger.info("Build-order of requested recipes:")
 
-        idx = 0
-        failure = False
-        for i, bundle in enumerate(batches):
-            for j, recipe_nvc in enumerate(bundle):
-                idx += 1
+        if dry_run:
+            idx = 0
+            for i, bundle in enumerate(batches):
+                for j, recipe_nvc in enumerate(bundle):
+                    idx += 1
 
-                platform_options = self.recipes[recipe_nvc.name][recipe_nvc.version][
-                    recipe_nvc.cookbook
-                ].platforms.keys()
-                matching_platform = pick_platform(platform.system(), platform_options)
+                    platform_options = self.recipes[recipe_nvc.name][recipe_nvc.version][
+                        recipe_nvc.cookbook
+                    ].platforms.keys()
+                    matching_platform = pick_platform(platform.system(), platform_options)
 
-                if dry_run:
                     self.logger.info(
                         f"   {idx:2} [{i}:{j:2}]: {nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)}"
                     )
@@ -1078,34 +1758,200 @@ class Mussels:
                         for tool in self.recipes[recipe_nvc.name][recipe_nvc.version][
                             recipe_nvc.cookbook
                         ].platforms[matching_platform][target]["required_tools"]:
-                            tool_nvc = get_item_version(tool, self.sorted_tools, logger=self.logger)
+                            tool_nvc = self.tool_versions.resolve(tool)
                             self.logger.debug(
                                 f"        {nvc_str(tool_nvc.name, tool_nvc.version, tool_nvc.cookbook)}"
                             )
-                        continue
+            return True
 
-                if failure:
-                    self.logger.warning(
-                        f"Skipping  {nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)} build due to prior failure."
-                    )
-                else:
-                    result = self._build_recipe(
-                        recipe_nvc.name,
-                        recipe_nvc.version,
-                        recipe_nvc.cookbook,
-                        matching_platform,
-                        target,
-                        toolchain,
-                        rebuild,
-                    )
-                    results.append(result)
-                    if not result["success"]:
-                        failure = True
+        def build_time_key(recipe_nvc: NVC) -> str:
+            return f"{nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)} ({target})"
 
-        if not dry_run:
-            print_results(results)
+        def build_graph_recipe(recipe_nvc: NVC) -> bool:
+            """
+            Build a recipe once all of its dependencies have been built.
+
+            Args:
+                recipe_nvc:     The recipe to build.
 
-        if failure:
+            Returns:    True if the build succeeded.
+            """
+            platform_options = self.recipes[recipe_nvc.name][recipe_nvc.version][
+                recipe_nvc.cookbook
+            ].platforms.keys()
+            matching_platform = pick_platform(platform.system(), platform_options)
+
+            if recipe_nvc in up_to_date:
+                self.logger.info(
+                    f"{nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)} is up to date."
+                )
+                results.append(
+                    {
+                        "name": recipe_nvc.name,
+                        "version": recipe_nvc.version,
+                        "success": True,
+                        "up to date": True,
+                        "time elapsed": 0.0,
+                    }
+                )
+                return True
+
+            recipe_object = recipe_objects.get(recipe_nvc)
+            if recipe_object != None:
+                # Forget the last build, in case this one fails part way through installing.
+                recipe_object.record_fingerprint("")
+
+                if restore_from_artifact_cache(recipe_nvc, recipe_object):
+                    return True
+
+            result = self._build_recipe(
+                recipe_nvc.name,
+                recipe_nvc.version,
+                recipe_nvc.cookbook,
+                matching_platform,
+                target,
+                toolchain,
+                rebuild,
+                recipe_object,
+            )
+
+            if result["success"] and recipe_object != None:
+                # The source is known now, even if it wasn't before the build.
+                fingerprints[recipe_nvc] = recipe_object.fingerprint(
+                    [fingerprints.get(dependency, "") for dependency in graph[recipe_nvc]]
+                )
+                recipe_object.record_fingerprint(fingerprints[recipe_nvc])
+
+                if (
+                    len(self.artifact_caches) > 0
+                    and fingerprints[recipe_nvc] != ""
+                    and not recipe_object.is_collection
+                ):
+                    self._store_artifact(recipe_object, fingerprints[recipe_nvc])
+
+            results.append(result)
+            return result["success"]
+
+        def restore_from_artifact_cache(recipe_nvc: NVC, recipe_object: mussels.recipe.BaseRecipe) -> bool:
+            """
+            Install a recipe from an artifact cache, instead of building it.
+
+            Returns:    True if the recipe was restored.
+            """
+            if len(self.artifact_caches) == 0 or rebuild or recipe_object.is_collection:
+                return False
+
+            start = time.time()
+
+            dependency_fingerprints = [fingerprints.get(dependency, "") for dependency in graph[recipe_nvc]]
+            fingerprint = recipe_object.fingerprint(dependency_fingerprints)
+            if fingerprint == "" and "uri" in recipe_object.source and "" not in dependency_fingerprints:
+                # The archive's checksum isn't known until it has been downloaded.
+                if recipe_object.fetch(rebuild):
+                    fingerprint = recipe_object.fingerprint(dependency_fingerprints)
+
+            if fingerprint == "" or not self._restore_artifact(recipe_object, fingerprint):
+                return False
+
+            fingerprints[recipe_nvc] = fingerprint
+            recipe_object.record_fingerprint(fingerprint)
+            restored.add(recipe_nvc)
+
+            results.append(
+                {
+                    "name": recipe_nvc.name,
+                    "version": recipe_nvc.version,
+                    "success": True,
+                    "restored": True,
+                    "time elapsed": time.time() - start,
+                }
+            )
+            return True
+
+        # Create each recipe up front, so their sources can be fetched while earlier recipes build.
+        recipe_objects: dict = {}
+        for batch in batches:
+            for recipe_nvc in sorted(batch):
+                if not self.cookbooks[recipe_nvc.cookbook]["trusted"]:
+                    # Don't download anything for recipes we won't build.
+                    continue
+
+                recipe_class = self.recipes[recipe_nvc.name][recipe_nvc.version][recipe_nvc.cookbook]
+                recipe_objects[recipe_nvc] = self._create_recipe_object(
+                    recipe_class,
+                    pick_platform(platform.system(), recipe_class.platforms.keys()),
+                    target,
+                    toolchain,
+                )
+
+        # Skip recipes whose inputs haven't changed since their last successful build.
+        # Dependencies come first in the batches, so their fingerprints are ready when needed.
+        fingerprints: dict = {}
+        up_to_date: set = set()
+        restored: set = set()
+        for batch in batches:
+            for recipe_nvc in sorted(batch):
+                if recipe_nvc not in recipe_objects:
+                    fingerprints[recipe_nvc] = ""
+                    continue
+
+                fingerprints[recipe_nvc] = recipe_objects[recipe_nvc].fingerprint(
+                    [fingerprints.get(dependency, "") for dependency in graph[recipe_nvc]]
+                )
+                if (
+                    not rebuild
+                    and all(dependency in up_to_date for dependency in graph[recipe_nvc])
+                    and recipe_objects[recipe_nvc].is_up_to_date(fingerprints[recipe_nvc])
+                ):
+                    up_to_date.add(recipe_nvc)
+
+        # Fetch the sources in build order. A recipe that's ready to build before its source
+        # has been fetched will wait for the fetch to finish.
+        fetch_executor = ThreadPoolExecutor(max_workers=max(fetch_jobs, 1))
+        for recipe_nvc, recipe_object in recipe_objects.items():
+            if recipe_nvc not in up_to_date:
+                fetch_executor.submit(recipe_object.fetch, rebuild)
+
+        # Use the build times from prior builds to estimate which dependency chains will take the longest.
+        build_times: dict = {}
+        self._load_config("build_times.json", build_times)
+
+        # Each recipe starts as soon as its own dependencies are built, rather than waiting on a whole batch.
+        run = run_graph(
+            graph,
+            build_graph_recipe,
+            jobs=jobs,
+            weights={
+                recipe_nvc: build_times[build_time_key(recipe_nvc)]
+                for recipe_nvc in graph
+                if build_time_key(recipe_nvc) in build_times
+            },
+            logger=self.logger,
+        )
+
+        # Don't bother fetching sources for recipes that won't be built.
+        fetch_executor.shutdown(wait=True, cancel_futures=True)
+
+        for recipe_nvc in run["skipped"]:
+            self.logger.warning(
+                f"Skipping  {nvc_str(recipe_nvc.name, recipe_nvc.version, recipe_nvc.cookbook)} build due to prior failure."
+            )
+
+        for recipe_nvc in run["succeeded"]:
+            if recipe_nvc not in up_to_date and recipe_nvc not in restored:
+                build_times[build_time_key(recipe_nvc)] = run["durations"][recipe_nvc]
+        self._store_config("build_times.json", build_times)
+
+        print_results(results)
+
+        self.logger.info(
+            f"Built {len(run['succeeded']) - len(up_to_date) - len(restored)} of {len(graph)} recipes"
+            + f" ({len(up_to_date)} already up to date, {len(restored)} restored from an artifact cache)"
+            + f" in {datetime.timedelta(0, run['wall time'])}"
+            + f" (critical path: {datetime.timedelta(0, run['critical path'])}, average parallelism: {run['parallelism']:.2f})."
+        )
+
+        if len(run["failed"]) > 0 or len(run["skipped"]) > 0:
             return False
         return True
 
@@ -1164,8 +2010,8 @@ class Mussels:
                 f'Searching for recipe matching name: "{recipe_match}", version: "{version_match}"...'
             )
         # Attempt to match the recipe name
-        for recipe in self.sorted_recipes:
-            if fnmatch.fnmatch(recipe, recipe_match):
+        for recipe in self._item_names(self.sorted_recipes, "recipe"):
+            if fnmatch.fnmatch(recipe, recipe_match) and recipe in self.sorted_recipes:
                 if version_match == "":
                     found = True
 
@@ -1500,8 +2346,8 @@ class Mussels:
                 f'Searching for tool matching name: "{tool_match}", version: "{version_match}"...'
             )
         # Attempt to match the tool name
-        for tool in self.sorted_tools:
-            if fnmatch.fnmatch(tool, tool_match):
+        for tool in self._item_names(self.sorted_tools, "tool"):
+            if fnmatch.fnmatch(tool, tool_match) and tool in self.sorted_tools:
                 if version_match == "":
                     found = True
 
@@ -1749,20 +2595,58 @@ class Mussels:
             if "trusted" not in self.cookbooks[book]:
                 self.cookbooks[book]["trusted"] = False
 
+        # Clone or pull every cookbook at once, since most of the time is spent waiting on the network.
+        books = [
+            book
+            for book in self.cookbooks
+            if "url" in self.cookbooks[book] and self.cookbooks[book]["url"] != ""
+        ]
+        changed = {}
+        if len(books) > 0:
+            with ThreadPoolExecutor(max_workers=min(len(books), UPDATE_JOBS)) as executor:
+                changed = dict(zip(books, executor.map(self._update_cookbook, books)))
+
+        # Only re-read the cookbooks that changed, or that haven't been read yet.
         for book in self.cookbooks:
             repo_dir = os.path.join(self.app_data_dir, "cookbooks", book)
 
-            if "url" in self.cookbooks[book] and self.cookbooks[book]["url"] != "":
-                if not os.path.isdir(repo_dir):
-                    repo = git.Repo.clone_from(self.cookbooks[book]["url"], repo_dir)
-                else:
-                    repo = git.Repo(repo_dir)
-                    repo.git.pull()
+            if not changed.get(book, True) and book in self.cookbooks_read:
+                self.logger.debug(f"Cookbook '{book}' is already up to date.")
+                continue
 
             self._read_cookbook(book, repo_dir)
 
         self._store_config("cookbooks.json", self.cookbooks)
 
+    def _update_cookbook(self, book: str) -> bool:
+        """
+        Clone or pull a cookbook repository.
+
+        Returns:    True if the cookbook's files changed (or it's new), else False.
+        """
+        repo_dir = os.path.join(self.app_data_dir, "cookbooks", book)
+
+        try:
+            if not os.path.isdir(repo_dir):
+                self.logger.info(f"Cloning cookbook '{book}' from {self.cookbooks[book]['url']} ...")
+                git.Repo.clone_from(self.cookbooks[book]["url"], repo_dir)
+                return True
+
+            repo = git.Repo(repo_dir)
+            tree_before = repo.head.commit.tree.hexsha
+            repo.git.pull()
+            tree_after = repo.head.commit.tree.hexsha
+
+        except Exception as exc:
+            self.logger.error(f"Failed to update cookbook '{book}': {exc}")
+            return False
+
+        if tree_before != tree_after:
+            self.logger.info(f"Updated cookbook '{book}'.")
+            return True
+
+        return False
+
     def list_cookbooks(self, verbose: bool = False):
         """
         Print out a list of all cookbooks.
@@ -1844,7 +2728,8 @@ class Mussels:
         )
 
         if os.path.exists(os.path.join(self.app_data_dir, "cache")):
-            shutil.rmtree(os.path.join(self.app_data_dir, "cache"))
+            # The extracted sources in the cache are read-only.
+            remove_tree(os.path.join(self.app_data_dir, "cache"))
             self.logger.info(f"Cache directory cleared.")
         else:
             self.logger.info(f"No cache directory to clear.")
@@ -20,26 +20,48 @@ limitations under the License.
 """
 
 import datetime
-from distutils import dir_util
 import glob
+import hashlib
 import inspect
 from io import StringIO
+import json
 import logging
 import os
 import platform
+import re
 import shutil
 import stat
 import subprocess
 import sys
-import tarfile
+import tempfile
+import threading
 import time
-import zipfile
+from typing import *
 
 import git
-import requests
-import urllib.request
 import patch
+import requests
 
+from mussels.utils.archives import ARCHIVE_TYPES, archive_stem, extract_archive
+from mussels.utils.compiler_cache import CompilerCache, DISABLED_VARIABLES, stats_difference
+from mussels.utils.fileops import (
+    clone_tree,
+    install_file,
+    install_tree,
+    make_read_only,
+    move_tree,
+    remove_tree,
+)
+from mussels.utils.download import (
+    DEFAULT_RETRIES,
+    add_to_store,
+    download_file,
+    lookup_uri,
+    record_uri,
+    sha256_file,
+    store_path,
+    uri_lock,
+)
 from mussels.utils.versions import pick_platform, nvc_str
 
 
@@ -85,15 +107,45 @@ class BaseRecipe(object):
         log_dir: str = "",
         download_dir: str = "",
         log_level: str = "DEBUG",
+        download_retries: int = DEFAULT_RETRIES,
+        session: Optional[requests.Session] = None,
+        track_installs: bool = False,
+        compiler_cache: Optional[CompilerCache] = None,
     ):
         """
         Download the archive (if necessary) to the Downloads directory.
         Extract the archive to the temp directory so it is ready to build.
+
+        If `track_installs` is True, the files installed by the build are listed in `installed_files`.
+        If a `compiler_cache` is given, the build scripts may use it through the {compiler_cache} and
+        {cmake_launcher} variables.
         """
         self.toolchain = toolchain
         self.platform = platform
         self.target = target
 
+        # Recipes may be built concurrently, so each instance needs its own copy of these.
+        self.builds = {}
+        self.variables = dict(self.variables)
+
+        # Checksum of the downloaded archive, which identifies its extracted source in the source cache.
+        self.archive_sha256 = ""
+
+        # Cache hits and misses during the build, if a compiler cache is in use.
+        self.compiler_cache = compiler_cache
+        self.compiler_cache_stats: Optional[dict] = None
+
+        # Environment variables for the build scripts. None means Mussels' own environment.
+        self.environment: Optional[dict] = None
+
+        # Files installed by the build, relative to the install directory.
+        self.track_installs = track_installs
+        self.installed_files: set = set()
+
+        # The source may be fetched ahead of the build, from another thread.
+        self.fetch_lock = threading.Lock()
+        self.fetched: Optional[bool] = None
+
         if data_dir == "":
             # No temp dir provided, build in the current working directory.
             self.data_dir = os.getcwd()
@@ -107,6 +159,9 @@ class BaseRecipe(object):
         else:
             self.download_dir = os.path.join(self.data_dir, "cache", "downloads")
 
+        self.download_retries = download_retries
+        self.session = session
+
         if log_dir != "":
             self.log_dir = log_dir
         else:
@@ -164,44 +219,93 @@ class BaseRecipe(object):
 
     def _download_archive(self) -> bool:
         """
-        Use the URI to download the archive if it doesn't already exist in the Downloads directory.
+        Use the URI to download the archive if it isn't already in the download cache.
+
+        Archives are cached by their SHA256 digest. If the recipe declares `source.sha256`, the archive
+        must match it. Otherwise, the digest recorded the first time the URI was fetched is used.
         """
         os.makedirs(self.download_dir, exist_ok=True)
 
-        # Determine download path from URI & possible archive name change.
+        # Determine archive name from URI & possible archive name change.
         uri = self.source.get('uri', '')
         self.archive = uri.split("/")[-1]
         if self.archive_name_change[0] != "":
             self.archive = self.archive.replace(
                 self.archive_name_change[0], self.archive_name_change[1]
             )
-        self.download_path = os.path.join(
-            self.download_dir, self.archive
-        )
 
-        # Exit early if we already have the archive.
-        if os.path.exists(self.download_path):
-            self.logger.debug(f"Archive already downloaded.")
-            return True
+        expected = self.source.get('sha256', '').lower()
 
-        self.logger.info(f"Downloading {uri}")
-        self.logger.info(f"         to {self.download_path} ...")
+        with uri_lock(uri):
+            # Exit early if we already have the archive.
+            digest = expected if expected != "" else lookup_uri(self.download_dir, uri)
+            if digest != "" and self._use_cached_archive(digest):
+                self.logger.debug(f"Archive already downloaded.")
+                record_uri(self.download_dir, uri, digest)
+                return True
 
-        if uri.startswith("ftp"):
-            try:
-                urllib.request.urlretrieve(uri, self.download_path)
-            except Exception as exc:
-                self.logger.info(f"Failed to download archive from {uri}, {exc}!")
-                return False
-        else:
-            try:
-                r = requests.get(uri)
-                with open(self.download_path, "wb") as f:
-                    f.write(r.content)
-            except Exception:
+            # Archives downloaded by older versions of Mussels are stored by file name.
+            legacy_path = os.path.join(self.download_dir, self.archive)
+            if os.path.isfile(legacy_path):
+                legacy_digest = sha256_file(legacy_path)
+                if expected == "" or legacy_digest == expected:
+                    self.logger.debug(f"Adding previously downloaded {self.archive} to the download cache.")
+                    self.download_path = add_to_store(
+                        self.download_dir, legacy_path, legacy_digest, keep=True
+                    )
+                    self.archive_sha256 = legacy_digest
+                    record_uri(self.download_dir, uri, legacy_digest)
+                    return True
+
+            partial_dir = os.path.join(self.download_dir, "partial")
+            os.makedirs(partial_dir, exist_ok=True)
+            partial_path = os.path.join(
+                partial_dir, f"{hashlib.sha256(uri.encode('utf-8')).hexdigest()[:16]}-{self.archive}"
+            )
+
+            self.logger.info(f"Downloading {uri} ...")
+
+            if not download_file(
+                uri,
+                partial_path,
+                logger=self.logger,
+                session=self.session,
+                retries=self.download_retries,
+            ):
                 self.logger.info(f"Failed to download archive from {uri}!")
                 return False
 
+            digest = sha256_file(partial_path)
+            if expected != "" and digest != expected:
+                self.logger.error(f"Checksum mismatch for {uri}!")
+                self.logger.error(f"    Expected SHA256: {expected}")
+                self.logger.error(f"    Actual SHA256:   {digest}")
+                os.remove(partial_path)
+                return False
+
+            self.download_path = add_to_store(self.download_dir, partial_path, digest)
+            self.archive_sha256 = digest
+            record_uri(self.download_dir, uri, digest)
+
+            self.logger.info(f"Saved {self.archive} as {self.download_path}")
+
+        return True
+
+    def _use_cached_archive(self, digest: str) -> bool:
+        """
+        Check that the download cache has an archive, and that it hasn't been corrupted.
+        """
+        stored_path = store_path(self.download_dir, digest)
+        if not os.path.isfile(stored_path):
+            return False
+
+        if sha256_file(stored_path) != digest:
+            self.logger.warning(f"Cached archive {stored_path} is corrupt. Downloading it again.")
+            os.remove(stored_path)
+            return False
+
+        self.download_path = stored_path
+        self.archive_sha256 = digest
         return True
 
     def _create_none_build_dir(self, rebuild: bool) -> bool:
@@ -277,20 +381,44 @@ class BaseRecipe(object):
             shutil.rmtree(self.builds[self.target])
             self.prior_build_exists = False
 
-        # Clone the repository
+        # Fetch history only as deep as the recipe needs. Default: just the pinned commit.
+        depth = self.source.get('depth', 1)
+        clone_filter = self.source.get('filter', '')
+        ref = f"refs/tags/{git_tag}" if git_tag else f"refs/heads/{git_branch}"
+
+        if clone_filter != "":
+            # A partial clone has to fetch missing objects from the real repository later on,
+            # so it can't be cloned from the mirror.
+            clone_url = git_url
+            clone_options = {"filter": clone_filter, "single_branch": True}
+            if depth > 0:
+                clone_options["depth"] = depth
+        else:
+            # Bring the local mirror up to date, then clone the build directory from it.
+            clone_url = self._update_git_mirror(git_url, ref, depth)
+            if clone_url == "":
+                return False
+            clone_options = {}
+
         self.logger.info(f"Cloning git repository {git_url}")
         self.logger.info(f"         to {self.builds[self.target]} ...")
 
         try:
-            repo = git.Repo.clone_from(git_url, self.builds[self.target])
-
             # Checkout the specified tag or branch
             if git_tag:
                 self.logger.info(f"Checking out tag: {git_tag}")
-                repo.git.checkout(git_tag)
             elif git_branch:
                 self.logger.info(f"Checking out branch: {git_branch}")
-                repo.git.checkout(git_branch)
+
+            repo = git.Repo.clone_from(
+                clone_url,
+                self.builds[self.target],
+                branch=git_tag if git_tag else git_branch,
+                **clone_options,
+            )
+
+            # Point the build directory at the real repository, not the mirror.
+            repo.remote("origin").set_url(git_url)
 
         except Exception as exc:
             self.logger.error(f"Failed to clone git repository {git_url}: {exc}")
@@ -298,28 +426,95 @@ class BaseRecipe(object):
 
         return True
 
+    def _update_git_mirror(self, git_url: str, ref: str, depth: int) -> str:
+        """
+        Create or update a bare mirror of a git repository in the git cache.
+
+        Only the requested tag or branch is fetched, and only `depth` commits deep (0 for the full
+        history). Every build directory for the repository is cloned from the mirror, so nothing is
+        downloaded twice, and later updates only download new commits. A tag that the mirror
+        already has won't change, so the mirror isn't updated for it.
+
+        Returns:    The path of the mirror, or "" if it couldn't be created or updated.
+        """
+        repo_name = git_url.rstrip('/').split('/')[-1]
+        if repo_name.endswith('.git'):
+            repo_name = repo_name[:-4]
+
+        mirror_dir = os.path.join(self.data_dir, "cache", "git")
+        mirror_path = os.path.join(
+            mirror_dir,
+            f"{repo_name}-{hashlib.sha1(git_url.encode('utf-8')).hexdigest()[:12]}.git",
+        )
+
+        with uri_lock(mirror_path):
+            try:
+                if not os.path.isdir(mirror_path):
+                    self.logger.info(f"Mirroring git repository {git_url}")
+                    self.logger.info(f"         to {mirror_path} ...")
+
+                    os.makedirs(mirror_dir, exist_ok=True)
+                    tmp_path = f"{mirror_path}.{os.getpid()}.tmp"
+                    if os.path.exists(tmp_path):
+                        shutil.rmtree(tmp_path)
+
+                    mirror = git.Repo.init(tmp_path, bare=True)
+                    mirror.create_remote("origin", git_url)
+                    self._fetch_git_ref(mirror, ref, depth)
+
+                    try:
+                        os.replace(tmp_path, mirror_path)
+                    except OSError:
+                        if not os.path.isdir(mirror_path):
+                            raise
+                        # Another Mussels process created the mirror first.
+                        shutil.rmtree(tmp_path)
+
+                else:
+                    mirror = git.Repo(mirror_path)
+                    shallow = os.path.exists(os.path.join(mirror_path, "shallow"))
+
+                    if (
+                        ref.startswith("refs/tags/")
+                        and ref in [tag.path for tag in mirror.tags]
+                        and (not shallow or depth == 1)
+                    ):
+                        self.logger.debug(f"Git mirror already has tag: {ref[len('refs/tags/'):]}")
+                    else:
+                        self.logger.info(f"Updating git mirror of {git_url} ...")
+                        self._fetch_git_ref(mirror, ref, depth)
+
+            except Exception as exc:
+                self.logger.error(f"Failed to mirror git repository {git_url}: {exc}")
+                return ""
+
+        return mirror_path
+
+    def _fetch_git_ref(self, mirror: git.Repo, ref: str, depth: int):
+        """
+        Fetch a tag or branch into the mirror, `depth` commits deep (0 for the full history).
+        """
+        if depth > 0:
+            mirror.git.fetch("--prune", f"--depth={depth}", "origin", f"+{ref}:{ref}")
+        elif os.path.exists(os.path.join(mirror.git_dir, "shallow")):
+            # The mirror was fetched shallow for another recipe. Fetch the rest of the history.
+            mirror.git.fetch("--prune", "--unshallow", "origin", f"+{ref}:{ref}")
+        else:
+            mirror.git.fetch("--prune", "origin", f"+{ref}:{ref}")
+
     def _extract_archive(self, rebuild: bool) -> bool:
         """
         Extract the archive found in Downloads directory, if necessary.
         """
-        if self.archive.endswith(".tar.gz"):
-            self.builds[self.target] = os.path.join(
-                self.work_dir, self.target, f"{self.archive[:-len('.tar.gz')]}"
-            )
-        elif self.archive.endswith(".zip"):
-            self.builds[self.target] = os.path.join(
-                self.work_dir, self.target, f"{self.archive[:-len('.zip')]}"
-            )
-        elif self.archive.endswith(".tar.xz"):
-            self.builds[self.target] = os.path.join(
-                self.work_dir, self.target, f"{self.archive[:-len('.tar.xz')]}"
-            )
-        else:
+        archive_dir = archive_stem(self.archive)
+        if archive_dir == "":
             self.logger.error(
-                f"Unexpected archive extension. Currently only supports .tar.gz and .zip!"
+                f"Unexpected archive extension. Currently only supports: {', '.join(suffix for suffix, _ in ARCHIVE_TYPES)}"
             )
             return False
 
+        self.builds[self.target] = os.path.join(self.work_dir, self.target, archive_dir)
+
         self.prior_build_exists = os.path.exists(self.builds[self.target])
 
         if self.prior_build_exists:
@@ -337,43 +532,99 @@ class BaseRecipe(object):
 
         os.makedirs(os.path.join(self.work_dir, self.target), exist_ok=True)
 
+        # The archive is only extracted once. Each build directory is a copy of that pristine source.
+        pristine_dir = self._get_pristine_source()
+        if pristine_dir == "":
+            return False
+
         # Make our own copy of the extracted source so we don't dirty the original.
         self.logger.debug(f"Preparing {self.target} build directory:")
         self.logger.debug(f"   {self.builds[self.target]}")
 
-        if self.archive.endswith(".tar.gz"):
-            # Un-tar
-            self.logger.info(
-                f"Extracting tarball archive {self.archive} to {self.builds[self.target]} ..."
-            )
+        try:
+            clone_tree(pristine_dir, os.path.join(self.work_dir, self.target), writable=True)
+        except Exception as exc:
+            self.logger.error(f"Failed to copy the extracted source for {self.archive}: {exc}")
+            return False
 
-            tar = tarfile.open(self.download_path, "r:gz")
-            tar.extractall(os.path.join(self.work_dir, self.target))
-            tar.close()
-        elif self.archive.endswith(".zip"):
-            # Un-zip
-            self.logger.info(
-                f"Extracting zip archive {self.archive} to {self.builds[self.target]} ..."
-            )
+        return True
 
-            zip_ref = zipfile.ZipFile(self.download_path, "r")
-            zip_ref.extractall(os.path.join(self.work_dir, self.target))
-            zip_ref.close()
-        elif self.archive.endswith(".tar.xz"):
-            # Un-tar
-            self.logger.info(
-                f"Extracting tarball archive {self.archive} to {self.builds[self.target]} ..."
-            )
+    def _get_pristine_source(self) -> str:
+        """
+        Get the extracted contents of the archive from the source cache, extracting it if necessary.
 
-            tar = tarfile.open(self.download_path, "r:xz")
-            tar.extractall(os.path.join(self.work_dir, self.target))
-            tar.close()
+        The source cache is keyed by the archive's checksum, and its files are read-only, so the
+        build directories copied from it can't change it.
 
-        return True
+        Returns:    The directory that the archive was extracted into, or "" if extraction failed.
+        """
+        sources_dir = os.path.join(self.data_dir, "cache", "sources")
+        pristine_dir = os.path.join(sources_dir, self.archive_sha256)
+
+        with uri_lock(pristine_dir):
+            if os.path.isdir(pristine_dir):
+                self.logger.debug(f"Using previously extracted source for {self.archive}.")
+                return pristine_dir
+
+            self.logger.info(f"Extracting archive {self.archive} to the source cache ...")
 
-    def _run_script(self, target, name, script) -> bool:
+            # Extract to a temporary directory, so an interrupted extraction is never mistaken for a complete one.
+            tmp_dir = f"{pristine_dir}.{os.getpid()}.tmp"
+            if os.path.exists(tmp_dir):
+                remove_tree(tmp_dir)
+            os.makedirs(tmp_dir)
+
+            try:
+                extract_archive(self.download_path, tmp_dir, archive=self.archive, logger=self.logger)
+                make_read_only(tmp_dir)
+                os.replace(tmp_dir, pristine_dir)
+            except Exception as exc:
+                if os.path.isdir(pristine_dir):
+                    # Another Mussels process extracted it first.
+                    remove_tree(tmp_dir)
+                    return pristine_dir
+
+                self.logger.error(f"Failed to extract {self.archive}: {exc}")
+                remove_tree(tmp_dir)
+                return ""
+
+        return pristine_dir
+
+    def _create_environment(self) -> dict:
+        """
+        Create the environment for the build scripts: a copy of Mussels' environment, with the
+        toolchain paths at the front of the PATH.
+
+        Duplicate PATH entries are removed, so the PATH doesn't grow with each tool and recipe.
+        """
+        environment = dict(os.environ)
+
+        tool_paths = []
+        # Later tools in the toolchain take precedence.
+        for tool in reversed(list(self.toolchain)):
+            if self.toolchain[tool].tool_path != "":
+                self.logger.debug(
+                    f"Adding tool {tool} path {self.toolchain[tool].tool_path} to PATH"
+                )
+                tool_paths.append(self.toolchain[tool].tool_path)
+
+        path = []
+        seen = set()
+        for entry in tool_paths + environment.get("PATH", "").split(os.pathsep):
+            key = os.path.normcase(os.path.normpath(entry)) if entry != "" else ""
+            if entry == "" or key in seen:
+                continue
+            seen.add(key)
+            path.append(entry)
+
+        environment["PATH"] = os.pathsep.join(path)
+        return environment
+
+    def _run_script(self, target, name, script, cwd) -> bool:
         """
-        Run a script in the current working directory.
+        Run a script in the given working directory.
+
+        The process-wide working directory is left alone so that recipes may be built concurrently.
         """
         # Create a build script.
         if platform.system() == "Windows":
@@ -383,7 +634,9 @@ class BaseRecipe(object):
             script_name = f"_{name}.sh"
             newline = "\n"
 
-        with open(os.path.join(os.getcwd(), script_name), "w", newline=newline) as fd:
+        script_path = os.path.join(cwd, script_name)
+
+        with open(script_path, "w", newline=newline) as fd:
             # Evaluate "".format() syntax in the build script
             script = script.format(**self.variables)
 
@@ -397,13 +650,15 @@ class BaseRecipe(object):
                     fd.write(line + "\n")
 
         if platform.system() != "Windows":
-            st = os.stat(script_name)
-            os.chmod(script_name, st.st_mode | stat.S_IEXEC)
+            st = os.stat(script_path)
+            os.chmod(script_path, st.st_mode | stat.S_IEXEC)
 
         # Run the build script.
         process = subprocess.Popen(
-            os.path.join(os.getcwd(), script_name),
+            script_path,
             shell=True,
+            cwd=cwd,
+            env=self.environment,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
         )
@@ -424,15 +679,25 @@ class BaseRecipe(object):
 
         return True
 
-    def build(self, rebuild: bool = False) -> bool:
+    def fetch(self, rebuild: bool = False) -> bool:
         """
-        Patch source materials if not already patched.
-        Then, for each architecture, run the build commands if the output files don't already exist.
+        Download the source archive or clone the git repository.
+
+        This only happens once, so the source may be fetched ahead of time while other recipes build.
+        If the source is already being fetched by another thread, wait for it to finish.
+        """
+        with self.fetch_lock:
+            if self.fetched != None:
+                return self.fetched
+
+            self.fetched = self._fetch(rebuild)
+            return self.fetched
+
+    def _fetch(self, rebuild: bool) -> bool:
+        """
+        Fetch the source, based on the type of source.
         """
         if self.is_collection:
-            self.logger.debug(
-                f"Build completed for recipe collection {nvc_str(self.name, self.version)}"
-            )
             return True
 
         os.makedirs(self.work_dir, exist_ok=True)
@@ -453,25 +718,193 @@ class BaseRecipe(object):
                 )
                 return False
         elif 'uri' in self.source:
-            # Download and extract archive
+            # Download the archive.
             if not self._download_archive():
                 self.logger.error(
                     f"Failed to download source archive for {nvc_str(self.name, self.version)}"
                 )
                 return False
+        else:
+            self.logger.error(
+                f"Invalid source configuration for {nvc_str(self.name, self.version)}. "
+                f"Must specify 'uri', 'git', or 'none'."
+            )
+            return False
+
+        return True
+
+    def _source_fingerprint(self) -> str:
+        """
+        Identify the source without fetching it.
+
+        Returns:    A string that changes whenever the source does, or "" if that can't be known ahead of time.
+        """
+        if self.is_collection:
+            return "collection"
+
+        if 'git' in self.source:
+            if self.source.get('tag', '') == "":
+                # A branch may move at any time.
+                return ""
+            return f"git {self.source['git']} {self.source['tag']}"
+        elif 'none' in self.source and self.source['none']:
+            return "none"
+        elif 'uri' in self.source:
+            digest = self.source.get('sha256', '').lower()
+            if digest == "":
+                digest = self.archive_sha256
+            if digest == "":
+                # Use the digest recorded the last time the archive was downloaded.
+                digest = lookup_uri(self.download_dir, self.source['uri'])
+            if digest == "":
+                return ""
+            return f"sha256 {digest}"
+
+        return ""
+
+    def fingerprint(self, dependency_fingerprints: list) -> str:
+        """
+        Compute a fingerprint of everything that goes into this build.
+
+        This covers the recipe file, the fingerprints of the dependencies, the patches, the versions
+        of the required tools, the variables, the install directory and the source. If any of them
+        change, so does the fingerprint.
+
+        Args:
+            dependency_fingerprints:    The fingerprints of the recipes this one depends on.
+
+        Returns:    A SHA256 hex digest, or "" if the inputs can't all be identified (e.g. a git branch).
+        """
+        source = self._source_fingerprint()
+        if source == "" or "" in dependency_fingerprints:
+            return ""
+
+        digest = hashlib.sha256()
+
+        def add(label: str, value) -> None:
+            digest.update(f"{label}={value}\n".encode("utf-8"))
+
+        add("recipe", nvc_str(self.name, self.version))
+        add("source", source)
+        add("platform", self.platform)
+        add("target", self.target)
+        add("install", os.path.abspath(self.install_dir))
+
+        if self.module_file != "" and os.path.isfile(self.module_file):
+            with open(self.module_file, "rb") as module_file:
+                add("recipe file", hashlib.sha256(module_file.read()).hexdigest())
+
+        # Use the class attributes, because the build adds values to the instance's variables.
+        add(
+            "definition",
+            json.dumps(
+                {
+                    "source": self.source,
+                    "archive_name_change": list(self.archive_name_change),
+                    "instructions": self.platforms[self.platform][self.target],
+                    "variables": type(self).variables,
+                },
+                sort_keys=True,
+                default=str,
+            ),
+        )
+
+        for dependency_fingerprint in sorted(dependency_fingerprints):
+            add("dependency", dependency_fingerprint)
+
+        if self.patch_dir != "" and os.path.isdir(self.patch_dir):
+            for dirpath, dirnames, filenames in os.walk(self.patch_dir):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    patch_path = os.path.join(dirpath, filename)
+                    add(
+                        "patch",
+                        f"{os.path.relpath(patch_path, self.patch_dir)} {sha256_file(patch_path)}",
+                    )
+
+        required_tools = self.platforms[self.platform][self.target].get("required_tools", [])
+        for tool in sorted(required_tools):
+            # Strip the cookbook and version requirement, e.g. "scrapbook:cmake>=3.14" -> "cmake".
+            tool_name = re.split(r"(>=|<=|>|<|==|=|@)", tool.split(":")[-1])[0].strip()
+            if tool_name in self.toolchain:
+                add(
+                    "tool",
+                    f"{tool_name} {self.toolchain[tool_name].version} {self.toolchain[tool_name].tool_path}",
+                )
+            else:
+                add("tool", tool_name)
+
+        return digest.hexdigest()
+
+    def _fingerprint_path(self) -> str:
+        return os.path.join(
+            self.install_dir, ".mussels", "fingerprints", self.target, f"{self.name}.json"
+        )
+
+    def is_up_to_date(self, fingerprint: str) -> bool:
+        """
+        Check if the last successful build of this recipe had the same fingerprint.
+        """
+        if fingerprint == "":
+            return False
+
+        try:
+            with open(self._fingerprint_path(), "r") as record_file:
+                record = json.load(record_file)
+        except (OSError, ValueError):
+            return False
+
+        return (
+            isinstance(record, dict)
+            and record.get("version") == self.version
+            and record.get("fingerprint") == fingerprint
+        )
+
+    def record_fingerprint(self, fingerprint: str) -> None:
+        """
+        Record the fingerprint of a successful build, so the next build can be skipped if nothing changed.
+
+        An empty fingerprint removes the record, so the next build won't be skipped.
+        """
+        record_path = self._fingerprint_path()
+
+        if fingerprint == "":
+            if os.path.exists(record_path):
+                os.remove(record_path)
+            return
+
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        with open(f"{record_path}.tmp", "w") as record_file:
+            json.dump(
+                {"name": self.name, "version": self.version, "fingerprint": fingerprint},
+                record_file,
+            )
+        os.replace(f"{record_path}.tmp", record_path)
+
+    def build(self, rebuild: bool = False) -> bool:
+        """
+        Patch source materials if not already patched.
+        Then, for each architecture, run the build commands if the output files don't already exist.
+        """
+        if self.is_collection:
+            self.logger.debug(
+                f"Build completed for recipe collection {nvc_str(self.name, self.version)}"
+            )
+            return True
 
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        # Download the archive or clone the repository, unless it was prefetched.
+        if not self.fetch(rebuild):
+            return False
+
+        if 'uri' in self.source:
             # Extract to the work_dir.
             if not self._extract_archive(rebuild):
                 self.logger.error(
                     f"Failed to extract source archive for {nvc_str(self.name, self.version)}"
                 )
                 return False
-        else:
-            self.logger.error(
-                f"Invalid source configuration for {nvc_str(self.name, self.version)}. "
-                f"Must specify 'uri', 'git', or 'none'."
-            )
-            return False
 
         if not os.path.isdir(self.patch_dir):
             self.logger.debug(f"No patch directory found.")
@@ -523,16 +956,10 @@ class BaseRecipe(object):
         self.variables["build"] = os.path.join(self.builds[self.target]).replace("\\", "/")
         self.variables["target"] = self.target
 
-        for tool in self.toolchain:
-            # Add each tool from the toolchain to the PATH environment variable.
-            if self.toolchain[tool].tool_path != "":
-                self.logger.debug(
-                    f"Adding tool {tool} path {self.toolchain[tool].tool_path} to PATH"
-                )
-                os.environ["PATH"] = (
-                    self.toolchain[tool].tool_path + os.pathsep + os.environ["PATH"]
-                )
+        # The build scripts get their own environment, so Mussels' own PATH is left alone.
+        self.environment = self._create_environment()
 
+        for tool in self.toolchain:
             # Collect tool variables for use in the build.
             platform_options = self.toolchain[tool].platforms.keys()
             matching_platform = pick_platform(platform.system(), platform_options)
@@ -544,52 +971,144 @@ class BaseRecipe(object):
                     setattr(tool_vars, variable, self.toolchain[tool].platforms[matching_platform]["variables"][variable])
                 self.variables[tool] = tool_vars
 
-        cwd = os.getcwd()
-        os.chdir(self.builds[self.target])
+        # Launcher variables for the compiler cache, or empty strings if there isn't one.
+        if self.compiler_cache != None:
+            self.variables.update(self.compiler_cache.variables())
+        else:
+            for variable, value in DISABLED_VARIABLES.items():
+                self.variables.setdefault(variable, value)
+
+        compiler_cache_stats = self.compiler_cache.stats() if self.compiler_cache != None else None
 
         if not self.prior_build_exists:
             # Run "configure" script, if exists.
             if "configure" in build_scripts.keys():
                 if not self._run_script(
-                    self.target, "configure", build_scripts["configure"]
+                    self.target, "configure", build_scripts["configure"], self.builds[self.target]
                 ):
                     self.logger.error(
                         f"{nvc_str(self.name, self.version)} {self.target} build failed."
                     )
-                    os.chdir(cwd)
                     return False
 
-        else:
-            os.chdir(self.builds[self.target])
-
         # Run "make" script, if exists.
         if "make" in build_scripts.keys():
-            if not self._run_script(self.target, "make", build_scripts["make"]):
+            if not self._run_script(self.target, "make", build_scripts["make"], self.builds[self.target]):
                 self.logger.error(
                     f"{nvc_str(self.name, self.version)} {self.target} build failed."
                 )
-                os.chdir(cwd)
                 return False
 
-        # Run "install" script, if exists.
+        if not self._run_install(build_scripts):
+            return False
+
+        if self.compiler_cache != None:
+            # The compiler cache is shared, so these include any recipes that were building at the same time.
+            self.compiler_cache_stats = stats_difference(
+                compiler_cache_stats, self.compiler_cache.stats()
+            )
+            if self.compiler_cache_stats != None:
+                self.logger.info(
+                    f"{self.compiler_cache.name}: {self.compiler_cache_stats['hits']} hits, "
+                    + f"{self.compiler_cache_stats['misses']} misses"
+                )
+
+        return True
+
+    def _run_install(self, build_scripts: dict) -> bool:
+        """
+        Run the "install" script, if it exists, and then install the `install_paths`.
+        """
         if "install" in build_scripts.keys():
-            if not self._run_script(self.target, "install", build_scripts["install"]):
+            if self.track_installs:
+                installed = self._run_staged_install_script(build_scripts["install"])
+            else:
+                installed = self._run_script(self.target, "install", build_scripts["install"], self.builds[self.target])
+
+            if not installed:
                 self.logger.error(
                     f"{nvc_str(self.name, self.version)} {self.target} build failed."
                 )
-                os.chdir(cwd)
                 return False
 
         self.logger.info(
             f"{nvc_str(self.name, self.version)} {self.target} build succeeded."
         )
-        os.chdir(cwd)
 
         if not self._install():
             return False
 
         return True
 
+    def _run_staged_install_script(self, script: str) -> bool:
+        """
+        Run the "install" script into an empty staging directory, and then move the files it
+        installed into the install directory, adding them to `installed_files`.
+
+        Other recipes may be installing to the same install directory at the same time, and an
+        install script may skip files that are already installed and up-to-date. Staging tells
+        exactly which files belong to this recipe either way.
+
+        The DESTDIR environment variable is set to the staging directory, the same as when
+        packaging software: {install} still names the real install directory, so build systems
+        that were configured with it as the prefix (e.g. `make install`, `cmake --install`) and
+        scripts that copy files to `$DESTDIR{install}` install under the staging directory.
+        """
+        staging_parent = os.path.join(self.work_dir, self.target, "staging")
+        os.makedirs(staging_parent, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix=f"{self.name}-", dir=staging_parent)
+
+        install_dir = os.path.abspath(self.install_dir)
+        staged_install_dir = os.path.join(
+            staging_dir, os.path.splitdrive(install_dir)[1].lstrip("\\/")
+        )
+
+        # Install scripts may expect the install directory's subdirectories to exist already.
+        for dirpath, dirnames, _ in os.walk(install_dir):
+            if dirpath == install_dir and ".mussels" in dirnames:
+                dirnames.remove(".mussels")
+            os.makedirs(os.path.join(staged_install_dir, os.path.relpath(dirpath, install_dir)), exist_ok=True)
+
+        environment = self.environment
+        try:
+            self.environment = dict(environment if environment != None else os.environ)
+            self.environment["DESTDIR"] = staging_dir
+
+            if not self._run_script(self.target, "install", script, self.builds[self.target]):
+                return False
+
+            for dirpath, dirnames, filenames in os.walk(staging_dir):
+                if os.path.normcase(dirpath) == os.path.normcase(staged_install_dir):
+                    dirnames.clear()
+                    continue
+                for name in filenames:
+                    self.logger.warning(
+                        f"Ignoring {os.path.relpath(os.path.join(dirpath, name), staging_dir)}, which was installed outside of {install_dir}"
+                    )
+
+            self.installed_files |= set(move_tree(staged_install_dir, install_dir))
+        finally:
+            self.environment = environment
+            remove_tree(staging_dir)
+
+        return True
+
+    def _track_installed(self, dst_path: str) -> None:
+        """
+        Add an installed file, or every file in an installed directory, to `installed_files`.
+        """
+        if not self.track_installs:
+            return
+
+        if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+            for dirpath, dirnames, filenames in os.walk(dst_path):
+                for name in list(dirnames) + filenames:
+                    path = os.path.join(dirpath, name)
+                    if name in filenames or os.path.islink(path):
+                        self.installed_files.add(os.path.relpath(path, self.install_dir))
+        else:
+            self.installed_files.add(os.path.relpath(dst_path, self.install_dir))
+
     def _install(self):
         """
         Copy the headers and libs to an install directory.
@@ -597,7 +1116,7 @@ class BaseRecipe(object):
         os.makedirs(self.install_dir, exist_ok=True)
 
         self.logger.info(
-            f"Copying {nvc_str(self.name, self.version)} install files to: {self.install_dir}."
+            f"Installing {nvc_str(self.name, self.version)} files to: {self.install_dir}."
         )
 
         if 'install_paths' not in self.platforms[self.platform][self.target]:
@@ -619,23 +1138,25 @@ class BaseRecipe(object):
                             self.install_dir, install_path, os.path.basename(src_filepath)
                         )
 
-                        # Remove prior installation, if exists.
-                        if os.path.isdir(dst_path):
-                            shutil.rmtree(dst_path)
-                        elif os.path.isfile(dst_path):
-                            os.remove(dst_path)
-
                         # Create the target install paths, if it doesn't already exist.
                         os.makedirs(os.path.split(dst_path)[0], exist_ok=True)
 
-                        self.logger.debug(f"Copying: {src_filepath}")
-                        self.logger.debug(f"     to: {dst_path}")
+                        self.logger.debug(f"Installing: {src_filepath}")
+                        self.logger.debug(f"        to: {dst_path}")
 
-                        # Now copy the file or directory.
+                        # Now install the file or directory, replacing any prior installation.
+                        # Files that haven't changed since the prior installation are left alone.
                         if os.path.isdir(src_filepath):
-                            dir_util.copy_tree(src_filepath, dst_path)
+                            counts = install_tree(src_filepath, dst_path)
                         else:
-                            shutil.copyfile(src_filepath, dst_path)
+                            counts = {install_file(src_filepath, dst_path): 1}
+
+                        self._track_installed(dst_path)
+
+                        self.logger.debug(
+                            "     "
+                            + ", ".join(f"{count} {how}" for how, count in counts.items() if count > 0)
+                        )
 
                         item_installed = True
 
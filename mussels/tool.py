@@ -24,7 +24,9 @@ limitations under the License.
 
 import datetime
 from distutils import dir_util, spawn
+import hashlib
 import inspect
+import json
 import logging
 import os
 import platform
@@ -36,6 +38,7 @@ import tarfile
 import zipfile
 
 from io import StringIO
+from typing import *
 
 from mussels.utils.versions import platform_is, nvc_str
 
@@ -50,6 +53,7 @@ class BaseTool(object):
     platforms: dict = {}
     logs_dir = ""
     tool_path = ""
+    module_file: str = ""
 
     def __init__(self,
         data_dir: str = "",
@@ -68,6 +72,9 @@ class BaseTool(object):
 
         self.name_version = nvc_str(self.name, self.version)
 
+        # Path -> modification time (or None if missing) of each file that detection looked at.
+        self.detection_inputs: dict = {}
+
         self._init_logging(log_level)
 
     def _init_logging(self, level="DEBUG"):
@@ -100,6 +107,44 @@ class BaseTool(object):
         self.logger.addHandler(filehandler)
         self.logger.setLevel(levels[os.environ.get("LOG_LEVEL", level)])
 
+    def definition_hash(self) -> str:
+        """
+        Get a hash of the tool definition, which changes if the way to detect the tool changes.
+        """
+        definition = json.dumps(
+            {"name": self.name, "version": self.version, "platforms": self.platforms},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(definition.encode("utf-8")).hexdigest()
+
+    def _record_input(self, path: str) -> None:
+        """
+        Remember the modification time of a file or directory that detection depends on.
+        """
+        path = os.path.abspath(path)
+        try:
+            self.detection_inputs[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            self.detection_inputs[path] = None
+
+    def _find_executable(self, executable: str) -> Optional[str]:
+        """
+        Find an executable in the PATH, remembering where it was looked for.
+
+        If it's found, detection depends on that file. If not, it depends on the PATH directories,
+        which change when a file is added to them.
+        """
+        install_location = spawn.find_executable(executable)
+        if install_location != None:
+            self._record_input(install_location)
+        else:
+            self._record_input(executable)
+            for path_dir in os.environ.get("PATH", "").split(os.pathsep):
+                if path_dir != "":
+                    self._record_input(path_dir)
+        return install_location
+
     def _run_command(self, command: str, expected_output: str) -> bool:
         """
         Run a command.
@@ -107,6 +152,7 @@ class BaseTool(object):
         found_expected_output = False
 
         cmd = command.split()
+        self._find_executable(cmd[0])
 
         # Run the build script.
         try:
@@ -133,6 +179,7 @@ class BaseTool(object):
         Determine if tool is available in expected locations.
         """
         found = False
+        self.detection_inputs = {}
 
         self.logger.info(f"Detecting tool: {self.name_version}...")
 
@@ -141,7 +188,7 @@ class BaseTool(object):
                 if "path_checks" in self.platforms[each_platform]:
                     for path_check in self.platforms[each_platform]["path_checks"]:
                         self.logger.info(f"  Checking for {path_check} in PATH")
-                        install_location = spawn.find_executable(path_check)
+                        install_location = self._find_executable(path_check)
                         if install_location == None:
                             self.logger.info(f"    {path_check} not found")
                         else:
@@ -171,6 +218,7 @@ class BaseTool(object):
 
                 if "file_checks" in self.platforms[each_platform]:
                     for filepath in self.platforms[each_platform]["file_checks"]:
+                        self._record_input(filepath)
                         if not os.path.exists(filepath):
                             self.logger.info(
                                 f'{self.name_version} file "{filepath}" not found'
@@ -0,0 +1,197 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides helpers to extract source archives.
+
+Tarballs are decompressed by an external, multi-threaded decompressor when one is installed
+(pigz, xz -T0, zstd, pbzip2 or lbzip2), and the decompressed stream is unpacked straight to
+disk, one member at a time. The decompressor and the unpacking run in parallel, and the
+archive is never decompressed into memory or a temporary file.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from typing import *
+import zipfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Supported archive suffixes, and the compression used for each. Longest suffixes first.
+ARCHIVE_TYPES = [
+    (".tar.gz", "gz"),
+    (".tar.xz", "xz"),
+    (".tar.bz2", "bz2"),
+    (".tar.zst", "zst"),
+    (".tgz", "gz"),
+    (".txz", "xz"),
+    (".tbz2", "bz2"),
+    (".tzst", "zst"),
+    (".tar", ""),
+    (".zip", "zip"),
+]
+
+# External decompressors to try for each compression, in order of preference.
+DECOMPRESSORS = {
+    "gz": [["pigz", "-dc"], ["gzip", "-dc"]],
+    "xz": [["xz", "-dc", "-T0"]],
+    "bz2": [["pbzip2", "-dc"], ["lbzip2", "-dc"], ["bzip2", "-dc"]],
+    "zst": [["zstd", "-dc", "-q", "-T0"]],
+}
+
+
+def archive_type(archive: str) -> Tuple[str, str]:
+    """
+    Identify an archive by its file name.
+
+    Returns:    A (suffix, compression) tuple, or ("", "") if the archive type isn't supported.
+    """
+    for suffix, compression in ARCHIVE_TYPES:
+        if archive.lower().endswith(suffix):
+            return suffix, compression
+    return "", ""
+
+
+def archive_stem(archive: str) -> str:
+    """
+    Get the name of an archive without its suffix, or "" if the archive type isn't supported.
+    """
+    suffix, _ = archive_type(archive)
+    if suffix == "":
+        return ""
+    return archive[: -len(suffix)]
+
+
+def find_decompressor(compression: str) -> List[str]:
+    """
+    Find an installed external decompressor.
+
+    Returns:    The command to decompress a file to stdout (without the file name), or [] if none is installed.
+    """
+    for command in DECOMPRESSORS.get(compression, []):
+        path = shutil.which(command[0])
+        if path != None:
+            return [path] + command[1:]
+    return []
+
+
+def _extract_tar_stream(fileobj, dest_dir: str) -> None:
+    """
+    Unpack a stream of tar data, one member at a time.
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+        if hasattr(tarfile, "tar_filter"):
+            tar.extractall(dest_dir, filter="tar")
+        else:
+            tar.extractall(dest_dir)
+
+
+def extract_archive(
+    archive_path: str, dest_dir: str, archive: str = "", logger: logging.Logger = None
+) -> None:
+    """
+    Extract an archive into a directory.
+
+    Raises an exception if the archive type isn't supported, or if extraction fails.
+
+    Args:
+        archive_path:   The archive to extract.
+        dest_dir:       The directory to extract into.
+        archive:        (optional) The archive's name, if the path doesn't end with it.
+        logger:         (optional) Logger for messages about how the archive is extracted.
+    """
+    suffix, compression = archive_type(archive if archive != "" else archive_path)
+
+    if suffix == "":
+        raise ValueError(
+            f"Unsupported archive type: {archive if archive != '' else archive_path}. "
+            + f"Supported types are: {', '.join(suffix for suffix, _ in ARCHIVE_TYPES)}"
+        )
+
+    if compression == "zip":
+        with zipfile.ZipFile(archive_path, "r") as zip_ref:
+            zip_ref.extractall(dest_dir)
+        return
+
+    if compression == "":
+        with open(archive_path, "rb") as f:
+            _extract_tar_stream(f, dest_dir)
+        return
+
+    command = find_decompressor(compression)
+
+    if command == []:
+        # No external decompressor. Decompress in Python instead.
+        if logger != None:
+            logger.debug(f"No {compression} decompressor found, decompressing in Python.")
+
+        if compression == "zst":
+            if zstandard == None:
+                raise RuntimeError(
+                    "Extracting .tar.zst archives requires the zstd program or the zstandard Python package."
+                )
+            with open(archive_path, "rb") as f:
+                with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                    _extract_tar_stream(reader, dest_dir)
+        else:
+            with tarfile.open(archive_path, f"r|{compression}") as tar:
+                if hasattr(tarfile, "tar_filter"):
+                    tar.extractall(dest_dir, filter="tar")
+                else:
+                    tar.extractall(dest_dir)
+        return
+
+    if logger != None:
+        logger.debug(f"Decompressing with: {' '.join(command)}")
+
+    # The decompressor's warnings go to a file rather than a pipe. A full stderr pipe that nobody
+    # is reading would block the decompressor, while we wait on its output.
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(command + [archive_path], stdout=subprocess.PIPE, stderr=stderr_file)
+        error = None
+        killed = False
+        try:
+            _extract_tar_stream(proc.stdout, dest_dir)
+
+            # Drain any padding after the end of the tar data, so the decompressor can finish cleanly.
+            while proc.stdout.read(1024 * 1024):
+                pass
+        except Exception as exc:
+            error = exc
+            # If the decompressor closed its output, it's finished and can say what went wrong.
+            # Otherwise the tar data itself is bad, so stop it.
+            if proc.stdout.read1(1024 * 1024) != b"" and proc.poll() == None:
+                proc.kill()
+                killed = True
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+    # A decompressor that failed on its own (rather than being killed) explains the failure
+    # better than the tar error for its truncated output.
+    if proc.returncode != 0 and not killed:
+        raise RuntimeError(
+            f"{command[0]} failed to decompress {archive_path}: {stderr.decode('utf-8', 'replace').strip()}"
+        ) from error
+    if error != None:
+        raise error
@@ -0,0 +1,178 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides a cache of built recipes, so identical builds needn't be repeated.
+
+The files a recipe installed are packed into a gzip-compressed tarball, named for the recipe
+and its build fingerprint:
+
+    <cache>/<recipe name>/<fingerprint>.tar.gz
+
+A cache may be a local directory, which may be shared over a network file system, or an HTTP(S)
+server. Artifacts are downloaded from an HTTP cache with GET requests and uploaded with PUT
+requests, so any web server that supports PUT (e.g. nginx with the WebDAV module) will do.
+A server that only supports GET still works as a read-only cache.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tarfile
+import tempfile
+from typing import *
+import urllib.parse
+import urllib.request
+
+import requests
+
+from mussels.utils.archives import extract_archive
+from mussels.utils.download import CONNECT_TIMEOUT, READ_TIMEOUT, download_file
+from mussels.utils.fileops import move_tree, remove_tree
+
+ARTIFACT_SUFFIX = ".tar.gz"
+
+
+def artifact_name(name: str, fingerprint: str) -> str:
+    """
+    Get the path of an artifact within a cache.
+    """
+    return f"{name}/{fingerprint}{ARTIFACT_SUFFIX}"
+
+
+def pack_artifact(root: str, paths: Iterable[str], archive_path: str) -> None:
+    """
+    Pack files into an artifact tarball.
+
+    Args:
+        root:           The directory the files were installed to.
+        paths:          The files to pack, relative to `root`.
+        archive_path:   The tarball to create.
+    """
+    with tarfile.open(archive_path, "w:gz") as tar:
+        for path in sorted(paths):
+            tar.add(os.path.join(root, path), arcname=path, recursive=False)
+
+
+def unpack_artifact(archive_path: str, root: str) -> None:
+    """
+    Unpack an artifact tarball into an install directory.
+
+    The tarball is extracted to a temporary directory next to the install directory first, so a
+    corrupt artifact doesn't leave a partial install behind.
+    """
+    staging_parent = os.path.join(root, ".mussels")
+    os.makedirs(staging_parent, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix="artifact-", dir=staging_parent)
+
+    try:
+        extract_archive(archive_path, staging_dir, archive=ARTIFACT_SUFFIX)
+        move_tree(staging_dir, root)
+    finally:
+        remove_tree(staging_dir)
+
+
+class LocalArtifactCache(object):
+    """
+    An artifact cache in a local (or network mounted) directory.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.location = self.path
+
+    def fetch(self, name: str, archive_path: str) -> bool:
+        """
+        Copy an artifact out of the cache.
+
+        Returns:    True if the artifact was found, else False.
+        """
+        cached_path = os.path.join(self.path, *name.split("/"))
+        if not os.path.isfile(cached_path):
+            return False
+
+        shutil.copyfile(cached_path, archive_path)
+        return True
+
+    def store(self, name: str, archive_path: str) -> None:
+        """
+        Copy an artifact into the cache.
+
+        The artifact is copied to a temporary file and then renamed, so other machines sharing the
+        cache never see a partial artifact.
+        """
+        cached_path = os.path.join(self.path, *name.split("/"))
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+
+        temp_path = f"{cached_path}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(archive_path, temp_path)
+            os.replace(temp_path, cached_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class HttpArtifactCache(object):
+    """
+    An artifact cache on an HTTP(S) server.
+    """
+
+    def __init__(self, url: str, session: Optional[requests.Session] = None) -> None:
+        self.url = url.rstrip("/") + "/"
+        self.location = url
+        self.session = session
+
+    def fetch(self, name: str, archive_path: str) -> bool:
+        """
+        Download an artifact from the cache.
+
+        Returns:    True if the artifact was found, else False.
+        """
+        # A missing artifact is the common case, so don't log it or wait to retry it.
+        return download_file(
+            urllib.parse.urljoin(self.url, name), archive_path, session=self.session, retries=0
+        )
+
+    def store(self, name: str, archive_path: str) -> None:
+        """
+        Upload an artifact to the cache.
+        """
+        putter = self.session if self.session != None else requests
+
+        with open(archive_path, "rb") as archive:
+            r = putter.put(
+                urllib.parse.urljoin(self.url, name),
+                data=archive,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        r.raise_for_status()
+
+
+def open_artifact_cache(location: str, session: Optional[requests.Session] = None):
+    """
+    Open an artifact cache.
+
+    Args:
+        location:   An http:// or https:// URL, a file:// URL, or a directory path.
+        session:    (optional) A requests Session to use for an HTTP(S) cache.
+
+    Returns:    A LocalArtifactCache or an HttpArtifactCache.
+    """
+    if location.startswith("http://") or location.startswith("https://"):
+        return HttpArtifactCache(location, session=session)
+
+    if location.startswith("file://"):
+        return LocalArtifactCache(urllib.request.url2pathname(urllib.parse.urlparse(location).path))
+
+    return LocalArtifactCache(location)
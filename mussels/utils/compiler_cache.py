@@ -0,0 +1,149 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides support for compiler caches (ccache and sccache) in build scripts.
+
+A compiler cache sits in front of the compiler, and reuses the output of an earlier compile
+when the same source is compiled again with the same options. This speeds up rebuilds, even
+in a fresh work directory.
+
+Build scripts may use these variables, which are empty if no compiler cache is in use:
+
+    {compiler_cache}    The compiler cache program, to put in front of the compiler.
+                        For example: CC="{compiler_cache} gcc"
+    {cmake_launcher}    CMake options to use the compiler cache as the compiler launcher.
+                        For example: cmake .. {cmake_launcher}
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import subprocess
+from typing import *
+
+from mussels.tool import BaseTool
+
+# Supported compiler caches, in order of preference.
+COMPILER_CACHES = ["ccache", "sccache"]
+
+# Build script variables when no compiler cache is in use.
+DISABLED_VARIABLES = {"compiler_cache": "", "cmake_launcher": ""}
+
+STATS_TIMEOUT = 30.0  # seconds
+
+
+def compiler_cache_tool(name: str) -> type:
+    """
+    Create a tool class to detect a compiler cache, for when no cookbook provides one.
+    """
+    return type(
+        f"{name}_tool",
+        (BaseTool,),
+        {
+            "name": name,
+            "version": "",
+            "platforms": {"Posix": {"path_checks": [name]}, "Windows": {"path_checks": [name]}},
+        },
+    )
+
+
+class CompilerCache(object):
+    """
+    A compiler cache program that build scripts can use.
+    """
+
+    def __init__(self, name: str, path: str) -> None:
+        self.name = name
+        self.path = path
+
+    def variables(self) -> dict:
+        """
+        Get the build script variables for this compiler cache.
+        """
+        path = self.path.replace("\\", "/")
+        return {
+            "compiler_cache": path,
+            "cmake_launcher": f"-DCMAKE_C_COMPILER_LAUNCHER={path} -DCMAKE_CXX_COMPILER_LAUNCHER={path}",
+        }
+
+    def _run(self, args: list) -> Optional[str]:
+        try:
+            completed = subprocess.run(
+                [self.path] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=STATS_TIMEOUT,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+        if completed.returncode != 0:
+            return None
+        return completed.stdout.decode("utf-8", errors="replace")
+
+    def stats(self) -> Optional[dict]:
+        """
+        Get the compiler cache's running totals of cache hits and misses.
+
+        Returns:    A dictionary with "hits" and "misses" counts, or None if they couldn't be read.
+        """
+        if self.name == "sccache":
+            output = self._run(["--show-stats", "--stats-format=json"])
+            if output == None:
+                return None
+            try:
+                stats = json.loads(output)["stats"]
+                return {
+                    "hits": sum(stats["cache_hits"]["counts"].values()),
+                    "misses": sum(stats["cache_misses"]["counts"].values()),
+                }
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return None
+
+        # ccache 4 has machine readable statistics.
+        output = self._run(["--print-stats"])
+        if output != None:
+            counters = {}
+            for line in output.splitlines():
+                fields = line.split("\t")
+                if len(fields) == 2 and fields[1].strip().isdigit():
+                    counters[fields[0].strip()] = int(fields[1])
+            return {
+                "hits": counters.get("direct_cache_hit", 0) + counters.get("preprocessed_cache_hit", 0),
+                "misses": counters.get("cache_miss", 0),
+            }
+
+        # Older versions only have a summary for people to read.
+        output = self._run(["-s"])
+        if output == None:
+            return None
+        hits = 0
+        misses = 0
+        for line in output.splitlines():
+            label, _, count = line.rpartition(" ")
+            if not count.strip().isdigit():
+                continue
+            if label.strip().startswith("cache hit"):
+                hits += int(count)
+            elif label.strip() == "cache miss":
+                misses += int(count)
+        return {"hits": hits, "misses": misses}
+
+
+def stats_difference(before: Optional[dict], after: Optional[dict]) -> Optional[dict]:
+    """
+    Get the cache hits and misses between two readings of `CompilerCache.stats()`.
+    """
+    if before == None or after == None:
+        return None
+    return {key: max(after[key] - before[key], 0) for key in ("hits", "misses")}
@@ -0,0 +1,481 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides helpers to download source archives.
+
+Downloads are streamed to disk in fixed-size chunks so memory use stays constant no matter
+how large the archive is. Each download is written to a temporary ".part" file that is only
+renamed to the final path once it is complete, so an interrupted download never looks like
+a finished one.
+
+HTTP(S) downloads may share a pooled session from `create_session()`, so that several archives
+from the same host reuse connections instead of paying for a new TCP and TLS handshake each.
+
+Downloaded archives are kept in a content-addressed store, keyed by their SHA256 digest:
+
+    <download_dir>/by-hash/sha256/<digest>      archive contents
+    <download_dir>/by-url/<sha256 of the URI>   JSON record of the digest last fetched from a URI
+
+Identical archives are stored once, no matter which recipe or cookbook they came from, and
+archives with the same file name from different URIs no longer collide.
+
+Failed downloads are retried with exponential backoff. A retry continues from the end of the
+".part" file, using an HTTP Range request or an FTP REST command, if the server supports it.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import ftplib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import *
+import urllib.parse
+import urllib.request
+
+import requests
+import requests.adapters
+
+CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 5.0  # seconds
+CONNECT_TIMEOUT = 30.0  # seconds
+READ_TIMEOUT = 300.0  # seconds
+DEFAULT_RETRIES = 3
+BACKOFF = 1.0  # seconds, doubled after each failed attempt
+MAX_BACKOFF = 60.0  # seconds
+POOL_SIZE = 10  # connections per host
+
+
+class FatalDownloadError(Exception):
+    """
+    A download failure that won't be fixed by trying again, like a 404.
+    """
+
+
+def format_size(num_bytes: float) -> str:
+    """
+    Format a number of bytes for humans.
+    """
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if num_bytes < 1024 or unit == "GiB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} {unit}"
+        num_bytes /= 1024
+    return ""
+
+
+class Progress(object):
+    """
+    Log the progress and throughput of a download every so often.
+    """
+
+    def __init__(self, name: str, total: int = 0, logger: logging.Logger = None) -> None:
+        self.name = name
+        self.total = total
+        self.logger = logger
+        self.received = 0
+        self.resumed_from = 0
+        self.start = time.time()
+        self.last_report = self.start
+
+    def restart(self, offset: int) -> None:
+        """
+        Start (or resume) a download attempt, with `offset` bytes already on disk.
+        """
+        self.total = 0
+        self.received = offset
+        self.resumed_from = offset
+        self.start = time.time()
+        self.last_report = self.start
+
+    def update(self, num_bytes: int) -> None:
+        self.received += num_bytes
+
+        now = time.time()
+        if self.logger != None and now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            rate = (self.received - self.resumed_from) / max(now - self.start, 1e-6)
+
+            if self.total > 0:
+                self.logger.info(
+                    f"    {self.name}: {format_size(self.received)} of {format_size(self.total)} "
+                    f"({100 * self.received // self.total}%), {format_size(rate)}/s"
+                )
+            else:
+                self.logger.info(
+                    f"    {self.name}: {format_size(self.received)}, {format_size(rate)}/s"
+                )
+
+    def finish(self) -> None:
+        elapsed = time.time() - self.start
+        rate = (self.received - self.resumed_from) / max(elapsed, 1e-6)
+        if self.logger != None:
+            self.logger.info(
+                f"    {self.name}: {format_size(self.received)} in {elapsed:.1f}s ({format_size(rate)}/s)"
+            )
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """
+    Create an HTTP session with connection pooling and keep-alive, to share across downloads.
+
+    The session may be used from several threads at once. Each host gets a pool of up to
+    `pool_size` connections, and a download that needs a connection while all of them are in
+    use waits for one to be returned, rather than opening a connection that won't be reused.
+
+    Retries are handled by `download_file()`, so that they can resume partial downloads.
+    """
+    session = requests.Session()
+
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True, max_retries=0
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def _partial_size(part_path: str) -> int:
+    """
+    Get the number of bytes already downloaded to a ".part" file.
+    """
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+
+def _stream_http(uri: str, part_path: str, progress: Progress, session, chunk_size: int) -> None:
+    """
+    Stream an HTTP(S) download to a file, resuming a partial download if the server allows it.
+    """
+    getter = session if session != None else requests
+
+    offset = _partial_size(part_path)
+
+    # The file's bytes as they are on the server: Content-Length and Range count encoded bytes,
+    # and a .tar.gz served with "Content-Encoding: gzip" mustn't be decompressed.
+    headers = {"Accept-Encoding": "identity"}
+    if offset > 0:
+        headers["Range"] = f"bytes={offset}-"
+
+    with getter.get(
+        uri, stream=True, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    ) as r:
+        if r.status_code == 416:
+            # The partial file isn't a prefix of what's on the server any more. Start over.
+            os.remove(part_path)
+            raise IOError("Partial download could not be resumed, restarting")
+
+        if 400 <= r.status_code < 500 and r.status_code not in [408, 429]:
+            raise FatalDownloadError(f"HTTP {r.status_code}")
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            if not r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                # Not the range that was asked for, so it can't be appended. Start over.
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise IOError(
+                    f"Server sent an unexpected range ({r.headers.get('Content-Range', 'none')}), restarting"
+                )
+            mode = "ab"
+        else:
+            # The server sent the whole file.
+            offset = 0
+            mode = "wb"
+
+        progress.restart(offset)
+        length = int(r.headers.get("Content-Length", 0) or 0)
+        progress.total = offset + length if length > 0 else 0
+
+        if offset > 0 and progress.logger != None:
+            progress.logger.info(f"    {progress.name}: resuming at {format_size(offset)}")
+
+        with open(part_path, mode) as f:
+            for chunk in r.raw.stream(chunk_size, decode_content=False):
+                if chunk:
+                    f.write(chunk)
+                    progress.update(len(chunk))
+
+    if progress.total > 0 and progress.received != progress.total:
+        raise IOError(
+            f"Incomplete download: received {progress.received} of {progress.total} bytes"
+        )
+
+
+def _stream_ftp(uri: str, part_path: str, progress: Progress, chunk_size: int) -> None:
+    """
+    Stream an FTP download to a file, resuming a partial download with the REST command.
+    """
+    url = urllib.parse.urlparse(uri)
+    path = urllib.parse.unquote(url.path)
+
+    offset = _partial_size(part_path)
+
+    with ftplib.FTP(timeout=READ_TIMEOUT) as ftp:
+        ftp.connect(url.hostname, url.port or 21)
+        ftp.login(
+            urllib.parse.unquote(url.username or "anonymous"),
+            urllib.parse.unquote(url.password or ""),
+        )
+        ftp.voidcmd("TYPE I")
+
+        try:
+            size = ftp.size(path) or 0
+        except ftplib.error_perm as exc:
+            if str(exc).startswith("550"):
+                raise FatalDownloadError(str(exc))
+            size = 0
+
+        if size > 0 and offset >= size:
+            # Bigger than the file on the server, so it's not a partial copy of it.
+            offset = 0
+
+        if offset > 0:
+            try:
+                conn = ftp.transfercmd(f"RETR {path}", rest=offset)
+            except (ftplib.error_reply, ftplib.error_perm):
+                # The server doesn't support REST. Start over.
+                offset = 0
+                conn = ftp.transfercmd(f"RETR {path}")
+        else:
+            conn = ftp.transfercmd(f"RETR {path}")
+
+        progress.restart(offset)
+        progress.total = size
+
+        if offset > 0 and progress.logger != None:
+            progress.logger.info(f"    {progress.name}: resuming at {format_size(offset)}")
+
+        with conn, open(part_path, "ab" if offset > 0 else "wb") as f:
+            while True:
+                chunk = conn.recv(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                progress.update(len(chunk))
+
+        ftp.voidresp()
+
+    if progress.total > 0 and progress.received != progress.total:
+        raise IOError(
+            f"Incomplete download: received {progress.received} of {progress.total} bytes"
+        )
+
+
+def _stream_url(uri: str, part_path: str, progress: Progress, chunk_size: int) -> None:
+    """
+    Stream a download for any other urllib-supported scheme to a file.
+    """
+    with urllib.request.urlopen(uri, timeout=READ_TIMEOUT) as r:
+        progress.restart(0)
+        progress.total = int(r.headers.get("Content-Length", 0) or 0)
+
+        with open(part_path, "wb") as f:
+            while True:
+                chunk = r.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                progress.update(len(chunk))
+
+
+def download_file(
+    uri: str,
+    path: str,
+    logger: logging.Logger = None,
+    session: Optional[requests.Session] = None,
+    chunk_size: int = CHUNK_SIZE,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = BACKOFF,
+) -> bool:
+    """
+    Download a file, streaming it to disk in fixed-size chunks.
+
+    The file is downloaded to "<path>.part" and renamed to `path` once complete.
+    If the download fails, it's retried with exponential backoff. Each retry continues from
+    the end of the ".part" file, if the server supports it. The ".part" file is kept if every
+    attempt fails, so the next download can pick up where this one left off.
+
+    Args:
+        uri:        The URI to download.
+        path:       Where to save the file.
+        logger:     (optional) Logger for progress messages.
+        session:    (optional) A requests Session to use for HTTP(S) downloads.
+        chunk_size: (optional) Number of bytes to read and write at a time.
+        retries:    (optional) Number of times to retry a failed download.
+        backoff:    (optional) Seconds to wait before the first retry. Doubles with each retry.
+
+    Returns:    True if the download succeeded, else False.
+    """
+    part_path = f"{path}.part"
+    progress = Progress(os.path.basename(path), logger=logger)
+
+    attempts = max(retries, 0) + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            if uri.startswith("http"):
+                _stream_http(uri, part_path, progress, session, chunk_size)
+            elif uri.startswith("ftp"):
+                _stream_ftp(uri, part_path, progress, chunk_size)
+            else:
+                _stream_url(uri, part_path, progress, chunk_size)
+
+            os.replace(part_path, path)
+            break
+
+        except FatalDownloadError as exc:
+            if logger != None:
+                logger.info(f"Failed to download {uri}, {exc}!")
+            return False
+
+        except Exception as exc:
+            if attempt == attempts:
+                if logger != None:
+                    logger.info(f"Failed to download {uri} after {attempts} attempt(s), {exc}!")
+                return False
+
+            delay = min(backoff * 2 ** (attempt - 1), MAX_BACKOFF)
+            if logger != None:
+                logger.warning(
+                    f"Download attempt {attempt} of {attempts} failed, {exc}. Retrying in {delay:.1f}s..."
+                )
+            time.sleep(delay)
+
+    progress.finish()
+    return True
+
+
+# Recipes from different cookbooks may fetch the same URI at the same time.
+_uri_locks: dict = {}
+_uri_locks_lock = threading.Lock()
+
+
+def uri_lock(uri: str) -> threading.Lock:
+    """
+    Get the lock that serializes fetches of a URI within this process.
+    """
+    with _uri_locks_lock:
+        if uri not in _uri_locks:
+            _uri_locks[uri] = threading.Lock()
+        return _uri_locks[uri]
+
+
+def sha256_file(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Hash a file, reading it in fixed-size chunks.
+
+    Returns:    The hex SHA256 digest.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_sha256(digest: str) -> bool:
+    """
+    Check if a string looks like a hex SHA256 digest.
+    """
+    return (
+        isinstance(digest, str)
+        and len(digest) == 64
+        and all(c in "0123456789abcdef" for c in digest.lower())
+    )
+
+
+def store_path(download_dir: str, digest: str) -> str:
+    """
+    Get the path of an archive in the content-addressed store.
+    """
+    return os.path.join(download_dir, "by-hash", "sha256", digest.lower())
+
+
+def _uri_record_path(download_dir: str, uri: str) -> str:
+    return os.path.join(
+        download_dir, "by-url", hashlib.sha256(uri.encode("utf-8")).hexdigest()
+    )
+
+
+def lookup_uri(download_dir: str, uri: str) -> str:
+    """
+    Get the digest of the archive last fetched from a URI.
+
+    Returns:    The hex SHA256 digest, or "" if the URI hasn't been fetched.
+    """
+    try:
+        with open(_uri_record_path(download_dir, uri), "r") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return ""
+
+    if record.get("uri") != uri or not is_sha256(record.get("sha256", "")):
+        return ""
+    return record["sha256"]
+
+
+def record_uri(download_dir: str, uri: str, digest: str) -> None:
+    """
+    Record the digest of the archive fetched from a URI.
+    """
+    record_path = _uri_record_path(download_dir, uri)
+    os.makedirs(os.path.dirname(record_path), exist_ok=True)
+
+    tmp_path = f"{record_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"uri": uri, "sha256": digest}, f)
+    os.replace(tmp_path, record_path)
+
+
+def add_to_store(download_dir: str, path: str, digest: str, keep: bool = False) -> str:
+    """
+    Add a file to the content-addressed store, under a digest the caller has already verified.
+
+    If the store already has the file, the new copy is discarded.
+
+    Args:
+        download_dir:   The download directory that holds the store.
+        path:           The file to add.
+        digest:         The hex SHA256 digest of the file.
+        keep:           (optional) Copy the file into the store, rather than moving it.
+
+    Returns:    The path of the file in the store.
+    """
+    stored_path = store_path(download_dir, digest)
+    os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+
+    if os.path.exists(stored_path):
+        if not keep:
+            os.remove(path)
+        return stored_path
+
+    if keep:
+        tmp_path = f"{stored_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, stored_path)
+    else:
+        os.replace(path, stored_path)
+
+    return stored_path
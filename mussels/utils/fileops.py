@@ -0,0 +1,337 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides helpers to copy files and directory trees quickly.
+
+Where the filesystem supports it (e.g. Btrfs, XFS), files are copied with a reflink, which
+shares the data blocks with the original until either copy is modified. Otherwise the bytes
+are copied.
+
+Files from a source that's never modified may also be hardlinked when a reflink isn't
+possible. Files from a build directory are copied instead, since an in-place rebuild would
+change the installed file too. Whether each kind of link works is remembered for each pair of
+devices, so an unsupported link is only attempted once.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import filecmp
+import os
+import shutil
+import stat
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Linux ioctl to clone a file's data blocks into another file.
+FICLONE = 0x40049409
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Max number of files to install at once.
+INSTALL_JOBS = 8
+
+# Whether reflinks and hardlinks work between a (source device, destination device) pair.
+_reflink_works: dict = {}
+_hardlink_works: dict = {}
+_link_support_lock = threading.Lock()
+
+
+def reflink_file(src: str, dst: str) -> bool:
+    """
+    Try to copy a file with a reflink.
+
+    Returns:    True if the file was reflinked, else False (and `dst` is left alone).
+    """
+    if fcntl == None or not hasattr(os, "O_CLOEXEC"):
+        return False
+
+    with open(src, "rb") as src_file:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o600)
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_file.fileno())
+        except OSError:
+            os.close(dst_fd)
+            os.remove(dst)
+            return False
+        os.close(dst_fd)
+
+    return True
+
+
+def copy_file(src: str, dst: str, writable: bool = False) -> None:
+    """
+    Copy a file, its permissions, and its timestamps, using a reflink if possible.
+
+    Timestamps are kept so that build systems like make don't think the copy is out of date.
+
+    Args:
+        src:        The file to copy.
+        dst:        The path to copy it to. Must not exist.
+        writable:   (optional) Make the copy writable by its owner, even if the original isn't.
+    """
+    if not reflink_file(src, dst):
+        with open(src, "rb") as src_file, open(dst, "xb") as dst_file:
+            shutil.copyfileobj(src_file, dst_file, COPY_BUFFER_SIZE)
+
+    shutil.copystat(src, dst)
+
+    if writable:
+        os.chmod(dst, os.stat(dst).st_mode | stat.S_IWUSR)
+
+
+def clone_tree(src: str, dst: str, writable: bool = False) -> None:
+    """
+    Copy a directory tree, using reflinks if possible. Symlinks are copied as symlinks.
+
+    Files are never hardlinked, so the copy may be modified without changing the original.
+
+    Args:
+        src:        The directory to copy.
+        dst:        The directory to copy it to. May already exist.
+        writable:   (optional) Make the copied files writable by their owner, even if the originals aren't.
+    """
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel_dir = os.path.relpath(dirpath, src)
+        dst_dir = os.path.normpath(os.path.join(dst, rel_dir))
+        os.makedirs(dst_dir, exist_ok=True)
+
+        for name in dirnames + filenames:
+            src_path = os.path.join(dirpath, name)
+            dst_path = os.path.join(dst_dir, name)
+
+            if name in filenames and os.path.lexists(dst_path):
+                os.remove(dst_path)
+
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+                if name in dirnames:
+                    # Don't descend into the link's target.
+                    dirnames.remove(name)
+            elif name in filenames:
+                copy_file(src_path, dst_path, writable=writable)
+
+    # Directory timestamps change as files are added, so set them last. Deepest first.
+    for dirpath, dirnames, _ in sorted(os.walk(src), key=lambda walk: -walk[0].count(os.sep)):
+        if dirpath == src:
+            # Leave the destination directory itself alone.
+            continue
+        dst_dir = os.path.normpath(os.path.join(dst, os.path.relpath(dirpath, src)))
+        shutil.copystat(dirpath, dst_dir)
+        if writable:
+            os.chmod(dst_dir, os.stat(dst_dir).st_mode | stat.S_IWUSR)
+
+
+def make_read_only(path: str) -> None:
+    """
+    Remove write permissions from every file in a directory tree.
+
+    Directories are left writable, so the tree can still be deleted.
+    """
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            file_path = os.path.join(dirpath, name)
+            if not os.path.islink(file_path):
+                mode = os.stat(file_path).st_mode
+                os.chmod(file_path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def remove_tree(path: str) -> None:
+    """
+    Delete a directory tree, including read-only files.
+    """
+
+    def make_writable_and_retry(function, failed_path, exc_info):
+        parent = os.path.dirname(failed_path)
+        os.chmod(parent, os.stat(parent).st_mode | stat.S_IRWXU)
+        if not os.path.islink(failed_path):
+            os.chmod(failed_path, os.stat(failed_path).st_mode | stat.S_IRWXU)
+        function(failed_path)
+
+    shutil.rmtree(path, onerror=make_writable_and_retry)
+
+
+def move_tree(src: str, dst: str) -> list:
+    """
+    Move the files in a directory tree into another directory, replacing what's there.
+    Symlinks are moved as symlinks. Files that aren't in the source are left alone.
+
+    A file with the same content and permissions as the one it would replace isn't moved, so the
+    installed file keeps its timestamps. Files are renamed into place, or copied if the
+    directories are on different filesystems.
+
+    Returns:    The paths of the files and symlinks in the source, relative to `src`.
+    """
+    moved = []
+
+    for dirpath, dirnames, filenames in os.walk(src):
+        dst_dir = os.path.normpath(os.path.join(dst, os.path.relpath(dirpath, src)))
+        if os.path.lexists(dst_dir) and not os.path.isdir(dst_dir):
+            os.remove(dst_dir)
+        os.makedirs(dst_dir, exist_ok=True)
+
+        for name in list(dirnames) + filenames:
+            src_path = os.path.join(dirpath, name)
+            if name in dirnames and not os.path.islink(src_path):
+                continue
+            if name in dirnames:
+                # Don't descend into the link's target.
+                dirnames.remove(name)
+
+            dst_path = os.path.join(dst_dir, name)
+            moved.append(os.path.relpath(src_path, src))
+
+            if (
+                not os.path.islink(src_path)
+                and not os.path.islink(dst_path)
+                and os.path.isfile(dst_path)
+                and stat.S_IMODE(os.stat(src_path).st_mode) == stat.S_IMODE(os.stat(dst_path).st_mode)
+                and filecmp.cmp(src_path, dst_path, shallow=False)
+            ):
+                continue
+
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                remove_tree(dst_path)
+            try:
+                os.replace(src_path, dst_path)
+            except OSError as exc:
+                if exc.errno != errno.EXDEV:
+                    raise
+                if os.path.lexists(dst_path):
+                    os.remove(dst_path)
+                shutil.copy2(src_path, dst_path, follow_symlinks=False)
+                os.remove(src_path)
+
+    return moved
+
+
+def _devices(src: str, dst: str) -> tuple:
+    return os.stat(src).st_dev, os.stat(os.path.dirname(dst) or ".").st_dev
+
+
+def install_file(src: str, dst: str, hardlink: bool = False) -> str:
+    """
+    Install a file by reflink if possible, else by hardlink if allowed and possible, else by
+    copying it.
+
+    If the destination already has the same content, it's left alone.
+
+    Args:
+        src:        The file to install.
+        dst:        Where to install it.
+        hardlink:   Allow a hardlink. Only if `src` won't be modified, or `dst` would change too.
+
+    Returns:    How the file was installed: "unchanged", "reflinked", "hardlinked", or "copied".
+    """
+    if os.path.lexists(dst):
+        if os.path.isdir(dst) and not os.path.islink(dst):
+            remove_tree(dst)
+        elif (
+            not os.path.islink(dst)
+            and os.path.isfile(dst)
+            and (os.path.samefile(src, dst) or filecmp.cmp(src, dst, shallow=False))
+        ):
+            return "unchanged"
+        else:
+            os.remove(dst)
+
+    devices = _devices(src, dst)
+
+    if _reflink_works.get(devices, True):
+        if reflink_file(src, dst):
+            shutil.copystat(src, dst)
+            return "reflinked"
+        with _link_support_lock:
+            _reflink_works[devices] = False
+
+    if hardlink and _hardlink_works.get(devices, True):
+        try:
+            os.link(src, dst)
+            return "hardlinked"
+        except OSError:
+            with _link_support_lock:
+                _hardlink_works[devices] = False
+
+    shutil.copy2(src, dst)
+    return "copied"
+
+
+def install_tree(src: str, dst: str, jobs: int = INSTALL_JOBS, hardlink: bool = False) -> dict:
+    """
+    Make a directory tree match another, installing files with `install_file()`.
+
+    Files that already match are left alone, and files that aren't in the source are removed.
+    Files are installed in parallel.
+
+    Returns:    A dictionary counting how many files were installed each way.
+    """
+    file_pairs = []
+    expected: set = set()
+
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel_dir = os.path.relpath(dirpath, src)
+        dst_dir = os.path.normpath(os.path.join(dst, rel_dir))
+        if os.path.lexists(dst_dir) and not os.path.isdir(dst_dir):
+            os.remove(dst_dir)
+        os.makedirs(dst_dir, exist_ok=True)
+
+        for name in dirnames + filenames:
+            src_path = os.path.join(dirpath, name)
+            dst_path = os.path.join(dst_dir, name)
+            expected.add(os.path.normcase(dst_path))
+
+            if os.path.islink(src_path):
+                link_target = os.readlink(src_path)
+                if os.path.islink(dst_path) and os.readlink(dst_path) == link_target:
+                    pass
+                else:
+                    if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                        remove_tree(dst_path)
+                    elif os.path.lexists(dst_path):
+                        os.remove(dst_path)
+                    os.symlink(link_target, dst_path)
+
+                if name in dirnames:
+                    # Don't descend into the link's target.
+                    dirnames.remove(name)
+            elif name in filenames:
+                file_pairs.append((src_path, dst_path))
+
+    # Remove anything left over from a prior install that isn't in the source any more.
+    for dirpath, dirnames, filenames in os.walk(dst, topdown=True):
+        for name in list(dirnames) + filenames:
+            dst_path = os.path.join(dirpath, name)
+            if os.path.normcase(dst_path) in expected:
+                continue
+
+            if name in dirnames:
+                dirnames.remove(name)
+                if os.path.islink(dst_path):
+                    os.remove(dst_path)
+                else:
+                    remove_tree(dst_path)
+            else:
+                os.remove(dst_path)
+
+    counts: dict = {"unchanged": 0, "reflinked": 0, "hardlinked": 0, "copied": 0}
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        for how in executor.map(lambda pair: install_file(*pair, hardlink=hardlink), file_pairs):
+            counts[how] += 1
+
+    return counts
@@ -0,0 +1,288 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides helpers to order and schedule the recipes of a dependency graph.
+
+A dependency graph is a dictionary mapping each node (e.g. a recipe NVC) to the set of
+nodes it depends on.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import heapq
+import json
+import time
+from typing import *
+
+
+def strongly_connected_components(graph: dict) -> list:
+    """
+    Find the strongly connected components of a dependency graph, using Tarjan's algorithm.
+
+    A component is a set of nodes that all depend on each other, directly or indirectly. In a
+    graph without circular dependencies, every node is a component by itself. The graph is
+    walked without recursion, so deep graphs don't hit Python's recursion limit.
+
+    :return: list of sets of nodes. Each component comes after the components it depends on.
+    """
+    index: dict = {}
+    lowlink: dict = {}
+    stack: list = []
+    on_stack: set = set()
+    components: list = []
+
+    def discover(node) -> None:
+        index[node] = len(index)
+        lowlink[node] = index[node]
+        stack.append(node)
+        on_stack.add(node)
+
+    for root in graph:
+        if root in index:
+            continue
+
+        discover(root)
+        work = [(root, iter(graph.get(root, ())))]
+
+        while work:
+            node, deps = work[-1]
+
+            for dep in deps:
+                if dep not in index:
+                    # Visit the dependency, then carry on with this node's next dependency.
+                    discover(dep)
+                    work.append((dep, iter(graph.get(dep, ()))))
+                    break
+                elif dep in on_stack:
+                    lowlink[node] = min(lowlink[node], index[dep])
+            else:
+                # Every dependency of this node has been visited.
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def find_cycles(graph: dict) -> list:
+    """
+    Find the circular dependencies in a dependency graph.
+
+    :return: list of sets of nodes that depend on each other. Empty if there are none.
+    """
+    return [
+        component
+        for component in strongly_connected_components(graph)
+        if len(component) > 1 or any(node in graph.get(node, ()) for node in component)
+    ]
+
+
+def get_batches(graph: dict) -> list:
+    """
+    Group the nodes of a dependency graph into batches that can be built concurrently.
+    Every node in a batch depends only on nodes from earlier batches.
+
+    :return: list of sets of nodes.
+    """
+    dependents: defaultdict = defaultdict(set)
+    waiting_on = {}
+    for node, deps in graph.items():
+        waiting_on[node] = len(deps)
+        for dep in deps:
+            dependents[dep].add(node)
+
+    batches = []
+
+    # Get all nodes with no dependencies
+    ready = {node for node, count in waiting_on.items() if count == 0}
+
+    while ready:
+        batches.append(ready)
+
+        # The nodes that depend on this batch may be ready for the next one.
+        next_ready = set()
+        for node in ready:
+            for dependent in dependents[node]:
+                waiting_on[dependent] -= 1
+                if waiting_on[dependent] == 0:
+                    next_ready.add(dependent)
+        ready = next_ready
+
+    # If any nodes are left, we have a loop in the graph
+    # (or a dependency that isn't in the graph at all).
+    remaining = {node: set(graph[node]) for node, count in waiting_on.items() if count > 0}
+    if remaining:
+        msg = "Circular dependencies found!\n"
+        msg += json.dumps({str(node): [str(dep) for dep in deps] for node, deps in remaining.items()}, indent=4)
+        raise ValueError(msg)
+
+    # Return the list of batches
+    return batches
+
+
+def critical_path_lengths(graph: dict, weights: dict = {}) -> dict:
+    """
+    Determine the critical path length of each node in a dependency graph.
+
+    That is the node's own weight plus the weight of the heaviest chain of nodes that depend on it.
+    Starting the nodes with the longest critical path first keeps the longest chain moving.
+
+    Args:
+        graph:      A dependency graph.
+        weights:    (optional) Expected cost of each node. Nodes without a weight cost 1.
+
+    :return: dictionary mapping each node to its critical path length.
+    """
+    dependents: defaultdict = defaultdict(set)
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].add(node)
+
+    lengths: dict = {}
+
+    # Visit nodes in reverse build order, so every dependent has been measured first.
+    for batch in reversed(get_batches(graph)):
+        for node in batch:
+            lengths[node] = weights.get(node, 1) + max(
+                [lengths[dependent] for dependent in dependents[node]], default=0
+            )
+
+    return lengths
+
+
+def run_graph(
+    graph: dict,
+    build: Callable[[Any], bool],
+    jobs: int = 1,
+    weights: dict = {},
+    logger=None,
+) -> dict:
+    """
+    Build every node in a dependency graph, starting each node as soon as its own dependencies are done.
+
+    Ready nodes are started in order of their critical path length, longest first.
+    Raises ValueError if the graph has a circular dependency.
+    If a build fails no new builds are started, but builds that are already running are allowed to finish.
+
+    Args:
+        graph:      A dependency graph.
+        build:      Function to build a node. Must return True on success.
+        jobs:       (optional) Max number of nodes to build concurrently.
+        weights:    (optional) Expected build time of each node, used to prioritize ready nodes.
+        logger:     (optional) Logger for progress messages.
+
+    :return: dictionary describing the run:
+        {
+            "succeeded"->list,      nodes that built successfully, in completion order
+            "failed"->list,         nodes that failed to build
+            "skipped"->list,        nodes that were not built due to a failure
+            "durations"->dict,      build time of each node that was built
+            "wall time"->float,     total elapsed time
+            "critical path"->float, elapsed time of the slowest dependency chain
+            "parallelism"->float,   average number of builds running at once
+        }
+    """
+    priorities = critical_path_lengths(graph, weights)
+
+    dependents: defaultdict = defaultdict(set)
+    waiting_on = {}
+    for node, deps in graph.items():
+        waiting_on[node] = len(deps)
+        for dep in deps:
+            dependents[dep].add(node)
+
+    # Heap of ready nodes. The counter keeps the ordering stable and avoids comparing nodes.
+    ready: list = []
+    counter = 0
+    for node in graph:
+        if waiting_on[node] == 0:
+            heapq.heappush(ready, (-priorities[node], counter, node))
+            counter += 1
+
+    run: dict = {
+        "succeeded": [],
+        "failed": [],
+        "skipped": [],
+        "durations": {},
+    }
+
+    def timed_build(node) -> Tuple[bool, float]:
+        start = time.time()
+        try:
+            success = build(node)
+        except Exception as exc:
+            if logger != None:
+                logger.error(f"Unexpected exception building {node}: {exc}")
+            success = False
+        return success, time.time() - start
+
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        running: dict = {}
+
+        while ready or running:
+            # Start as many ready nodes as we have workers for.
+            while ready and len(running) < max(jobs, 1) and not run["failed"]:
+                _, _, node = heapq.heappop(ready)
+                running[executor.submit(timed_build, node)] = node
+
+            if not running:
+                # A failure stopped us from starting anything else.
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                success, duration = future.result()
+                run["durations"][node] = duration
+
+                if not success:
+                    run["failed"].append(node)
+                    continue
+
+                run["succeeded"].append(node)
+                for dependent in dependents[node]:
+                    waiting_on[dependent] -= 1
+                    if waiting_on[dependent] == 0:
+                        heapq.heappush(ready, (-priorities[dependent], counter, dependent))
+                        counter += 1
+
+    run["wall time"] = time.time() - start
+
+    finished = set(run["succeeded"]) | set(run["failed"])
+    run["skipped"] = [node for node in graph if node not in finished]
+
+    # The slowest chain of builds bounds the wall time, no matter how many jobs are used.
+    built = {node: graph[node] & finished for node in finished}
+    run["critical path"] = max(
+        critical_path_lengths(built, run["durations"]).values(), default=0.0
+    )
+
+    busy_time = sum(run["durations"].values())
+    run["parallelism"] = busy_time / run["wall time"] if run["wall time"] > 0 else 1.0
+
+    return run
@@ -0,0 +1,314 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides a solver that chooses recipe and tool versions to satisfy every version
+requirement in a dependency chain at once.
+
+Mussels normally selects versions greedily: the first requirement for an item rules out the
+versions that don't satisfy it, and later requirements only choose from what's left. That fails
+when an early choice turns out to be incompatible with a later requirement, even though other
+choices would have worked. For example, if one recipe depends on zlib and another on zlib<1.2.12,
+the first requirement selects the newest zlib and the second finds nothing left to choose from.
+
+The solver searches for a consistent choice instead. It chooses a version for each item in
+the order that items are required, preferring the same versions as the greedy selection.
+When no version of an item satisfies its requirements, it records which earlier choices ruled
+the versions out (the conflict set), and jumps back to the most recent of those choices to try
+its next version, skipping the choices in between that had nothing to do with the conflict.
+This is conflict-directed backjumping. If the conflict involves no choices at all, only the
+original requirements, then no combination of versions will do, and the solver explains which
+requirements conflict.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from collections import defaultdict, namedtuple
+import heapq
+from typing import *
+
+from mussels.utils.versions import nvc_str, parse_requirement, version_satisfies
+
+# A version requirement for a recipe or a tool.
+#   kind:   "recipe" or "tool"
+#   text:   The requirement as written, e.g. "clamav:zlib<1.2.12"
+Requirement = namedtuple("Requirement", "kind cookbook name operator version text")
+
+# Max number of reasons to list when explaining why the requirements can't be satisfied.
+MAX_REASONS = 20
+
+
+def requirement(kind: str, text: str) -> Requirement:
+    """
+    Create a Requirement from a requirement string, e.g. "clamav:zlib<1.2.12".
+    """
+    return Requirement(kind, *parse_requirement(text), text)
+
+
+def satisfies(req: Requirement, choice: tuple) -> bool:
+    """
+    Check if a (version, cookbook) choice satisfies a requirement.
+
+    A local recipe or tool may stand in for one from any cookbook, the same as when versions are
+    selected greedily.
+    """
+    version, cookbook = choice
+    if req.cookbook != "" and cookbook != req.cookbook and cookbook != "local":
+        return False
+    return version_satisfies(version, req.operator, req.version)
+
+
+class Unsatisfiable(Exception):
+    """
+    Raised when no choice of versions satisfies every requirement.
+    """
+
+
+class Solver(object):
+    """
+    Choose a version and cookbook for each recipe and tool required, directly or indirectly,
+    by some requirements, such that every requirement is satisfied.
+
+    Each item is identified by a (kind, name) tuple, and each choice for an item is a
+    (version, cookbook) tuple.
+    """
+
+    def __init__(
+        self,
+        candidates: Callable[[str, str], list],
+        dependencies: Callable[[str, str, str, str], list],
+    ) -> None:
+        """
+        Args:
+            candidates:     Function(kind, name) returning the (version, cookbook) choices for
+                            an item, most preferred first.
+            dependencies:   Function(kind, name, version, cookbook) returning the Requirements
+                            of a choice, i.e. a recipe's dependencies and required tools.
+        """
+        self.candidates = candidates
+        self.dependencies = dependencies
+
+        self._candidates: dict = {}
+        self._dependencies: dict = {}
+
+    def _get_candidates(self, item: tuple) -> list:
+        if item not in self._candidates:
+            self._candidates[item] = self.candidates(*item)
+        return self._candidates[item]
+
+    def _get_dependencies(self, item: tuple, choice: tuple) -> list:
+        key = (item, choice)
+        if key not in self._dependencies:
+            self._dependencies[key] = self.dependencies(*item, *choice)
+        return self._dependencies[key]
+
+    def solve(self, requirements: list) -> dict:
+        """
+        Find a choice for every item that the requirements depend on.
+
+        Args:
+            requirements:   The Requirements to satisfy, e.g. the recipe to build.
+
+        Returns:    A dictionary mapping each (kind, name) item to the chosen (version, cookbook).
+
+        Raises:     Unsatisfiable, explaining which requirements conflict.
+        """
+        # Item -> list of (Requirement, the item whose choice imposed it, or None)
+        constraints: defaultdict = defaultdict(list)
+
+        chosen: dict = {}  # Item -> (version, cookbook)
+        order: list = []  # Items with a choice, in the order they were chosen.
+        level: dict = {}  # Item -> position in `order`
+
+        next_candidate: dict = {}  # Item -> index of the next candidate to try
+        conflicts: dict = {}  # Item -> set of earlier items that ruled out its candidates
+        reasons: dict = {}  # Item -> list of reasons its candidates were ruled out
+
+        # Items are chosen in the order they're first required, like the greedy selection.
+        first_required: dict = {}
+        queue: list = []
+
+        def describe(item: Optional[tuple]) -> str:
+            if item == None:
+                return "the build request"
+            if item in chosen:
+                return nvc_str(item[1], *chosen[item])
+            return item[1]
+
+        def add_constraint(req: Requirement, origin: Optional[tuple]) -> None:
+            item = (req.kind, req.name)
+            constraints[item].append((req, origin))
+            if item not in first_required:
+                first_required[item] = len(first_required)
+            heapq.heappush(queue, (first_required[item], item))
+
+        def next_item() -> Optional[tuple]:
+            while len(queue) > 0:
+                item = queue[0][1]
+                if item in chosen or len(constraints[item]) == 0:
+                    # Stale. It'll be queued again if it's required again.
+                    heapq.heappop(queue)
+                    continue
+                return item
+            return None
+
+        def choose(item: tuple, choice: tuple, dependencies: list) -> None:
+            chosen[item] = choice
+            level[item] = len(order)
+            order.append(item)
+            for req in dependencies:
+                add_constraint(req, item)
+
+        def unchoose(item: tuple) -> None:
+            # Withdraw the requirements this choice imposed.
+            for req in self._get_dependencies(item, chosen[item]):
+                dependency = (req.kind, req.name)
+                constraints[dependency] = [
+                    constraint for constraint in constraints[dependency] if constraint[1] != item
+                ]
+
+            order.pop()
+            level.pop(item)
+            chosen.pop(item)
+            heapq.heappush(queue, (first_required[item], item))
+
+        def forget(item: tuple) -> None:
+            next_candidate.pop(item, None)
+            conflicts.pop(item, None)
+            reasons.pop(item, None)
+
+        def try_next_candidate(item: tuple) -> Optional[tuple]:
+            """
+            Find the item's next candidate that's consistent with the choices made so far.
+            Record what ruled out the others.
+            """
+            if item not in next_candidate:
+                next_candidate[item] = 0
+                conflicts[item] = set()
+                reasons[item] = []
+
+            candidates = self._get_candidates(item)
+
+            while next_candidate[item] < len(candidates):
+                choice = candidates[next_candidate[item]]
+                next_candidate[item] += 1
+                consistent = True
+
+                for req, origin in constraints[item]:
+                    if not satisfies(req, choice):
+                        conflicts[item].add(origin)
+                        reasons[item].append(
+                            f"{nvc_str(item[1], *choice)} doesn't satisfy {req.text}, required by {describe(origin)}"
+                        )
+                        consistent = False
+                        break
+                if not consistent:
+                    continue
+
+                dependencies = self._get_dependencies(item, choice)
+                for req in dependencies:
+                    dependency = (req.kind, req.name)
+                    if dependency in chosen and not satisfies(req, chosen[dependency]):
+                        conflicts[item].add(dependency)
+                        reasons[item].append(
+                            f"{nvc_str(item[1], *choice)} requires {req.text}, but {describe(dependency)} was chosen"
+                        )
+                        consistent = False
+                        break
+                if not consistent:
+                    continue
+
+                choose(item, choice, dependencies)
+                return choice
+
+            return None
+
+        for req in requirements:
+            add_constraint(req, None)
+
+        while True:
+            item = next_item()
+            if item == None:
+                return dict(chosen)
+
+            if try_next_candidate(item) != None:
+                continue
+
+            # Dead end. The item is only required because of the items that required it,
+            # so they're part of the conflict too.
+            if len(self._get_candidates(item)) == 0:
+                reasons[item] += [
+                    f"No versions of the {item[1]} {item[0]} are available to satisfy {req.text}, required by {describe(origin)}"
+                    for req, origin in constraints[item]
+                ]
+            conflict = conflicts[item] | set(origin for _, origin in constraints[item])
+            culprits = [culprit for culprit in conflict if culprit != None]
+
+            if len(culprits) == 0:
+                raise Unsatisfiable(self._explain(item, constraints[item], reasons[item], describe))
+
+            # Jump back to the most recent choice involved in the conflict, and try its next
+            # candidate. The choices after it had nothing to do with the conflict, and will be
+            # made again.
+            culprit = max(culprits, key=lambda culprit: level[culprit])
+
+            conflicts[culprit] |= conflict - {culprit}
+            reasons[culprit] += reasons[item]
+
+            while order[-1] != culprit:
+                undone = order[-1]
+                unchoose(undone)
+                forget(undone)
+            unchoose(culprit)
+            forget(item)
+
+    def _explain(
+        self,
+        item: tuple,
+        constraints: list,
+        reasons: list,
+        describe: Callable[[Optional[tuple]], str],
+    ) -> str:
+        """
+        Explain why no version of an item satisfies its requirements.
+        """
+        kind, name = item
+        lines = []
+
+        if len(self._get_candidates(item)) == 0:
+            lines.append(f"No versions of the {name} {kind} are available.")
+        else:
+            lines.append(f"No version of the {name} {kind} satisfies every requirement:")
+
+        for req, origin in constraints:
+            lines.append(f"    {req.text}, required by {describe(origin)}")
+
+        unique_reasons = list(dict.fromkeys(reasons))
+        if len(unique_reasons) > 0:
+            lines.append("Because:")
+            for reason in unique_reasons[:MAX_REASONS]:
+                lines.append(f"    {reason}")
+            if len(unique_reasons) > MAX_REASONS:
+                lines.append(f"    ... and {len(unique_reasons) - MAX_REASONS} more")
+
+        return "\n".join(lines)
+
+
+def solve(
+    requirements: list,
+    candidates: Callable[[str, str], list],
+    dependencies: Callable[[str, str, str, str], list],
+) -> dict:
+    """
+    Choose versions that satisfy every requirement. See `Solver.solve()`.
+    """
+    return Solver(candidates, dependencies).solve(requirements)
@@ -0,0 +1,123 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+This module provides a cache of tool detection results, so tools needn't be detected again
+on every build.
+
+Detecting a tool may run commands such as `cmake --version` and search the PATH, which adds up
+when a build requires dozens of tools. Each result is stored with the modification times of the
+files that detection looked at: the executables that were found, or the PATH directories that
+were searched when an executable wasn't found, and the files from any file checks. A result is
+reused only if none of those have changed since, and the tool definition and PATH are the same.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import *
+
+# Bump this whenever the format of the cache file changes.
+TOOL_CACHE_VERSION = 1
+
+
+class ToolDetectionCache(object):
+    """
+    Tool detection results, stored in a JSON file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Optional[dict] = None
+        self.modified = False
+        self.lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self.entries == None:
+            self.entries = {}
+            try:
+                with open(self.path, "r") as cache_file:
+                    cache = json.load(cache_file)
+                if cache.get("version") == TOOL_CACHE_VERSION and isinstance(cache.get("tools"), dict):
+                    self.entries = cache["tools"]
+            except (OSError, ValueError, AttributeError):
+                pass
+        return self.entries
+
+    @staticmethod
+    def _key(tool) -> str:
+        digest = hashlib.sha256()
+        digest.update(tool.definition_hash().encode("utf-8"))
+        digest.update(os.environ.get("PATH", "").encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, tool) -> Optional[dict]:
+        """
+        Get the result of an earlier detection of a tool, if nothing it depended on has changed.
+
+        Returns:    A dictionary with "found" (bool) and "tool_path" (str), or None.
+        """
+        with self.lock:
+            entry = self._load().get(self._key(tool))
+
+        if not isinstance(entry, dict):
+            return None
+
+        for path, mtime in entry.get("inputs", {}).items():
+            try:
+                current_mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                current_mtime = None
+            if current_mtime != mtime:
+                return None
+
+        return {"found": entry.get("found") == True, "tool_path": entry.get("tool_path", "")}
+
+    def store(self, tool, found: bool) -> None:
+        """
+        Remember the result of detecting a tool.
+        """
+        with self.lock:
+            self._load()[self._key(tool)] = {
+                "name": tool.name_version,
+                "found": found,
+                "tool_path": tool.tool_path,
+                "inputs": tool.detection_inputs,
+            }
+            self.modified = True
+
+    def save(self) -> None:
+        """
+        Write the cache file, if anything was stored.
+
+        The file is written to a temporary file and then renamed, so a concurrent Mussels process
+        never reads a partial file.
+        """
+        with self.lock:
+            if not self.modified:
+                return
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "w") as cache_file:
+                    json.dump({"version": TOOL_CACHE_VERSION, "tools": self.entries}, cache_file)
+                os.replace(temp_path, self.path)
+            except OSError:
+                # The cache is only an optimization.
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+            self.modified = False
@@ -18,25 +18,73 @@ limitations under the License.
 
 from collections import defaultdict, namedtuple
 import platform
+import re
+from typing import *
 
 NVC = namedtuple("NVC", "name version cookbook")
 
 
+VERSION_PART = re.compile(r"(\d+)")
+
+
+class Version(str):
+    """
+    A version string that's parsed once, and compares by version rather than alphabetically.
+
+    The string is split at each "." and between numbers and letters, and the numbers are
+    compared as numbers, e.g. "1.0.2g" < "1.1.1c" < "1.10.0". Versions with the same parts
+    (e.g. "1.0" and "01.0") are ordered by the string, so the order is total.
+
+    Use `parse_version()` to create these, so each version string is only parsed once.
+    A Version is still a str, so it may be used anywhere a version string is expected.
+    """
+
+    __slots__ = ("key",)
+
+    def __new__(cls, version: str) -> "Version":
+        self = super().__new__(cls, version)
+
+        key = []
+        for u in version.split("."):
+            for v in VERSION_PART.split(u):
+                key.append(int(v) if v.isdigit() else v)
+        self.key = (tuple(key), str(version))
+        return self
+
+    def __lt__(self, other) -> bool:
+        return self.key < parse_version(other).key
+
+    def __le__(self, other) -> bool:
+        return self.key <= parse_version(other).key
+
+    def __gt__(self, other) -> bool:
+        return self.key > parse_version(other).key
+
+    def __ge__(self, other) -> bool:
+        return self.key >= parse_version(other).key
+
+
+_parsed_versions: dict = {}
+
+
+def parse_version(version: str) -> Version:
+    """
+    Get the Version for a version string. Each version string is only parsed once.
+    """
+    if type(version) == Version:
+        return version
+
+    parsed = _parsed_versions.get(version)
+    if parsed == None:
+        parsed = _parsed_versions.setdefault(version, Version(version))
+    return parsed
+
+
 def version_keys(s):
     """
     `key` function enabling python's `sort` function to sort version strings.
     """
-    import re
-
-    keys = []
-    for u in s.split("."):
-        for v in re.split(r"(\d+)", u):
-            try:
-                val = int(v)
-            except:
-                val = str(v)
-            keys.append(val)
-    return keys
+    return list(parse_version(s).key[0])
 
 
 def sort_cookbook_by_version(items) -> defaultdict:
@@ -46,9 +94,8 @@ def sort_cookbook_by_version(items) -> defaultdict:
     sorted_items: defaultdict = defaultdict(list)
 
     for item in items:
-        versions_list = list(items[item].keys())
-        versions_list.sort(key=version_keys)
-        versions_list.reverse()
+        versions_list = [parse_version(version) for version in items[item].keys()]
+        versions_list.sort(reverse=True)
         for version in versions_list:
             sorted_items[item].append(version)
 
@@ -155,14 +202,49 @@ def compare_versions(version_a: str, version_b: str) -> int:
     if version_a == version_b:
         return 0
 
-    versions_list = [version_a, version_b]
+    return -1 if parse_version(version_a) < parse_version(version_b) else 1
+
+
+def parse_requirement(requirement: str) -> tuple:
+    """
+    Split a requirement in the format described for `get_item_version()` into its parts.
+
+    The "==", "=", "-", and "@" operators all mean the same thing, so they're all returned as "==".
+
+    :return: tuple of (cookbook, name, operator, version), where any missing part is an empty string.
+    """
+    cookbook = ""
+    item_name = requirement
+    if ":" in item_name:
+        cookbook, item_name = item_name.split(":")
+
+    operator = ""
+    version = ""
+    for each_operator in [">=", ">", "<=", "<", "==", "=", "-", "@"]:
+        if each_operator in item_name:
+            item_name, version = item_name.split(each_operator)
+            operator = each_operator if each_operator in [">=", ">", "<=", "<"] else "=="
+            break
 
-    versions_list.sort(key=version_keys)
+    return (cookbook.strip(), item_name.strip(), operator, version.strip())
 
-    if versions_list[0] == version_a:
-        return -1
+
+def version_satisfies(version: str, operator: str, wanted: str) -> bool:
+    """
+    Check a version against a version requirement, split up by `parse_requirement()`.
+    """
+    if operator == "":
+        return True
+    elif operator == "==":
+        return version == wanted
+    elif operator == ">=":
+        return parse_version(version) >= wanted
+    elif operator == ">":
+        return parse_version(version) > wanted
+    elif operator == "<=":
+        return parse_version(version) <= wanted
     else:
-        return 1
+        return parse_version(version) < wanted
 
 
 def get_item_version(item_name: str, sorted_items: dict, target: str = "", logger = None) -> NVC:
@@ -187,6 +269,9 @@ def get_item_version(item_name: str, sorted_items: dict, target: str = "", logge
 
     If no versions remain that satisfy build qualifications, an exception will be raised.
 
+    To resolve many requirements against the same items, use a `VersionResolver` instead.
+    It doesn't modify sorted_items, and remembers the outcome of each requirement.
+
     :return: named tuple describing the highest qualified version:
         NVC(
             "name"->str,
@@ -194,225 +279,266 @@ def get_item_version(item_name: str, sorted_items: dict, target: str = "", logge
             "cookbook"->str,
         )
     """
+    resolver = VersionResolver(sorted_items, logger=logger)
+    try:
+        return resolver.resolve(item_name, target)
+    finally:
+        # Prune sorted_items, the same as the resolver pruned its candidates.
+        resolver.apply()
 
-    def select_cookbook_version(nvc, item_version, target: str = "") -> bool:
-        cookbook_selected = False
 
-        def cookbook_has_build_target(cookbooks_item: dict, target) -> bool:
-            if target == "":
-                return True
+class VersionResolver(object):
+    """
+    Select item versions to satisfy version requirements, the same way as `get_item_version()`.
+
+    Each requirement whittles down the candidate versions of an item, and later requirements
+    only choose from the versions that remain. Rather than pruning the sorted lists, the
+    remaining candidates of each item are kept as an immutable state: a (start, end) range of
+    indexes into its sorted versions, plus the cookbook selected for each version that has
+    been chosen. Because the state is immutable, the outcome of each requirement is memoized
+    by (requirement, target, state), so resolving a requirement again is a dictionary lookup.
+    """
 
-            for each_platform in cookbooks_item:
-                # Note: sorted_items has been filtered down to compatible platform.
-                #       No need to check with platform_is()
-                if target in cookbooks_item[each_platform]:
-                    return True
-            return False
-
-        # Prefer local over all else, enabling monkey-patching of recipes.
-        if "local" in item_version["cookbooks"] and cookbook_has_build_target(
-            item_version["cookbooks"]["local"], target
-        ):
-            if nvc["cookbook"] != "" and nvc["cookbook"] != "local":
-                if logger:
-                    logger.debug(f"Overriding {nvc_str(nvc['name'], nvc['version'], nvc['cookbook'])} with {nvc_str(nvc['name'], item_version['version'], 'local')}")
-            nvc["version"] = item_version["version"]
-            nvc["cookbook"] = "local"
-            cookbook_selected = True
-        else:
-            if nvc["cookbook"] == "":
-                # Any cookbook will do.
-                for cookbook in item_version["cookbooks"]:
-                    if cookbook_has_build_target(
-                        item_version["cookbooks"][cookbook], target
-                    ):
-                        nvc["version"] = item_version["version"]
-                        nvc["cookbook"] = cookbook
-                        cookbook_selected = True
-                        break
-            else:
-                # Check for requested cookbook.
-                for cookbook in item_version["cookbooks"]:
-                    if cookbook == nvc["cookbook"] and cookbook_has_build_target(
-                        item_version["cookbooks"][cookbook], target
-                    ):
-                        nvc["version"] = item_version["version"]
-                        cookbook_selected = True
-                        break
-
-        # Remove all other cookbooks for this item version.
-        if cookbook_selected:
-            item_version["cookbooks"] = {
-                nvc["cookbook"]: item_version["cookbooks"][nvc["cookbook"]]
+    def __init__(self, sorted_items: dict, logger = None) -> None:
+        """
+        Args:
+            sorted_items:   Each item's versions, newest first, as created by `Mussels._sort_items_by_version()`.
+                            These are never modified.
+            logger:         (optional) Logger for messages about which versions are ruled out.
+        """
+        self.sorted_items = sorted_items
+        self.logger = logger
+
+        # Item name -> (start, end, frozenset of (index, cookbook) pairs)
+        self.states: dict = {}
+
+        # (cookbook, name, operator, version, target, state) -> (NVC or None, new state)
+        self.outcomes: dict = {}
+
+        self.requirements: dict = {}
+        self.version_indexes: dict = {}
+        self.parsed_versions: dict = {}
+
+    def _versions(self, name: str) -> list:
+        return self.sorted_items[name] if name in self.sorted_items else []
+
+    def _state(self, name: str) -> tuple:
+        if name not in self.states:
+            self.states[name] = (0, len(self._versions(name)), frozenset())
+        return self.states[name]
+
+    def _parse(self, requirement: str) -> tuple:
+        """
+        Split a requirement into (cookbook, name, operator, version).
+        """
+        if requirement not in self.requirements:
+            self.requirements[requirement] = parse_requirement(requirement)
+        return self.requirements[requirement]
+
+    def candidates(self, name: str) -> list:
+        """
+        Get the versions of an item that haven't been ruled out, newest first.
+
+        Returns:    A list in the same format as the sorted_items lists.
+        """
+        start, end, pins = self._state(name)
+        versions = self._versions(name)
+        pinned = dict(pins)
+
+        return [
+            {
+                "version": versions[i]["version"],
+                "cookbooks": {pinned[i]: versions[i]["cookbooks"][pinned[i]]}
+                if i in pinned
+                else versions[i]["cookbooks"],
             }
-        return cookbook_selected
+            for i in range(start, end)
+        ]
 
-    nvc = {"name": "", "version": "", "cookbook": ""}
+    def apply(self) -> None:
+        """
+        Prune the sorted_items lists down to the remaining candidates.
 
-    requested_item = item_name
-    item_selected = False
+        The resolver carries on from the pruned lists.
+        """
+        for name, (start, end, pins) in self.states.items():
+            if name not in self.sorted_items:
+                continue
 
-    # Identify cookbook name, if provided.
-    if ":" in item_name:
-        cookbook, item = item_name.split(":")
-        nvc["cookbook"] = cookbook.strip()
-        item_name = item.strip()
-
-    if ">=" in item_name:
-        # GTE requirement found.
-        name, version = item_name.split(">=")
-        nvc["name"] = name.strip()
-        version = version.strip()
-        for i, item_version in enumerate(sorted_items[name]):
-            cmp = compare_versions(item_version["version"], version)
-            if cmp >= 0:
-                # Version is good.
-                if item_selected != True:
-                    item_selected = select_cookbook_version(nvc, item_version, target)
-            else:
-                # Version is too low. Remove it, and subsequent versions.
-                if logger != None and len(sorted_items[name][:i]) < len(sorted_items[name]):
-                    logger.debug(f"{name} limited to version: {', '.join([item['version'] for item in sorted_items[name][:i]])}")
-
-                sorted_items[name] = sorted_items[name][:i]
-                break
-
-    elif ">" in item_name:
-        # GT requirement found.
-        name, version = item_name.split(">")
-        nvc["name"] = name.strip()
-        version = version.strip()
-        for i, item_version in enumerate(sorted_items[name]):
-            cmp = compare_versions(item_version["version"], version)
-            if cmp > 0:
-                # Version is good.
-                if item_selected != True:
-                    item_selected = select_cookbook_version(nvc, item_version, target)
+            versions = self.sorted_items[name]
+            for i, cookbook in pins:
+                versions[i]["cookbooks"] = {cookbook: versions[i]["cookbooks"][cookbook]}
+
+            if (start, end) != (0, len(versions)):
+                self.sorted_items[name] = versions[start:end]
+
+        # The indexes are for the lists before they were pruned.
+        self.states = {}
+        self.outcomes = {}
+        self.version_indexes = {}
+        self.parsed_versions = {}
+
+    def resolve(self, requirement: str, target: str = "") -> NVC:
+        """
+        Select the newest version of an item that satisfies a requirement.
+
+        The requirement format is the same as for `get_item_version()`.
+
+        If no versions remain that satisfy the requirement, an exception will be raised.
+        """
+        cookbook, name, operator, version = self._parse(requirement)
+        state = self._state(name)
+
+        key = (cookbook, name, operator, version, target, state)
+        if key not in self.outcomes:
+            self.outcomes[key] = self._resolve(cookbook, name, operator, version, target, state)
+
+            # Resolving the same requirement again leaves the state as it is.
+            new_state = self.outcomes[key][1]
+            self.outcomes[(cookbook, name, operator, version, target, new_state)] = self.outcomes[key]
+        nvc, self.states[name] = self.outcomes[key]
+
+        if nvc == None:
+            if target == "":
+                raise Exception(
+                    f"No versions available to satisfy requirement for {requirement}.\nThe requested version may have been filtered out by requirements for another recipe."
+                )
             else:
-                # Version is too low. Remove it, and subsequent versions.
-                if logger != None and len(sorted_items[name][:i]) < len(sorted_items[name]):
-                    logger.debug(f"{name} limited to version: {', '.join([item['version'] for item in sorted_items[name][:i]])}")
-
-                sorted_items[name] = sorted_items[name][:i]
-                break
-
-    elif "<=" in item_name:
-        # LTE requirement found.
-        name, version = item_name.split("<=")
-        nvc["name"] = name.strip()
-        version = version.strip()
-
-        pruned = False
-        # First, prune down to highest tolerable version
-        if len(sorted_items[name]) > 0:
-
-            while (
-                len(sorted_items[name]) > 0
-                and compare_versions(sorted_items[name][0]["version"], version) > 0
-            ):
-                # Remove a version from the sorted_items.
-                sorted_items[name].remove(sorted_items[name][0])
-                pruned = True
-
-        # Then, prune down to the highest version provided by a the requested cookbook
-        if len(sorted_items[name]) > 0:
-            while len(sorted_items[name]) > 0 and not item_selected:
-                item_selected = select_cookbook_version(
-                    nvc, sorted_items[name][0], target
+                raise Exception(
+                    f"No versions available to satisfy requirement for {requirement} ({target}).\nThe requested version may have been filtered out by requirements for another recipe."
                 )
 
-                if not item_selected:
-                    # Remove a version from the sorted_items.
-                    sorted_items[name].remove(sorted_items[name][0])
-                    pruned = True
-
-            if logger != None and pruned:
-                logger.debug(f"{name} limited to version: {', '.join([item['version'] for item in sorted_items[name]])}")
-
-    elif "<" in item_name:
-        # LT requirement found.
-        name, version = item_name.split("<")
-        nvc["name"] = name.strip()
-        version = version.strip()
-
-        pruned = False
-        # First, prune down to highest tolerable version
-        if len(sorted_items[name]) > 0:
-
-            while (
-                len(sorted_items[name]) > 0
-                and compare_versions(sorted_items[name][0]["version"], version) >= 0
-            ):
-                # Remove a version from the sorted_items.
-                sorted_items[name].remove(sorted_items[name][0])
-                pruned = True
-
-        # Then, prune down to the highest version provided by a the requested cookbook
-        if len(sorted_items[name]) > 0:
-            while len(sorted_items[name]) > 0 and not item_selected:
-                item_selected = select_cookbook_version(
-                    nvc, sorted_items[name][0], target
-                )
+        return nvc
+
+    def _resolve(
+        self, cookbook: str, name: str, operator: str, version: str, target: str, state: tuple
+    ) -> tuple:
+        """
+        Select a version, starting from a given state.
+
+        Returns:    A tuple of the selected NVC (or None), and the new state.
+        """
+        versions = self._versions(name)
+        start, end, pins = state
+        pinned = dict(pins)
+
+        def select_cookbook(i: int) -> str:
+            """
+            Select the cookbook for a version, or return "" if none of them will do.
+            """
+            cookbooks = versions[i]["cookbooks"]
+            if i in pinned:
+                cookbooks = {pinned[i]: cookbooks[pinned[i]]}
+
+            def cookbook_has_build_target(each_cookbook: str) -> bool:
+                if target == "":
+                    return True
 
-                if not item_selected:
-                    # Remove a version from the sorted_items.
-                    sorted_items[name].remove(sorted_items[name][0])
-                    pruned = True
+                for each_platform in cookbooks[each_cookbook]:
+                    # Note: sorted_items has been filtered down to compatible platform.
+                    #       No need to check with platform_is()
+                    if target in cookbooks[each_cookbook][each_platform]:
+                        return True
+                return False
 
-            if logger != None and pruned:
-                logger.debug(f"{name} limited to version: {', '.join([item['version'] for item in sorted_items[name]])}")
+            # Prefer local over all else, enabling monkey-patching of recipes.
+            if "local" in cookbooks and cookbook_has_build_target("local"):
+                if cookbook != "" and cookbook != "local" and self.logger:
+                    self.logger.debug(f"Overriding {nvc_str(name, versions[i]['version'], cookbook)} with {nvc_str(name, versions[i]['version'], 'local')}")
+                return "local"
 
-    else:
-        eq_cond = False
-        if "==" in item_name:
-            name, version = item_name.split("==")
-            eq_cond = True
-        elif "=" in item_name:
-            name, version = item_name.split("=")
-            eq_cond = True
-        elif "-" in item_name:
-            name, version = item_name.split("-")
-            eq_cond = True
-        elif "@" in item_name:
-            name, version = item_name.split("@")
-            eq_cond = True
-
-        if eq_cond == True:
-            nvc["name"] = name.strip()
-            nvc["version"] = version.strip()
-            # EQ requirement found.
-            # Try to find the specific version, and remove all others.
-            item_selected = False
-            for item_version in sorted_items[nvc["name"]]:
-                if version == item_version["version"]:
-                    item_selected = select_cookbook_version(nvc, item_version, target)
-                    if item_selected:
-                        if logger != None and len(sorted_items[nvc["name"]]) > 1:
-                            logger.debug(f"{name} limited to version: {version}")
+            if cookbook == "":
+                # Any cookbook will do.
+                for each_cookbook in cookbooks:
+                    if cookbook_has_build_target(each_cookbook):
+                        return each_cookbook
+            elif cookbook in cookbooks and cookbook_has_build_target(cookbook):
+                return cookbook
+
+            return ""
+
+        if name not in self.parsed_versions:
+            self.parsed_versions[name] = [parse_version(item["version"]) for item in versions]
+        parsed_versions = self.parsed_versions[name]
+        wanted = parse_version(version)
+
+        def acceptable(i: int) -> bool:
+            return version_satisfies(parsed_versions[i], operator, wanted)
+
+        def first_index(low: int, high: int, condition: Callable[[int], bool]) -> int:
+            """
+            Find the first index for which a condition is True, where it's False for every index before it.
+            """
+            while low < high:
+                middle = (low + high) // 2
+                if condition(middle):
+                    high = middle
+                else:
+                    low = middle + 1
+            return low
+
+        def log_limited(new_start: int, new_end: int) -> None:
+            if self.logger != None and (new_start, new_end) != (start, end):
+                self.logger.debug(f"{name} limited to version: {', '.join([item['version'] for item in versions[new_start:new_end]])}")
+
+        selected = -1
+        selected_cookbook = ""
+
+        if operator in [">=", ">"]:
+            # The versions are sorted newest first, so versions that are too low are at the end.
+            new_end = first_index(start, end, lambda i: not acceptable(i))
+            for i in range(start, new_end):
+                selected_cookbook = select_cookbook(i)
+                if selected_cookbook != "":
+                    selected = i
+                    break
+            log_limited(start, new_end)
+            end = new_end
+
+        elif operator in ["<=", "<"]:
+            # First, prune down to highest tolerable version.
+            new_start = first_index(start, end, acceptable)
+
+            # Then, prune down to the highest version provided by a the requested cookbook.
+            while new_start < end:
+                selected_cookbook = select_cookbook(new_start)
+                if selected_cookbook != "":
+                    selected = new_start
+                    break
+                new_start += 1
+            log_limited(new_start, end)
+            start = new_start
 
-                        sorted_items[nvc["name"]] = [item_version]
-                        break
+        elif operator == "==":
+            # Try to find the specific version, and remove all others.
+            if name not in self.version_indexes:
+                self.version_indexes[name] = {
+                    item["version"]: i for i, item in enumerate(versions)
+                }
+            i = self.version_indexes[name].get(version, -1)
+            if start <= i < end:
+                selected_cookbook = select_cookbook(i)
+                if selected_cookbook != "":
+                    selected = i
+                    log_limited(i, i + 1)
+                    start, end = i, i + 1
 
         else:
             # No version requirement found.
-            nvc["name"] = item_name.strip()
-
-            for item_version in sorted_items[nvc["name"]]:
-                item_selected = select_cookbook_version(nvc, item_version, target)
-                if item_selected:
+            for i in range(start, end):
+                selected_cookbook = select_cookbook(i)
+                if selected_cookbook != "":
+                    selected = i
                     break
 
-    if not item_selected:
-        if target == "":
-            raise Exception(
-                f"No versions available to satisfy requirement for {requested_item}.\nThe requested version may have been filtered out by requirements for another recipe."
-            )
-        else:
-            raise Exception(
-                f"No versions available to satisfy requirement for {requested_item} ({target}).\nThe requested version may have been filtered out by requirements for another recipe."
-            )
+        if selected == -1:
+            return None, (start, end, pins)
+
+        # Remove all other cookbooks for the selected version.
+        if pinned.get(selected) != selected_cookbook:
+            pins = frozenset([pin for pin in pins if pin[0] != selected] + [(selected, selected_cookbook)])
 
-    return NVC(nvc["name"], nvc["version"], nvc["cookbook"])
+        return NVC(name, versions[selected]["version"], selected_cookbook), (start, end, pins)
 
 
 def nvc_str(name, version, cookbook: str = ""):
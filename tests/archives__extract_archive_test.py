@@ -0,0 +1,146 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for archives.py utility functions
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import mussels.utils.archives
+from mussels.utils.archives import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        # The source tree that every archive contains.
+        TestClass.source = TestClass.path_tmp / "foo-1.0"
+        (TestClass.source / "src").mkdir(parents=True)
+        (TestClass.source / "README").write_text("hello")
+        (TestClass.source / "src" / "big.c").write_bytes(b"int x;\n" * 100000)
+
+        TestClass.archives = TestClass.path_tmp / "archives"
+        TestClass.archives.mkdir()
+
+        for name, mode in [
+            ("foo-1.0.tar.gz", "w:gz"),
+            ("foo-1.0.tgz", "w:gz"),
+            ("foo-1.0.tar.xz", "w:xz"),
+            ("foo-1.0.tar.bz2", "w:bz2"),
+            ("foo-1.0.tar", "w"),
+        ]:
+            with tarfile.open(str(TestClass.archives / name), mode) as tar:
+                tar.add(str(TestClass.source), arcname="foo-1.0")
+
+        with zipfile.ZipFile(str(TestClass.archives / "foo-1.0.zip"), "w") as zip_ref:
+            for path in TestClass.source.rglob("*"):
+                zip_ref.write(str(path), str(path.relative_to(TestClass.path_tmp)))
+
+        if shutil.which("zstd") != None:
+            subprocess.run(
+                ["zstd", "-q", str(TestClass.archives / "foo-1.0.tar"), "-o", str(TestClass.archives / "foo-1.0.tar.zst")],
+                check=True,
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.dest = TestClass.path_tmp / "dest"
+        self.dest.mkdir()
+        self.decompressors = dict(mussels.utils.archives.DECOMPRESSORS)
+
+    def tearDown(self):
+        mussels.utils.archives.DECOMPRESSORS = self.decompressors
+        shutil.rmtree(str(self.dest))
+
+    def check_extracted(self):
+        assert (self.dest / "foo-1.0" / "README").read_text() == "hello"
+        assert (self.dest / "foo-1.0" / "src" / "big.c").read_bytes() == b"int x;\n" * 100000
+
+    def extract_all(self):
+        for archive in sorted(os.listdir(str(TestClass.archives))):
+            extract_archive(str(TestClass.archives / archive), str(self.dest))
+            self.check_extracted()
+            shutil.rmtree(str(self.dest / "foo-1.0"))
+
+    def test_archive_stem(self):
+        assert archive_stem("foo-1.0.tar.gz") == "foo-1.0"
+        assert archive_stem("foo-1.0.tgz") == "foo-1.0"
+        assert archive_stem("foo-1.0.tar.zst") == "foo-1.0"
+        assert archive_stem("foo-1.0.zip") == "foo-1.0"
+        assert archive_stem("foo-1.0.rar") == ""
+
+    def test_extract(self):
+        self.extract_all()
+
+    def test_extract_without_external_decompressors(self):
+        mussels.utils.archives.DECOMPRESSORS = {}
+
+        for archive in sorted(os.listdir(str(TestClass.archives))):
+            if archive.endswith(".zst") and mussels.utils.archives.zstandard == None:
+                with pytest.raises(RuntimeError):
+                    extract_archive(str(TestClass.archives / archive), str(self.dest))
+                continue
+
+            extract_archive(str(TestClass.archives / archive), str(self.dest))
+            self.check_extracted()
+            shutil.rmtree(str(self.dest / "foo-1.0"))
+
+    def test_extract_named(self):
+        # Archives in the download cache are named by their checksum, not their file name.
+        cached = TestClass.path_tmp / "0123abcd"
+        shutil.copyfile(str(TestClass.archives / "foo-1.0.tar.xz"), str(cached))
+
+        extract_archive(str(cached), str(self.dest), archive="foo-1.0.tar.xz")
+        self.check_extracted()
+
+    @pytest.mark.skipif(shutil.which("sh") == None or shutil.which("gzip") == None, reason="requires sh and gzip")
+    def test_extract_noisy_decompressor(self):
+        # A decompressor that writes more warnings than fit in a pipe buffer before any output.
+        noisy = TestClass.path_tmp / "noisy-gzip"
+        noisy.write_text('#!/bin/sh\nhead -c 1048576 /dev/zero | tr "\\0" w >&2\nexec gzip -dc "$@"\n')
+        noisy.chmod(0o755)
+        mussels.utils.archives.DECOMPRESSORS = {"gz": [[str(noisy)]]}
+
+        extract_archive(str(TestClass.archives / "foo-1.0.tar.gz"), str(self.dest))
+        self.check_extracted()
+
+        with pytest.raises(RuntimeError, match="wwww"):
+            extract_archive(str(TestClass.path_tmp / "missing.tar.gz"), str(self.dest))
+
+    def test_extract_corrupt(self):
+        corrupt = TestClass.path_tmp / "corrupt.tar.gz"
+        data = (TestClass.archives / "foo-1.0.tar.gz").read_bytes()
+        corrupt.write_bytes(data[: len(data) // 2])
+
+        with pytest.raises(Exception):
+            extract_archive(str(corrupt), str(self.dest))
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,171 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for the artifact cache of built recipes
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import types
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.mussels import Mussels
+from mussels.utils.artifacts import *
+
+
+class PutHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serve files, and save files uploaded with PUT.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_PUT(self):
+        path = self.translate_path(self.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.install = TestClass.path_tmp / "install"
+        (self.install / "lib").mkdir(parents=True)
+        (self.install / "include").mkdir()
+        (self.install / "lib" / "libfoo.so.1").write_text("library")
+        os.symlink("libfoo.so.1", str(self.install / "lib" / "libfoo.so"))
+        (self.install / "include" / "foo.h").write_text("header")
+        (self.install / "include" / "other.h").write_text("another recipe's header")
+
+        self.installed = ["lib/libfoo.so.1", "lib/libfoo.so", "include/foo.h"]
+        self.artifact = str(TestClass.path_tmp / "artifact.tar.gz")
+
+    def tearDown(self):
+        for path in TestClass.path_tmp.iterdir():
+            if path.is_dir():
+                shutil.rmtree(str(path))
+            else:
+                path.unlink()
+
+    def test_pack_and_unpack(self):
+        pack_artifact(str(self.install), self.installed, self.artifact)
+
+        restored = TestClass.path_tmp / "restored"
+        (restored / "include").mkdir(parents=True)
+        (restored / "include" / "foo.h").write_text("old header")
+
+        unpack_artifact(self.artifact, str(restored))
+
+        assert (restored / "lib" / "libfoo.so.1").read_text() == "library"
+        assert os.readlink(str(restored / "lib" / "libfoo.so")) == "libfoo.so.1"
+        assert (restored / "include" / "foo.h").read_text() == "header"
+
+        # Only the listed files are packed.
+        assert not (restored / "include" / "other.h").exists()
+
+        # The staging directory is cleaned up.
+        assert os.listdir(str(restored / ".mussels")) == []
+
+    def test_local_cache(self):
+        pack_artifact(str(self.install), self.installed, self.artifact)
+
+        cache = open_artifact_cache(str(TestClass.path_tmp / "cache"))
+        name = artifact_name("foo", "ab" * 32)
+        fetched = str(TestClass.path_tmp / "fetched.tar.gz")
+
+        assert not cache.fetch(name, fetched)
+
+        cache.store(name, self.artifact)
+        assert (TestClass.path_tmp / "cache" / "foo" / f"{'ab' * 32}.tar.gz").is_file()
+
+        assert cache.fetch(name, fetched)
+        assert Path(fetched).read_bytes() == Path(self.artifact).read_bytes()
+
+        # file:// URLs are the same thing.
+        cache = open_artifact_cache((TestClass.path_tmp / "cache").as_uri())
+        assert isinstance(cache, LocalArtifactCache)
+        assert cache.fetch(name, str(TestClass.path_tmp / "fetched-again.tar.gz"))
+
+    def test_http_cache(self):
+        served = TestClass.path_tmp / "served"
+        served.mkdir()
+
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(PutHandler, directory=str(served))
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            pack_artifact(str(self.install), self.installed, self.artifact)
+
+            cache = open_artifact_cache(f"http://127.0.0.1:{server.server_address[1]}/artifacts")
+            assert isinstance(cache, HttpArtifactCache)
+
+            name = artifact_name("foo", "ab" * 32)
+            fetched = str(TestClass.path_tmp / "fetched.tar.gz")
+
+            assert not cache.fetch(name, fetched)
+
+            cache.store(name, self.artifact)
+            assert (served / "artifacts" / "foo" / f"{'ab' * 32}.tar.gz").is_file()
+
+            assert cache.fetch(name, fetched)
+            assert Path(fetched).read_bytes() == Path(self.artifact).read_bytes()
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+    def test_store_pack_failure(self):
+        # A recipe that lists an installed file that's gone can't be cached, but the build goes on.
+        cache_dir = TestClass.path_tmp / "cache"
+        my_mussels = Mussels(
+            data_dir=str(TestClass.path_tmp / "data"), artifact_caches=[str(cache_dir)]
+        )
+        recipe_object = types.SimpleNamespace(
+            name="foo",
+            version="1.0",
+            install_dir=str(self.install),
+            installed_files=self.installed + ["lib/missing.a"],
+        )
+
+        my_mussels._store_artifact(recipe_object, "0123abcd")
+
+        assert not cache_dir.exists() or list(cache_dir.rglob("*.tar.gz")) == []
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,197 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for compiler cache support
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+from mussels.tool import BaseTool
+from mussels.utils.compiler_cache import *
+
+# Reports the number of misses in the "misses" file next to it, like ccache 4.
+CCACHE_4 = """#!/bin/sh
+if [ "$1" = "--print-stats" ]; then
+    printf 'stats_updated_timestamp\\t1600000000\\n'
+    printf 'direct_cache_hit\\t5\\n'
+    printf 'preprocessed_cache_hit\\t2\\n'
+    printf 'cache_miss\\t%s\\n' "$(cat "$(dirname "$0")/misses")"
+    exit 0
+fi
+exit 1
+"""
+
+CCACHE_3 = """#!/bin/sh
+if [ "$1" = "-s" ]; then
+    echo "cache directory                     /home/user/.ccache"
+    echo "cache hit (direct)                     4"
+    echo "cache hit (preprocessed)               1"
+    echo "cache miss                             3"
+    echo "files in cache                        12"
+    exit 0
+fi
+exit 1
+"""
+
+SCCACHE = """#!/bin/sh
+echo '{"stats": {"cache_hits": {"counts": {"C/C++": 6, "Rust": 1}}, "cache_misses": {"counts": {"C/C++": 2}}}}'
+"""
+
+
+class FakeRecipe(BaseRecipe):
+    name = "fake"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {
+                    "make": 'echo "{compiler_cache}|{cmake_launcher}" > launcher.txt\n'
+                    + "if [ -n \"{compiler_cache}\" ]; then echo 3 > \"$(dirname {compiler_cache})/misses\"; fi",
+                },
+                "dependencies": [],
+                "required_tools": [],
+                "install_paths": {"share": ["launcher.txt"]},
+            }
+        }
+    }
+
+
+class ToolRecipe(FakeRecipe):
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {
+                    "make": 'echo "{compiler_cache}|{ccache.dir}" > launcher.txt',
+                },
+                "dependencies": [],
+                "required_tools": ["ccache"],
+                "install_paths": {"share": ["launcher.txt"]},
+            }
+        }
+    }
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="The fake compiler caches are shell scripts.")
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def tearDown(self):
+        for path in TestClass.path_tmp.iterdir():
+            shutil.rmtree(str(path))
+
+    def fake_program(self, name, script):
+        bin_dir = TestClass.path_tmp / "bin"
+        bin_dir.mkdir(exist_ok=True)
+        (bin_dir / name).write_text(script)
+        os.chmod(str(bin_dir / name), 0o755)
+        (bin_dir / "misses").write_text("1\n")
+        return str(bin_dir / name)
+
+    def test_ccache_4_stats(self):
+        cache = CompilerCache("ccache", self.fake_program("ccache", CCACHE_4))
+        assert cache.stats() == {"hits": 7, "misses": 1}
+
+    def test_ccache_3_stats(self):
+        cache = CompilerCache("ccache", self.fake_program("ccache", CCACHE_3))
+        assert cache.stats() == {"hits": 5, "misses": 3}
+
+    def test_sccache_stats(self):
+        cache = CompilerCache("sccache", self.fake_program("sccache", SCCACHE))
+        assert cache.stats() == {"hits": 7, "misses": 2}
+
+    def test_missing_stats(self):
+        cache = CompilerCache("ccache", str(TestClass.path_tmp / "no-such-ccache"))
+        assert cache.stats() == None
+        assert stats_difference(None, {"hits": 1, "misses": 1}) == None
+
+    def test_build_with_compiler_cache(self):
+        cache = CompilerCache("ccache", self.fake_program("ccache", CCACHE_4))
+
+        recipe = FakeRecipe(
+            toolchain={},
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp / "data"),
+            install_dir=str(TestClass.path_tmp / "install"),
+            compiler_cache=cache,
+        )
+        assert recipe.build()
+
+        launcher = (TestClass.path_tmp / "install" / "share" / "launcher.txt").read_text().strip()
+        assert launcher == (
+            f"{cache.path}|-DCMAKE_C_COMPILER_LAUNCHER={cache.path} -DCMAKE_CXX_COMPILER_LAUNCHER={cache.path}"
+        )
+        assert recipe.compiler_cache_stats == {"hits": 0, "misses": 2}
+
+    def test_build_with_compiler_cache_tool(self):
+        cache = CompilerCache("ccache", self.fake_program("ccache", CCACHE_4))
+
+        # A cookbook's ccache tool, which the recipe requires, and which has variables of its own.
+        ccache_tool = type(
+            "ccache_tool",
+            (BaseTool,),
+            {
+                "name": "ccache",
+                "version": "4.0",
+                "platforms": {"Posix": {"path_checks": ["ccache"], "variables": {"dir": "/tmp"}}},
+            },
+        )(str(TestClass.path_tmp / "data"))
+
+        recipe = ToolRecipe(
+            toolchain={"ccache": ccache_tool},
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp / "data"),
+            install_dir=str(TestClass.path_tmp / "install"),
+            compiler_cache=cache,
+        )
+        assert recipe.build()
+
+        launcher = (TestClass.path_tmp / "install" / "share" / "launcher.txt").read_text().strip()
+        # Both the compiler cache and the tool's own variables are available.
+        assert launcher == f"{cache.path}|/tmp"
+
+    def test_build_without_compiler_cache(self):
+        recipe = FakeRecipe(
+            toolchain={},
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp / "data"),
+            install_dir=str(TestClass.path_tmp / "install"),
+        )
+        assert recipe.build()
+
+        # The variables are empty, so the same build scripts work without a compiler cache.
+        assert (TestClass.path_tmp / "install" / "share" / "launcher.txt").read_text().strip() == "|"
+        assert recipe.compiler_cache_stats == None
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
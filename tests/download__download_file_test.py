@@ -0,0 +1,275 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for download.py utility functions
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import gzip
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.utils.download import *
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class KeepAliveHandler(QuietHandler):
+    protocol_version = "HTTP/1.1"
+
+
+class CountingServer(http.server.ThreadingHTTPServer):
+    connections = 0
+
+    def get_request(self):
+        CountingServer.connections += 1
+        return super().get_request()
+
+
+class FlakyRangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve one file with Range support, dropping the connection halfway through the first request.
+    """
+
+    payload = b""
+    requests: list = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        FlakyRangeHandler.requests.append(self.headers.get("Range"))
+
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"][len("bytes="):].split("-")[0])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload) - start))
+        self.end_headers()
+
+        if len(FlakyRangeHandler.requests) == 1:
+            self.wfile.write(self.payload[: len(self.payload) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(self.payload[start:])
+
+
+class WrongRangeHandler(FlakyRangeHandler):
+    """
+    Answer a Range request with the start of the file instead of the range that was asked for.
+    """
+
+    def do_GET(self):
+        WrongRangeHandler.requests.append(self.headers.get("Range"))
+
+        if self.headers.get("Range"):
+            body = self.payload[:1024]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-{len(body) - 1}/{len(self.payload)}")
+        else:
+            body = self.payload
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class GzipEncodingHandler(QuietHandler):
+    """
+    Serve files with "Content-Encoding: gzip", like some servers do for .tar.gz files.
+    """
+
+    def end_headers(self):
+        if self.command == "GET" and self.path.endswith(".gz"):
+            self.send_header("Content-Encoding", "gzip")
+        super().end_headers()
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TestClass.served = TestClass.path_tmp / "served"
+        TestClass.served.mkdir()
+
+        TestClass.payload = os.urandom(3 * 1024 * 1024 + 7)
+        (TestClass.served / "big.tar.gz").write_bytes(TestClass.payload)
+
+        handler = functools.partial(QuietHandler, directory=str(TestClass.served))
+        TestClass.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        TestClass.url = f"http://127.0.0.1:{TestClass.server.server_address[1]}"
+        threading.Thread(target=TestClass.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        TestClass.server.shutdown()
+        TestClass.server.server_close()
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.downloads = TestClass.path_tmp / "downloads"
+        self.downloads.mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.downloads))
+
+    def test_download_file(self):
+        path = self.downloads / "big.tar.gz"
+
+        assert download_file(f"{TestClass.url}/big.tar.gz", str(path), chunk_size=64 * 1024)
+
+        assert path.read_bytes() == TestClass.payload
+        assert not Path(f"{path}.part").exists()
+
+    def test_download_file_missing(self):
+        path = self.downloads / "missing.tar.gz"
+
+        assert not download_file(f"{TestClass.url}/missing.tar.gz", str(path))
+
+        # Nothing is left behind that might look like a finished download.
+        assert list(self.downloads.iterdir()) == []
+
+    def test_download_file_resume(self):
+        FlakyRangeHandler.payload = TestClass.payload
+        FlakyRangeHandler.requests = []
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FlakyRangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            path = self.downloads / "flaky.tar.gz"
+            url = f"http://127.0.0.1:{server.server_address[1]}/flaky.tar.gz"
+
+            assert download_file(url, str(path), chunk_size=64 * 1024, retries=2, backoff=0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert path.read_bytes() == TestClass.payload
+
+        # The retry picked up where the first attempt left off.
+        assert len(FlakyRangeHandler.requests) == 2
+        assert FlakyRangeHandler.requests[0] == None
+        offset = int(FlakyRangeHandler.requests[1][len("bytes="):-1])
+        assert 0 < offset <= len(TestClass.payload) // 2
+
+    def test_download_file_no_retries(self):
+        FlakyRangeHandler.payload = TestClass.payload
+        FlakyRangeHandler.requests = []
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FlakyRangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            path = self.downloads / "flaky.tar.gz"
+            url = f"http://127.0.0.1:{server.server_address[1]}/flaky.tar.gz"
+
+            assert not download_file(url, str(path), chunk_size=64 * 1024, retries=0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # The partial download is kept for next time, but never mistaken for the finished file.
+        assert not path.exists()
+        assert Path(f"{path}.part").exists()
+
+    def test_download_file_wrong_range(self):
+        WrongRangeHandler.payload = TestClass.payload
+        WrongRangeHandler.requests = []
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), WrongRangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            path = self.downloads / "wrong.tar.gz"
+            Path(f"{path}.part").write_bytes(TestClass.payload[: len(TestClass.payload) // 2])
+            url = f"http://127.0.0.1:{server.server_address[1]}/wrong.tar.gz"
+
+            assert download_file(url, str(path), chunk_size=64 * 1024, retries=1, backoff=0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # The unexpected range was thrown away, and the retry downloaded the whole file.
+        assert path.read_bytes() == TestClass.payload
+        assert len(WrongRangeHandler.requests) == 2
+        assert WrongRangeHandler.requests[1] == None
+
+    def test_download_file_content_encoding(self):
+        (TestClass.served / "encoded.tar.gz").write_bytes(gzip.compress(TestClass.payload))
+
+        handler = functools.partial(GzipEncodingHandler, directory=str(TestClass.served))
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            path = self.downloads / "encoded.tar.gz"
+            url = f"http://127.0.0.1:{server.server_address[1]}/encoded.tar.gz"
+
+            assert download_file(url, str(path), chunk_size=64 * 1024, retries=0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # The file is saved as served, not decompressed.
+        assert path.read_bytes() == (TestClass.served / "encoded.tar.gz").read_bytes()
+
+    def test_session_reuses_connections(self):
+        (TestClass.served / "small.tar.gz").write_bytes(b"small")
+
+        handler = functools.partial(KeepAliveHandler, directory=str(TestClass.served))
+        server = CountingServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        CountingServer.connections = 0
+        session = create_session()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            for i in range(3):
+                assert download_file(
+                    f"{url}/small.tar.gz", str(self.downloads / f"small-{i}.tar.gz"), session=session
+                )
+        finally:
+            session.close()
+            server.shutdown()
+            server.server_close()
+
+        assert CountingServer.connections == 1
+
+    def test_format_size(self):
+        assert format_size(10) == "10 B"
+        assert format_size(1536) == "1.5 KiB"
+        assert format_size(3 * 1024 * 1024) == "3.0 MiB"
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
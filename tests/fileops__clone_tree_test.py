@@ -0,0 +1,88 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for fileops.py utility functions
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.utils.fileops import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        self.src = self.path_tmp / "src"
+        (self.src / "foo-1.0" / "include").mkdir(parents=True)
+        (self.src / "foo-1.0" / "configure").write_text("#!/bin/sh\n")
+        (self.src / "foo-1.0" / "include" / "foo.h").write_text("int foo(void);\n")
+
+        # An old timestamp, like the files in a release tarball.
+        an_hour_ago = os.stat(str(self.src / "foo-1.0" / "configure")).st_mtime - 3600
+        os.utime(str(self.src / "foo-1.0" / "configure"), (an_hour_ago, an_hour_ago))
+
+        if platform.system() != "Windows":
+            os.symlink("include/foo.h", str(self.src / "foo-1.0" / "link.h"))
+
+        make_read_only(str(self.src))
+
+    def tearDown(self):
+        remove_tree(str(self.path_tmp))
+
+    def test_clone_tree(self):
+        dst = self.path_tmp / "dst"
+
+        clone_tree(str(self.src), str(dst), writable=True)
+
+        assert (dst / "foo-1.0" / "include" / "foo.h").read_text() == "int foo(void);\n"
+        assert os.stat(str(dst / "foo-1.0" / "configure")).st_mtime == os.stat(
+            str(self.src / "foo-1.0" / "configure")
+        ).st_mtime
+
+        if platform.system() != "Windows":
+            assert os.readlink(str(dst / "foo-1.0" / "link.h")) == "include/foo.h"
+
+        # The copy may be modified without touching the original.
+        (dst / "foo-1.0" / "include" / "foo.h").write_text("patched")
+        assert (self.src / "foo-1.0" / "include" / "foo.h").read_text() == "int foo(void);\n"
+
+    def test_make_read_only(self):
+        mode = os.stat(str(self.src / "foo-1.0" / "include" / "foo.h")).st_mode
+        assert not mode & stat.S_IWUSR
+
+    def test_remove_tree(self):
+        remove_tree(str(self.src))
+
+        assert not self.src.exists()
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,122 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for installing files with fileops.py
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.utils.fileops import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        self.src = self.path_tmp / "build" / "include"
+        (self.src / "foo").mkdir(parents=True)
+        for i in range(50):
+            (self.src / "foo" / f"header_{i}.h").write_text(f"#define FOO_{i} {i}\n")
+        (self.src / "foo.h").write_text('#include "foo/header_0.h"\n')
+
+        self.dst = self.path_tmp / "install" / "include"
+
+    def tearDown(self):
+        shutil.rmtree(str(self.path_tmp))
+
+    def test_install_tree(self):
+        counts = install_tree(str(self.src), str(self.dst))
+
+        assert sum(counts.values()) == 51
+        assert counts["unchanged"] == 0
+        assert (self.dst / "foo" / "header_7.h").read_text() == "#define FOO_7 7\n"
+
+    def test_install_tree_unchanged(self):
+        install_tree(str(self.src), str(self.dst))
+
+        counts = install_tree(str(self.src), str(self.dst))
+
+        assert counts["unchanged"] == 51
+
+    def test_install_tree_changed(self):
+        install_tree(str(self.src), str(self.dst))
+
+        # Rebuilding replaces a header with a new one.
+        (self.src / "foo" / "header_3.h").unlink()
+        (self.src / "foo" / "header_3.h").write_text("#define FOO_3 333\n")
+
+        counts = install_tree(str(self.src), str(self.dst))
+
+        assert counts["unchanged"] == 50
+        assert (self.dst / "foo" / "header_3.h").read_text() == "#define FOO_3 333\n"
+
+    def test_install_file_same_size_and_mtime(self):
+        self.dst.mkdir(parents=True)
+        install_file(str(self.src / "foo.h"), str(self.dst / "foo.h"))
+
+        # A rebuilt file with the same size and timestamp, but different content.
+        stat_result = os.stat(str(self.src / "foo.h"))
+        (self.src / "foo.h").write_text('#include "foo/header_1.h"\n')
+        os.utime(str(self.src / "foo.h"), ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+
+        assert install_file(str(self.src / "foo.h"), str(self.dst / "foo.h")) != "unchanged"
+        assert (self.dst / "foo.h").read_text() == '#include "foo/header_1.h"\n'
+
+    def test_install_file_not_linked_to_build(self):
+        self.dst.mkdir(parents=True)
+        install_file(str(self.src / "foo.h"), str(self.dst / "foo.h"))
+
+        # Rebuilding in place doesn't change the installed file.
+        with open(str(self.src / "foo.h"), "w") as f:
+            f.write("rebuilt\n")
+
+        assert (self.dst / "foo.h").read_text() == '#include "foo/header_0.h"\n'
+
+    def test_install_tree_removes_stale_files(self):
+        install_tree(str(self.src), str(self.dst))
+
+        (self.src / "foo" / "header_9.h").unlink()
+        (self.dst / "stale").mkdir()
+        (self.dst / "stale" / "old.h").write_text("")
+
+        install_tree(str(self.src), str(self.dst))
+
+        assert not (self.dst / "foo" / "header_9.h").exists()
+        assert not (self.dst / "stale").exists()
+        assert (self.dst / "foo" / "header_8.h").exists()
+
+    def test_install_file_replaces_directory(self):
+        (self.dst / "foo.h").mkdir(parents=True)
+
+        assert install_file(str(self.src / "foo.h"), str(self.dst / "foo.h")) != "unchanged"
+        assert (self.dst / "foo.h").read_text() == '#include "foo/header_0.h"\n'
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,151 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for assembling the dependency graph of a recipe
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mussels.mussels import Mussels
+
+RECIPE = """
+name: {name}
+version: "{version}"
+mussels_version: "0.3"
+type: recipe
+source:
+  none: true
+platforms:
+  Posix:
+    host:
+      build_script:
+        make: |
+          echo "{name}"
+      dependencies: [{dependencies}]
+      required_tools: []
+"""
+
+# Layers of recipes, where every recipe depends on every recipe in the layer below.
+# Expanding each path through the graph separately would take width ** depth steps.
+DIAMOND_WIDTH = 5
+DIAMOND_DEPTH = 20
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TC.cookbook = TC.path_tmp / "data" / "cookbooks" / "graph"
+        TC.cookbook.mkdir(parents=True)
+
+        recipes = [
+            ("zlib", "1.2.11", ""),
+            ("zlib", "1.2.12", ""),
+            ("openssl", "1.1.1", "zlib"),
+            ("libxml2", "2.9.10", "zlib<1.2.12"),
+            ("clamav", "0.103.0", "openssl, libxml2"),
+            ("chicken", "1.0", "egg"),
+            ("egg", "1.0", "chicken"),
+            ("farm", "1.0", "zlib, chicken"),
+        ]
+        for layer in range(DIAMOND_DEPTH):
+            for i in range(DIAMOND_WIDTH):
+                dependencies = ""
+                if layer > 0:
+                    dependencies = ", ".join(f"diamond{layer - 1}_{j}" for j in range(DIAMOND_WIDTH))
+                recipes.append((f"diamond{layer}_{i}", "1.0", dependencies))
+        recipes.append(
+            (
+                "diamonds",
+                "1.0",
+                ", ".join(f"diamond{DIAMOND_DEPTH - 1}_{j}" for j in range(DIAMOND_WIDTH)),
+            )
+        )
+
+        for name, version, dependencies in recipes:
+            (TC.cookbook / f"{name}-{version}.yaml").write_text(
+                RECIPE.format(name=name, version=version, dependencies=dependencies)
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TC.path_tmp))
+
+    def setUp(self):
+        # Recipes and tools are shared by all instances, so start each test empty.
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+        self.my_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"))
+
+    def tearDown(self):
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+    def test_one_version_per_recipe(self):
+        # openssl selects zlib before libxml2 rules out the newest version.
+        graph = self.my_mussels._get_build_graph("clamav", platform.system(), "host")
+
+        versions = {nvc.name: str(nvc.version) for nvc in graph}
+        assert versions == {"clamav": "0.103.0", "openssl": "1.1.1", "libxml2": "2.9.10", "zlib": "1.2.11"}
+
+        zlib = [nvc for nvc in graph if nvc.name == "zlib"][0]
+        clamav = [nvc for nvc in graph if nvc.name == "clamav"][0]
+        assert all(zlib in graph[nvc] for nvc in graph if nvc.name in ["openssl", "libxml2"])
+        assert len(graph[clamav]) == 2
+
+    def test_diamonds(self):
+        resolve = self.my_mussels.recipe_versions.resolve
+        calls = []
+
+        def counting_resolve(*args, **kwargs):
+            calls.append(args)
+            return resolve(*args, **kwargs)
+
+        self.my_mussels.recipe_versions.resolve = counting_resolve
+
+        graph = self.my_mussels._get_build_graph("diamonds", platform.system(), "host")
+
+        assert len(graph) == DIAMOND_WIDTH * DIAMOND_DEPTH + 1
+        for nvc, dependencies in graph.items():
+            if nvc.name.startswith("diamond0_"):
+                assert len(dependencies) == 0
+            else:
+                assert len(dependencies) == DIAMOND_WIDTH
+
+        # Each requirement is resolved about twice: once to walk it, and once for the final graph.
+        assert len(calls) <= 3 * len(graph)
+
+        batches = self.my_mussels._get_build_batches("diamonds", platform.system(), "host")
+        assert len(batches) == DIAMOND_DEPTH + 1
+
+    def test_circular_dependencies(self):
+        with pytest.raises(ValueError) as exc_info:
+            self.my_mussels._get_build_graph("farm", platform.system(), "host")
+
+        assert "Circular dependencies found!\n    graph:chicken-1.0, graph:egg-1.0" in str(exc_info.value)
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
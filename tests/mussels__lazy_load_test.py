@@ -0,0 +1,112 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for lazily loading recipes from the bookshelf
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mussels.mussels import Mussels
+
+RECIPE = """
+name: {name}
+version: "{version}"
+mussels_version: "0.3"
+type: recipe
+source:
+  none: true
+platforms:
+  Posix:
+    host:
+      build_script:
+        make: |
+          echo "{name}"
+      dependencies: [{dependencies}]
+      required_tools: []
+"""
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TC.cookbook = TC.path_tmp / "data" / "cookbooks" / "lazy"
+        TC.cookbook.mkdir(parents=True)
+
+        recipes = [
+            ("foo", "1.0", ""),
+            ("foo", "1.1", ""),
+            ("bar", "2.0", "foo>=1.1"),
+            ("unused", "3.0", ""),
+        ]
+        for name, version, dependencies in recipes:
+            (TC.cookbook / f"{name}-{version}.yaml").write_text(
+                RECIPE.format(name=name, version=version, dependencies=dependencies)
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TC.path_tmp))
+
+    def setUp(self):
+        # Recipes and tools are shared by all instances, so start each test empty.
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+    def tearDown(self):
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+    def test_0_only_used_recipes_loaded(self):
+        my_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"), lazy=True)
+
+        assert len(my_mussels.recipes) == 0
+        assert len(my_mussels.cookbooks["lazy"]["recipes"]) == 3
+
+        batches = my_mussels._get_build_batches("bar", platform.system(), "host")
+
+        assert "bar" in my_mussels.recipes
+        assert "foo" in my_mussels.recipes
+        assert "unused" not in my_mussels.recipes
+        assert [str(nvc.version) for batch in batches for nvc in batch] == ["1.1", "2.0"]
+
+    def test_1_missing_recipe(self):
+        my_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"), lazy=True)
+
+        assert "nope" not in my_mussels.sorted_recipes
+        with pytest.raises(KeyError):
+            my_mussels.sorted_recipes["nope"]
+
+    def test_2_same_as_eager(self):
+        lazy_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"), lazy=True)
+        lazy_foo = lazy_mussels.sorted_recipes["foo"]
+
+        Mussels.recipes.clear()
+        eager_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"))
+
+        assert lazy_foo == eager_mussels.sorted_recipes["foo"]
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
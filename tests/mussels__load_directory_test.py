@@ -0,0 +1,148 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for loading recipes and tools from a cookbook directory
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import unittest
+import tempfile
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from mussels.mussels import Mussels
+
+RECIPE = """
+name: {name}
+version: "{version}"
+mussels_version: "0.3"
+type: recipe
+source:
+  none: true
+platforms:
+  Posix:
+    host:
+      build_script:
+        make: |
+          echo "{name}"
+      dependencies: []
+      required_tools: []
+"""
+
+
+def write_recipe(path: Path, name: str, version: str):
+    path.write_text(RECIPE.format(name=name, version=version))
+
+    # Make the file look old, so the index will trust it.
+    an_hour_ago = time.time() - 3600
+    os.utime(str(path), (an_hour_ago, an_hour_ago))
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TC.cookbook = TC.path_tmp / "cookbook"
+        TC.cookbook.mkdir()
+
+        TC.my_mussels = Mussels(data_dir=str(TC.path_tmp / "data"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TC.path_tmp))
+
+    def setUp(self):
+        shutil.rmtree(str(TC.path_tmp / "data" / "cache"), ignore_errors=True)
+
+        for child in TC.cookbook.iterdir():
+            child.unlink()
+
+        self.parsed = []
+        read_yaml_file = Mussels._read_yaml_file
+
+        def counting_read_yaml_file(fpath):
+            self.parsed.append(os.path.basename(fpath))
+            return read_yaml_file(TC.my_mussels, fpath)
+
+        TC.my_mussels._read_yaml_file = counting_read_yaml_file
+
+    def tearDown(self):
+        del TC.my_mussels._read_yaml_file
+
+    def test_0_index_reused(self):
+        write_recipe(TC.cookbook / "foo.yaml", "foo", "1.0")
+        write_recipe(TC.cookbook / "bar.yaml", "bar", "2.0")
+
+        recipes, tools = TC.my_mussels.load_directory("test", str(TC.cookbook))
+        assert sorted(self.parsed) == ["bar.yaml", "foo.yaml"]
+
+        self.parsed.clear()
+        recipes, tools = TC.my_mussels.load_directory("test", str(TC.cookbook))
+        assert self.parsed == []
+
+        assert recipes["foo"]["1.0"].name == "foo"
+        assert recipes["bar"]["2.0"].version == "2.0"
+
+    def test_1_index_changed_file(self):
+        write_recipe(TC.cookbook / "foo.yaml", "foo", "1.0")
+        write_recipe(TC.cookbook / "bar.yaml", "bar", "2.0")
+        TC.my_mussels.load_directory("test", str(TC.cookbook))
+
+        self.parsed.clear()
+        write_recipe(TC.cookbook / "foo.yaml", "foo", "1.1")
+        (TC.cookbook / "bar.yaml").unlink()
+        recipes, tools = TC.my_mussels.load_directory("test", str(TC.cookbook))
+
+        assert self.parsed == ["foo.yaml"]
+        assert list(recipes["foo"].keys()) == ["1.1"]
+        assert "bar" not in recipes
+
+    def test_2_benchmark_read_bookshelf(self):
+        """
+        Load a synthetic cookbook with thousands of recipes, to catch cold-start regressions.
+        """
+        num_recipes = 3000
+
+        bookshelf_cookbook = TC.path_tmp / "data" / "cookbooks" / "synthetic"
+        bookshelf_cookbook.mkdir(parents=True)
+        for i in range(num_recipes):
+            write_recipe(bookshelf_cookbook / f"recipe_{i}.yaml", f"recipe_{i % 1000}", f"1.{i // 1000}")
+
+        start = time.time()
+        TC.my_mussels._read_bookshelf()
+        cold = time.time() - start
+
+        start = time.time()
+        TC.my_mussels._read_bookshelf()
+        warm = time.time() - start
+
+        assert len(TC.my_mussels.cookbooks["synthetic"]["recipes"]) == 1000
+        assert len(TC.my_mussels.recipes["recipe_999"]) == 3
+
+        # Generous limits, to catch gross regressions without being flaky.
+        assert cold < 60
+        assert warm < cold
+
+        shutil.rmtree(str(bookshelf_cookbook))
+        TC.my_mussels.cookbooks.pop("synthetic")
+        for i in range(1000):
+            TC.my_mussels.recipes.pop(f"recipe_{i}")
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,108 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for solving version conflicts that greedy version selection can't
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+
+import pytest
+
+from mussels.mussels import Mussels
+
+RECIPE = """
+name: {name}
+version: "{version}"
+mussels_version: "0.3"
+type: recipe
+source:
+  none: true
+platforms:
+  Posix:
+    host:
+      build_script:
+        make: |
+          echo "{name}"
+      dependencies: [{dependencies}]
+      required_tools: []
+"""
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TC.cookbook = TC.path_tmp / "data" / "cookbooks" / "solver"
+        TC.cookbook.mkdir(parents=True)
+
+        recipes = [
+            ("zlib", "1.2.11", ""),
+            ("zlib", "1.2.12", ""),
+            ("openssl", "1.1.1", "zlib"),
+            ("openssl", "3.0.0", "zlib>=1.2.12"),
+            ("libxml2", "2.9.10", "zlib<1.2.12"),
+            ("clamav", "0.103.0", "openssl, libxml2"),
+            ("broken", "1.0", "openssl>=3.0.0, libxml2"),
+        ]
+        for name, version, dependencies in recipes:
+            (TC.cookbook / f"{name}-{version}.yaml").write_text(
+                RECIPE.format(name=name, version=version, dependencies=dependencies)
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TC.path_tmp))
+
+    def setUp(self):
+        # Recipes and tools are shared by all instances, so start each test empty.
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+    def tearDown(self):
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+    def test_0_greedy_conflict_solved(self):
+        my_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"))
+
+        graph = my_mussels._get_build_graph("clamav", platform.system(), "host")
+
+        versions = {nvc.name: str(nvc.version) for nvc in graph}
+        assert versions == {"clamav": "0.103.0", "openssl": "1.1.1", "libxml2": "2.9.10", "zlib": "1.2.11"}
+
+        for nvc, dependencies in graph.items():
+            for dependency in dependencies:
+                assert dependency in graph
+
+    def test_1_unsatisfiable_explained(self):
+        my_mussels = Mussels(load_all_recipes=True, data_dir=str(TC.path_tmp / "data"), lazy=True)
+
+        with pytest.raises(Exception) as exc_info:
+            my_mussels._get_build_graph("broken", platform.system(), "host")
+
+        explanation = str(exc_info.value)
+        assert "No version of the broken recipe satisfies every requirement" in explanation
+        assert "solver:zlib-1.2.11 doesn't satisfy solver:zlib>=1.2.12, required by solver:openssl-3.0.0" in explanation
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,135 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for updating cookbooks from their git repositories
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import git
+import pytest
+
+import mussels.bookshelf
+from mussels.mussels import Mussels
+
+RECIPE = """
+name: {name}
+version: "{version}"
+mussels_version: "0.3"
+type: recipe
+source:
+  none: true
+platforms:
+  Posix:
+    host:
+      build_script:
+        make: |
+          echo "{name}"
+      dependencies: []
+      required_tools: []
+"""
+
+
+def commit_recipe(repo: git.Repo, name: str, version: str):
+    Path(repo.working_tree_dir, f"{name}.yaml").write_text(RECIPE.format(name=name, version=version))
+    repo.index.add([f"{name}.yaml"])
+    repo.index.commit(f"{name} {version}")
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        # Don't touch the public cookbooks.
+        self.public_cookbooks = mussels.bookshelf.cookbooks
+        mussels.bookshelf.cookbooks = {}
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+
+        self.upstreams = {}
+        for book in ["apples", "pears"]:
+            repo = git.Repo.init(str(TC.path_tmp / "upstream" / book))
+            with repo.config_writer() as config:
+                config.set_value("user", "name", "Test")
+                config.set_value("user", "email", "test@example.com")
+            commit_recipe(repo, book, "1.0")
+            self.upstreams[book] = repo
+
+        self.my_mussels = Mussels(data_dir=str(TC.path_tmp / "data"))
+        for book, repo in self.upstreams.items():
+            self.my_mussels.cookbooks[book]["url"] = repo.working_tree_dir
+            self.my_mussels.cookbooks[book]["trusted"] = True
+
+        self.read = []
+        read_cookbook = Mussels._read_cookbook
+
+        def counting_read_cookbook(cookbook, cookbook_path):
+            self.read.append(cookbook)
+            return read_cookbook(self.my_mussels, cookbook, cookbook_path)
+
+        self.my_mussels._read_cookbook = counting_read_cookbook
+
+    def tearDown(self):
+        mussels.bookshelf.cookbooks = self.public_cookbooks
+        Mussels.recipes.clear()
+        Mussels.tools.clear()
+        Mussels.cookbooks.clear()
+        shutil.rmtree(str(TC.path_tmp))
+
+    def test_0_clone(self):
+        self.my_mussels.update_cookbooks()
+
+        assert sorted(self.read) == ["apples", "pears"]
+        assert "1.0" in self.my_mussels.recipes["apples"]
+        assert "1.0" in self.my_mussels.recipes["pears"]
+
+    def test_1_only_changed_reread(self):
+        self.my_mussels.update_cookbooks()
+
+        commit_recipe(self.upstreams["pears"], "pears", "2.0")
+
+        self.read.clear()
+        self.my_mussels.update_cookbooks()
+
+        assert self.read == ["pears"]
+        assert "2.0" in self.my_mussels.recipes["pears"]
+
+    def test_2_failure_doesnt_stop_others(self):
+        self.my_mussels.update_cookbooks()
+
+        self.my_mussels.cookbooks["apples"]["url"] = str(TC.path_tmp / "nope")
+        shutil.rmtree(str(TC.path_tmp / "data" / "cookbooks" / "apples"))
+        commit_recipe(self.upstreams["pears"], "pears", "2.0")
+
+        self.my_mussels.update_cookbooks()
+
+        assert "2.0" in self.my_mussels.recipes["pears"]
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
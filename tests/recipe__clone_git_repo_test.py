@@ -0,0 +1,155 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for cloning git sources through the local git mirror
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import git
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+def make_recipe(source: dict, target: str = "host"):
+    recipe_class = type(
+        "FakeRecipe",
+        (BaseRecipe,),
+        {
+            "name": "fake",
+            "version": "1.0",
+            "source": source,
+            "platforms": {"Posix": {target: {"build_script": {}, "dependencies": [], "required_tools": []}}},
+        },
+    )
+    return recipe_class(
+        toolchain={},
+        platform="Posix",
+        target=target,
+        data_dir=str(TestClass.path_tmp / "data"),
+    )
+
+
+def commit(repo: git.Repo, content: str, tag: str = ""):
+    Path(repo.working_tree_dir, "hello.txt").write_text(content)
+    repo.index.add(["hello.txt"])
+    repo.index.commit(content)
+    if tag != "":
+        repo.create_tag(tag)
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        self.upstream_path = TestClass.path_tmp / "upstream"
+        self.upstream = git.Repo.init(str(self.upstream_path))
+        with self.upstream.config_writer() as config:
+            config.set_value("user", "name", "Test")
+            config.set_value("user", "email", "test@example.com")
+        commit(self.upstream, "one", tag="v1")
+        self.upstream.git.branch("-M", "main")
+        commit(self.upstream, "two", tag="v2")
+        commit(self.upstream, "three", tag="v3")
+
+        self.mirror_dir = TestClass.path_tmp / "data" / "cache" / "git"
+
+    def tearDown(self):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def test_targets_share_mirror(self):
+        for target in ["x86", "x64"]:
+            recipe = make_recipe({"git": str(self.upstream_path), "tag": "v1"}, target=target)
+            assert recipe._clone_git_repo(rebuild=False)
+
+            checkout = Path(recipe.builds[target])
+            assert (checkout / "hello.txt").read_text() == "one"
+            assert (checkout / ".git" / "shallow").exists()
+
+            # The build directory points at the real repository, not the mirror.
+            assert git.Repo(str(checkout)).remote("origin").url == str(self.upstream_path)
+
+        assert len(os.listdir(str(self.mirror_dir))) == 1
+
+    def test_rebuild_without_network(self):
+        recipe = make_recipe({"git": str(self.upstream_path), "tag": "v1"})
+        assert recipe._clone_git_repo(rebuild=False)
+
+        # The mirror already has the tag, so rebuilding doesn't need the upstream repository.
+        shutil.rmtree(str(self.upstream_path))
+
+        recipe = make_recipe({"git": str(self.upstream_path), "tag": "v1"})
+        assert recipe._clone_git_repo(rebuild=True)
+        assert (Path(recipe.builds["host"]) / "hello.txt").read_text() == "one"
+
+    def test_branch_updated(self):
+        recipe = make_recipe({"git": str(self.upstream_path), "branch": "main"})
+        assert recipe._clone_git_repo(rebuild=False)
+
+        commit(self.upstream, "four")
+
+        recipe = make_recipe({"git": str(self.upstream_path), "branch": "main"})
+        assert recipe._clone_git_repo(rebuild=True)
+        assert (Path(recipe.builds["host"]) / "hello.txt").read_text() == "four"
+
+    def test_shallow_by_default(self):
+        recipe = make_recipe({"git": str(self.upstream_path), "tag": "v2"})
+        assert recipe._clone_git_repo(rebuild=False)
+
+        checkout = git.Repo(recipe.builds["host"])
+        assert (Path(recipe.builds["host"]) / "hello.txt").read_text() == "two"
+        assert len(list(checkout.iter_commits())) == 1
+
+    def test_full_history(self):
+        # Start with a shallow mirror, as if another recipe had only needed one commit.
+        recipe = make_recipe({"git": str(self.upstream_path), "tag": "v3"})
+        assert recipe._clone_git_repo(rebuild=False)
+
+        recipe = make_recipe({"git": str(self.upstream_path), "tag": "v3", "depth": 0})
+        assert recipe._clone_git_repo(rebuild=True)
+
+        checkout = git.Repo(recipe.builds["host"])
+        assert len(list(checkout.iter_commits())) == 3
+
+    def test_filter(self):
+        self.upstream.git.config("uploadpack.allowFilter", "true")
+        url = f"file://{self.upstream_path}"
+
+        recipe = make_recipe({"git": url, "tag": "v3", "filter": "blob:none"})
+        assert recipe._clone_git_repo(rebuild=False)
+
+        checkout = git.Repo(recipe.builds["host"])
+        assert (Path(recipe.builds["host"]) / "hello.txt").read_text() == "three"
+        assert checkout.git.config("remote.origin.partialclonefilter") == "blob:none"
+
+        # Partial clones are made straight from the real repository.
+        assert not self.mirror_dir.exists()
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
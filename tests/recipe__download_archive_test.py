@@ -0,0 +1,154 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for the content-addressed download cache
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import hashlib
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_recipe(uri: str, download_dir: str, sha256: str = ""):
+    source = {"uri": uri}
+    if sha256 != "":
+        source["sha256"] = sha256
+
+    recipe_class = type(
+        "FakeRecipe",
+        (BaseRecipe,),
+        {
+            "name": "fake",
+            "version": "1.0",
+            "source": source,
+            "platforms": {"Posix": {"host": {"build_script": {}, "dependencies": [], "required_tools": []}}},
+        },
+    )
+    return recipe_class(
+        toolchain={},
+        platform="Posix",
+        target="host",
+        data_dir=str(TestClass.path_tmp),
+        download_dir=download_dir,
+    )
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        TestClass.served = TestClass.path_tmp / "served"
+        (TestClass.served / "a").mkdir(parents=True)
+        (TestClass.served / "b").mkdir(parents=True)
+
+        TestClass.payload = b"pretend this is a tarball" * 1000
+        TestClass.digest = hashlib.sha256(TestClass.payload).hexdigest()
+        (TestClass.served / "a" / "foo.tar.gz").write_bytes(TestClass.payload)
+        (TestClass.served / "b" / "foo.tar.gz").write_bytes(TestClass.payload)
+        (TestClass.served / "b" / "other.tar.gz").write_bytes(b"something else")
+
+        handler = functools.partial(QuietHandler, directory=str(TestClass.served))
+        TestClass.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        TestClass.url = f"http://127.0.0.1:{TestClass.server.server_address[1]}"
+        threading.Thread(target=TestClass.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        TestClass.server.shutdown()
+        TestClass.server.server_close()
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.downloads = TestClass.path_tmp / "downloads"
+        self.downloads.mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(str(self.downloads))
+
+    def stored_files(self) -> list:
+        return sorted(os.listdir(str(self.downloads / "by-hash" / "sha256")))
+
+    def test_deduplicated(self):
+        a = make_recipe(f"{TestClass.url}/a/foo.tar.gz", str(self.downloads))
+        b = make_recipe(f"{TestClass.url}/b/foo.tar.gz", str(self.downloads))
+
+        assert a._download_archive()
+        assert b._download_archive()
+
+        assert a.download_path == b.download_path
+        assert self.stored_files() == [TestClass.digest]
+        assert Path(a.download_path).read_bytes() == TestClass.payload
+
+    def test_same_name_different_content(self):
+        a = make_recipe(f"{TestClass.url}/a/foo.tar.gz", str(self.downloads))
+        b = make_recipe(f"{TestClass.url}/b/other.tar.gz", str(self.downloads))
+        b.archive_name_change = ("other", "foo")
+
+        assert a._download_archive()
+        assert b._download_archive()
+
+        # Both archives are named foo.tar.gz, but they don't clobber each other.
+        assert a.archive == b.archive
+        assert a.download_path != b.download_path
+        assert Path(b.download_path).read_bytes() == b"something else"
+
+    def test_checksum_mismatch(self):
+        recipe = make_recipe(
+            f"{TestClass.url}/b/other.tar.gz", str(self.downloads), sha256=TestClass.digest
+        )
+
+        assert not recipe._download_archive()
+        assert not (self.downloads / "by-hash").exists()
+
+    def test_corrupt_cache_detected(self):
+        recipe = make_recipe(
+            f"{TestClass.url}/a/foo.tar.gz", str(self.downloads), sha256=TestClass.digest
+        )
+        assert recipe._download_archive()
+
+        Path(recipe.download_path).write_bytes(b"bit rot")
+
+        recipe = make_recipe(
+            f"{TestClass.url}/a/foo.tar.gz", str(self.downloads), sha256=TestClass.digest
+        )
+        assert recipe._download_archive()
+        assert Path(recipe.download_path).read_bytes() == TestClass.payload
+
+    def test_legacy_download_imported(self):
+        (self.downloads / "foo.tar.gz").write_bytes(TestClass.payload)
+
+        recipe = make_recipe("https://unreachable.invalid/foo.tar.gz", str(self.downloads))
+
+        assert recipe._download_archive()
+        assert self.stored_files() == [TestClass.digest]
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
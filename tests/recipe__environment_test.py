@@ -0,0 +1,112 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for the environment that recipe build scripts run in
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+class FakeRecipe(BaseRecipe):
+    name = "fake"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {"make": 'echo "$PATH" > path.txt'},
+                "dependencies": [],
+                "required_tools": [],
+                "install_paths": {"share": ["path.txt"]},
+            }
+        }
+    }
+
+
+class FakeTool(object):
+    platforms = {"Posix": {}}
+
+    def __init__(self, tool_path):
+        self.tool_path = tool_path
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="The build scripts are for Posix shells.")
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.path = os.environ["PATH"]
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        for path in TestClass.path_tmp.iterdir():
+            shutil.rmtree(str(path))
+
+    def test_tool_paths_not_added_to_process_path(self):
+        toolchain = {
+            "first": FakeTool(str(TestClass.path_tmp / "first")),
+            "second": FakeTool(str(TestClass.path_tmp / "second")),
+            "none": FakeTool(""),
+        }
+
+        for _ in range(3):
+            recipe = FakeRecipe(
+                toolchain=toolchain,
+                platform="Posix",
+                target="host",
+                data_dir=str(TestClass.path_tmp / "data"),
+                install_dir=str(TestClass.path_tmp / "install"),
+            )
+            assert recipe.build()
+
+        # Mussels' own PATH is unchanged, however many recipes are built.
+        assert os.environ["PATH"] == self.path
+
+        # The build script sees each tool path once, ahead of the rest of the PATH.
+        script_path = (TestClass.path_tmp / "install" / "share" / "path.txt").read_text().strip()
+        entries = script_path.split(os.pathsep)
+        assert entries[:2] == [str(TestClass.path_tmp / "second"), str(TestClass.path_tmp / "first")]
+        assert entries.count(str(TestClass.path_tmp / "first")) == 1
+
+    def test_duplicate_path_entries_removed(self):
+        os.environ["PATH"] = os.pathsep.join(["/usr/bin", "/bin", "/usr/bin/", "/bin"])
+
+        recipe = FakeRecipe(
+            toolchain={"tool": FakeTool("/usr/bin")},
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp / "data"),
+        )
+
+        assert recipe._create_environment()["PATH"] == os.pathsep.join(["/usr/bin", "/bin"])
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,113 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for extracting recipe sources through the pristine source cache
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+import mussels.recipe
+from mussels.recipe import BaseRecipe
+from mussels.utils.fileops import remove_tree
+
+
+def make_recipe(target: str = "host"):
+    recipe_class = type(
+        "FakeRecipe",
+        (BaseRecipe,),
+        {
+            "name": "foo",
+            "version": "1.0",
+            "source": {"uri": "https://unreachable.invalid/foo-1.0.tar.gz"},
+            "platforms": {"Posix": {target: {"build_script": {}, "dependencies": [], "required_tools": []}}},
+        },
+    )
+    return recipe_class(
+        toolchain={},
+        platform="Posix",
+        target=target,
+        data_dir=str(TC.path_tmp / "data"),
+        download_dir=str(TC.path_tmp / "downloads"),
+    )
+
+
+class TC(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        TC.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+        source = TC.path_tmp / "foo-1.0"
+        source.mkdir()
+        (source / "foo.c").write_text("int foo(void) { return 0; }\n")
+
+        # Pretend the archive was downloaded by an older version of Mussels.
+        (TC.path_tmp / "downloads").mkdir()
+        with tarfile.open(str(TC.path_tmp / "downloads" / "foo-1.0.tar.gz"), "w:gz") as tar:
+            tar.add(str(source), arcname="foo-1.0")
+
+        self.extractions = 0
+        extract_archive = mussels.recipe.extract_archive
+
+        def counting_extract_archive(*args, **kwargs):
+            self.extractions += 1
+            return extract_archive(*args, **kwargs)
+
+        mussels.recipe.extract_archive = counting_extract_archive
+        self.extract_archive = extract_archive
+
+    def tearDown(self):
+        mussels.recipe.extract_archive = self.extract_archive
+        remove_tree(str(TC.path_tmp))
+
+    def test_extracted_once(self):
+        for target in ["x86", "x64", "x64"]:
+            recipe = make_recipe(target)
+            assert recipe._download_archive()
+            assert recipe._extract_archive(rebuild=True)
+
+            assert (Path(recipe.builds[target]) / "foo.c").exists()
+
+        assert self.extractions == 1
+
+    def test_pristine_untouched(self):
+        recipe = make_recipe()
+        assert recipe._download_archive()
+        assert recipe._extract_archive(rebuild=False)
+
+        # Patch the build directory, then rebuild.
+        (Path(recipe.builds["host"]) / "foo.c").write_text("patched")
+
+        recipe = make_recipe()
+        assert recipe._download_archive()
+        assert recipe._extract_archive(rebuild=True)
+
+        assert (Path(recipe.builds["host"]) / "foo.c").read_text() == "int foo(void) { return 0; }\n"
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,85 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for fetching recipe sources ahead of the build
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+class FakeRecipe(BaseRecipe):
+    name = "fake"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {"Posix": {"host": {"build_script": {}, "dependencies": [], "required_tools": []}}}
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.recipe = FakeRecipe(
+            toolchain={}, platform="Posix", target="host", data_dir=str(TestClass.path_tmp)
+        )
+        self.fetches = 0
+
+        def slow_fetch(rebuild):
+            self.fetches += 1
+            time.sleep(0.2)
+            return True
+
+        self.recipe._fetch = slow_fetch
+
+    def tearDown(self):
+        pass
+
+    def test_fetch_once(self):
+        threads = [threading.Thread(target=self.recipe.fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+
+        # A build that catches up with a prefetch waits for it, rather than fetching again.
+        assert self.recipe.fetch()
+
+        for thread in threads:
+            thread.join()
+
+        assert self.fetches == 1
+
+    def test_fetch_failure_remembered(self):
+        self.recipe._fetch = lambda rebuild: False
+
+        assert not self.recipe.fetch()
+        assert not self.recipe.fetch()
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,162 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for recipe build fingerprints
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+class FakeRecipe(BaseRecipe):
+    name = "fake"
+    version = "1.0"
+    source = {"uri": "https://example.com/fake-1.0.tar.gz", "sha256": "ab" * 32}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {"make": "make"},
+                "dependencies": [],
+                "required_tools": ["make>=4.0"],
+                "patches": "patches",
+            }
+        }
+    }
+    variables = {"flags": "-O2"}
+
+
+class FakeTool(object):
+    version = "4.2"
+    tool_path = "/usr/bin"
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.recipe_dir = TestClass.path_tmp / "recipes"
+        os.makedirs(self.recipe_dir / "patches", exist_ok=True)
+        (self.recipe_dir / "fake.yaml").write_text("name: fake\n")
+        (self.recipe_dir / "patches" / "fix.patch").write_text("--- a\n+++ b\n")
+        FakeRecipe.module_file = str(self.recipe_dir / "fake.yaml")
+
+        self.install_dir = TestClass.path_tmp / "install"
+
+    def tearDown(self):
+        shutil.rmtree(str(self.recipe_dir))
+        if self.install_dir.exists():
+            shutil.rmtree(str(self.install_dir))
+
+    def create_recipe(self, recipe_class=FakeRecipe, toolchain=None):
+        return recipe_class(
+            toolchain={"make": FakeTool()} if toolchain == None else toolchain,
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp),
+            install_dir=str(self.install_dir),
+        )
+
+    def test_fingerprint_is_stable(self):
+        fingerprint = self.create_recipe().fingerprint(["1" * 64])
+
+        assert len(fingerprint) == 64
+        assert self.create_recipe().fingerprint(["1" * 64]) == fingerprint
+
+    def test_fingerprint_changes_with_inputs(self):
+        fingerprint = self.create_recipe().fingerprint(["1" * 64])
+
+        # A dependency changed.
+        assert self.create_recipe().fingerprint(["2" * 64]) != fingerprint
+
+        # A different tool version.
+        newer_tool = FakeTool()
+        newer_tool.version = "4.3"
+        assert self.create_recipe(toolchain={"make": newer_tool}).fingerprint(["1" * 64]) != fingerprint
+
+        # A variable changed.
+        class OtherVariables(FakeRecipe):
+            variables = {"flags": "-O0"}
+
+        assert self.create_recipe(OtherVariables).fingerprint(["1" * 64]) != fingerprint
+
+        # A different source archive.
+        class OtherSource(FakeRecipe):
+            source = {"uri": "https://example.com/fake-1.0.tar.gz", "sha256": "cd" * 32}
+
+        assert self.create_recipe(OtherSource).fingerprint(["1" * 64]) != fingerprint
+
+        # A patch changed.
+        (self.recipe_dir / "patches" / "fix.patch").write_text("--- a\n+++ c\n")
+        assert self.create_recipe().fingerprint(["1" * 64]) != fingerprint
+
+        # The recipe file changed.
+        (self.recipe_dir / "patches" / "fix.patch").write_text("--- a\n+++ b\n")
+        assert self.create_recipe().fingerprint(["1" * 64]) == fingerprint
+        (self.recipe_dir / "fake.yaml").write_text("name: fake\n# comment\n")
+        assert self.create_recipe().fingerprint(["1" * 64]) != fingerprint
+
+    def test_unknown_inputs_have_no_fingerprint(self):
+        class BranchSource(FakeRecipe):
+            source = {"git": "https://example.com/fake.git", "branch": "main"}
+
+        class TagSource(FakeRecipe):
+            source = {"git": "https://example.com/fake.git", "tag": "v1.0"}
+
+        class UnrecordedSource(FakeRecipe):
+            source = {"uri": "https://example.com/unrecorded-1.0.tar.gz"}
+
+        assert self.create_recipe(BranchSource).fingerprint([]) == ""
+        assert self.create_recipe(TagSource).fingerprint([]) != ""
+        assert self.create_recipe(UnrecordedSource).fingerprint([]) == ""
+
+        # A dependency without a fingerprint might have changed.
+        assert self.create_recipe().fingerprint(["1" * 64, ""]) == ""
+
+    def test_record_fingerprint(self):
+        recipe = self.create_recipe()
+        fingerprint = recipe.fingerprint([])
+
+        assert not recipe.is_up_to_date(fingerprint)
+
+        recipe.record_fingerprint(fingerprint)
+        assert recipe.is_up_to_date(fingerprint)
+        assert not recipe.is_up_to_date("0" * 64)
+        assert not recipe.is_up_to_date("")
+
+        # Another version of the recipe doesn't match the record.
+        class NewerRecipe(FakeRecipe):
+            version = "1.1"
+
+        assert not self.create_recipe(NewerRecipe).is_up_to_date(fingerprint)
+
+        recipe.record_fingerprint("")
+        assert not recipe.is_up_to_date(fingerprint)
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,168 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for tracking which files a recipe build installs
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pytest
+
+from mussels.recipe import BaseRecipe
+
+
+class FakeRecipe(BaseRecipe):
+    name = "fake"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {
+                    "make": "mkdir -p lib && echo library > lib/libfake.a",
+                    "install": 'mkdir -p "$DESTDIR{install}/bin" && echo tool > "$DESTDIR{install}/bin/fake"',
+                },
+                "dependencies": [],
+                "required_tools": [],
+                "install_paths": {"lib": ["lib/libfake.a"]},
+            }
+        }
+    }
+
+
+class RebuiltRecipe(BaseRecipe):
+    name = "rebuilt"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {
+                    # Build systems remember the install prefix when they're configured.
+                    "make": "mkdir -p inc && echo header > inc/a.h && echo {install} > prefix.txt",
+                    # Rewrites an identical file, skips a file that's already installed, and
+                    # installs to the configured prefix under DESTDIR, like `make install`.
+                    "install": 'mkdir -p "$DESTDIR{install}/include" && cp -p inc/a.h "$DESTDIR{install}/include/a.h"\n'
+                    + '[ -f "$DESTDIR{install}/include/b.h" ] || cp inc/a.h "$DESTDIR{install}/include/b.h"\n'
+                    + 'mkdir -p "$DESTDIR$(cat prefix.txt)/share" && echo data > "$DESTDIR$(cat prefix.txt)/share/data"',
+                },
+                "dependencies": [],
+                "required_tools": [],
+            }
+        }
+    }
+
+
+class DestdirRecipe(BaseRecipe):
+    name = "destdir"
+    version = "1.0"
+    source = {"none": True}
+    platforms = {
+        "Posix": {
+            "host": {
+                "build_script": {
+                    "install": 'mkdir -p "$DESTDIR{install}/lib" && echo library > "$DESTDIR{install}/lib/libr.a"',
+                },
+                "dependencies": [],
+                "required_tools": [],
+            }
+        }
+    }
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="The build scripts are for Posix shells.")
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        TestClass.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(str(TestClass.path_tmp))
+
+    def setUp(self):
+        self.install_dir = TestClass.path_tmp / "install"
+        (self.install_dir / "include").mkdir(parents=True)
+        (self.install_dir / "include" / "other.h").write_text("another recipe's header")
+
+    def tearDown(self):
+        for path in TestClass.path_tmp.iterdir():
+            shutil.rmtree(str(path))
+
+    def create_recipe(self, track_installs, recipe_class=FakeRecipe):
+        return recipe_class(
+            toolchain={},
+            platform="Posix",
+            target="host",
+            data_dir=str(TestClass.path_tmp / "data"),
+            install_dir=str(self.install_dir),
+            track_installs=track_installs,
+        )
+
+    def test_installed_files(self):
+        recipe = self.create_recipe(track_installs=True)
+
+        assert recipe.build()
+
+        # Both the install script's files and the install_paths are tracked, but not other recipes' files.
+        assert recipe.installed_files == {os.path.join("bin", "fake"), os.path.join("lib", "libfake.a")}
+
+        # Files that were already installed and haven't changed are still part of the build.
+        recipe = self.create_recipe(track_installs=True)
+        assert recipe.build()
+        assert os.path.join("lib", "libfake.a") in recipe.installed_files
+
+    def test_rebuild_tracks_unchanged_files(self):
+        expected = {
+            os.path.join("include", "a.h"),
+            os.path.join("include", "b.h"),
+            os.path.join("share", "data"),
+        }
+
+        for _ in range(2):
+            recipe = self.create_recipe(track_installs=True, recipe_class=RebuiltRecipe)
+            assert recipe.build()
+            assert recipe.installed_files == expected
+
+        assert (self.install_dir / "include" / "a.h").read_text() == "header\n"
+        assert (self.install_dir / "share" / "data").read_text() == "data\n"
+        assert (self.install_dir / "include" / "other.h").is_file()
+
+        # Staging happens outside of the install directory, and is cleaned up.
+        assert not (self.install_dir / ".mussels").exists()
+        assert os.listdir(str(TestClass.path_tmp / "data" / "cache" / "work" / "host" / "staging")) == []
+
+    def test_destdir_install(self):
+        recipe = self.create_recipe(track_installs=True, recipe_class=DestdirRecipe)
+
+        assert recipe.build()
+        assert recipe.installed_files == {os.path.join("lib", "libr.a")}
+        assert (self.install_dir / "lib" / "libr.a").read_text() == "library\n"
+
+    def test_not_tracked_by_default(self):
+        recipe = self.create_recipe(track_installs=False)
+
+        assert recipe.build()
+        assert recipe.installed_files == set()
+        assert (self.install_dir / "bin" / "fake").is_file()
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,133 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for scheduler.py utility functions
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import threading
+import time
+import unittest
+
+import pytest
+
+from mussels.utils.scheduler import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        # "slow" holds back "c" in a level-synchronous build, even though "c" only needs "fast".
+        self.graph = {
+            "fast": set(),
+            "slow": set(),
+            "c": {"fast"},
+            "d": {"c"},
+            "top": {"slow", "d"},
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_get_batches(self):
+        batches = get_batches(self.graph)
+
+        assert batches == [{"fast", "slow"}, {"c"}, {"d"}, {"top"}]
+
+    def test_get_batches_circular(self):
+        with pytest.raises(ValueError):
+            get_batches({"a": {"b"}, "b": {"a"}})
+
+    def test_strongly_connected_components(self):
+        components = strongly_connected_components(self.graph)
+
+        assert len(components) == len(self.graph)
+        assert components.index({"fast"}) < components.index({"c"}) < components.index({"d"})
+        assert find_cycles(self.graph) == []
+
+    def test_find_cycles(self):
+        graph = {"a": {"b"}, "b": {"c"}, "c": {"a", "d"}, "d": set(), "e": {"e"}, "f": {"a"}}
+
+        cycles = find_cycles(graph)
+
+        assert len(cycles) == 2
+        assert {"a", "b", "c"} in cycles
+        assert {"e"} in cycles
+
+    def test_find_cycles_deep(self):
+        # Deeper than Python's recursion limit.
+        graph = {i: {i + 1} for i in range(5000)}
+        graph[5000] = {0}
+
+        assert find_cycles(graph) == [set(graph)]
+
+    def test_critical_path_lengths(self):
+        lengths = critical_path_lengths(self.graph)
+
+        assert lengths["top"] == 1
+        assert lengths["fast"] == 4
+        assert lengths["slow"] == 2
+
+    def test_run_graph_order(self):
+        order = []
+        lock = threading.Lock()
+
+        def build(node):
+            with lock:
+                order.append(node)
+            return True
+
+        run = run_graph(self.graph, build, jobs=1)
+
+        # The longest chain is started first.
+        assert order == ["fast", "c", "slow", "d", "top"]
+        assert run["failed"] == []
+        assert run["skipped"] == []
+
+    def test_run_graph_no_barrier(self):
+        started = {}
+
+        def build(node):
+            started[node] = time.time()
+            time.sleep(0.5 if node == "slow" else 0.1)
+            return True
+
+        begin = time.time()
+        run = run_graph(self.graph, build, jobs=2)
+
+        # "d" doesn't wait for "slow" to finish.
+        assert started["d"] - begin < 0.5
+        assert run["parallelism"] > 1.0
+        assert len(run["succeeded"]) == 5
+
+    def test_run_graph_failure(self):
+        def build(node):
+            return node != "c"
+
+        run = run_graph(self.graph, build, jobs=1)
+
+        assert run["failed"] == ["c"]
+        assert set(run["skipped"]) == {"d", "top", "slow"}
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
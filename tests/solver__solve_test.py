@@ -0,0 +1,208 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests and benchmarks for the version solver
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import time
+import unittest
+
+import pytest
+
+from mussels.utils.solver import *
+
+# Generous, so slow CI machines pass. Chronological backtracking takes forever on these graphs.
+BENCHMARK_SECONDS = 10.0
+
+
+class Cookbook(object):
+    """
+    A fake cookbook of recipes, for the solver.
+
+    Each recipe maps version -> list of requirement strings, newest version first.
+    """
+
+    def __init__(self, recipes: dict, cookbook: str = "scrapbook") -> None:
+        self.recipes = recipes
+        self.cookbook = cookbook
+
+    def candidates(self, kind: str, name: str) -> list:
+        return [(version, self.cookbook) for version in self.recipes.get(name, {})]
+
+    def dependencies(self, kind: str, name: str, version: str, cookbook: str) -> list:
+        return [requirement("recipe", text) for text in self.recipes[name][version]]
+
+    def solve(self, *requirements: str) -> dict:
+        solution = solve(
+            [requirement("recipe", text) for text in requirements],
+            self.candidates,
+            self.dependencies,
+        )
+        return {name: version for (_, name), (version, _) in solution.items()}
+
+
+class TestClass(unittest.TestCase):
+    def test_newest_versions_preferred(self):
+        cookbook = Cookbook(
+            {
+                "clamav": {"0.103.0": ["zlib", "openssl>=1.1.0"]},
+                "zlib": {"1.2.12": [], "1.2.11": []},
+                "openssl": {"3.0.0": ["zlib"], "1.1.1": ["zlib"]},
+            }
+        )
+
+        assert cookbook.solve("clamav") == {"clamav": "0.103.0", "zlib": "1.2.12", "openssl": "3.0.0"}
+
+    def test_backtracks_past_greedy_choice(self):
+        # Selecting the newest openssl first rules out the zlib that libxml2 needs.
+        cookbook = Cookbook(
+            {
+                "clamav": {"0.103.0": ["openssl", "libxml2"]},
+                "openssl": {"3.0.0": ["zlib>=1.2.12"], "1.1.1": ["zlib"]},
+                "libxml2": {"2.9.10": ["zlib<1.2.12"]},
+                "zlib": {"1.2.12": [], "1.2.11": []},
+            }
+        )
+
+        assert cookbook.solve("clamav") == {
+            "clamav": "0.103.0",
+            "openssl": "1.1.1",
+            "libxml2": "2.9.10",
+            "zlib": "1.2.11",
+        }
+
+    def test_dependency_on_chosen_version(self):
+        # Newer json_c needs newer zlib than was already chosen for the build request.
+        cookbook = Cookbook(
+            {
+                "zlib": {"1.2.12": [], "1.2.11": []},
+                "json_c": {"0.15": ["zlib>=1.2.12"], "0.14": ["zlib"]},
+            }
+        )
+
+        assert cookbook.solve("zlib<1.2.12", "json_c") == {"zlib": "1.2.11", "json_c": "0.14"}
+
+    def test_dropped_dependencies_not_chosen(self):
+        cookbook = Cookbook(
+            {
+                "clamav": {"0.103.0": ["pcre2", "curl"]},
+                "pcre2": {"10.35": ["bzip2==2.0"], "10.33": []},
+                "bzip2": {"1.0.8": []},
+                "curl": {"7.73.0": []},
+            }
+        )
+
+        assert cookbook.solve("clamav") == {"clamav": "0.103.0", "pcre2": "10.33", "curl": "7.73.0"}
+
+    def test_local_stands_in_for_cookbook(self):
+        def candidates(kind: str, name: str) -> list:
+            return [("1.2.11", "local"), ("1.2.11", "scrapbook")]
+
+        solution = solve([requirement("recipe", "scrapbook:zlib==1.2.11")], candidates, lambda *_: [])
+
+        assert solution == {("recipe", "zlib"): ("1.2.11", "local")}
+
+    def test_cookbook_required(self):
+        def candidates(kind: str, name: str) -> list:
+            return [("1.2.12", "tectonic"), ("1.2.11", "scrapbook")]
+
+        solution = solve([requirement("recipe", "scrapbook:zlib")], candidates, lambda *_: [])
+
+        assert solution == {("recipe", "zlib"): ("1.2.11", "scrapbook")}
+
+    def test_tools(self):
+        recipes = {("recipe", "clamav"): [("0.103.0", "scrapbook")], ("tool", "cmake"): [("3.18", "scrapbook"), ("3.14", "scrapbook")]}
+
+        def dependencies(kind: str, name: str, version: str, cookbook: str) -> list:
+            return [requirement("tool", "cmake<3.16")] if kind == "recipe" else []
+
+        solution = solve(
+            [requirement("recipe", "clamav")], lambda kind, name: recipes[(kind, name)], dependencies
+        )
+
+        assert solution[("tool", "cmake")] == ("3.14", "scrapbook")
+
+    def test_unsatisfiable_explained(self):
+        cookbook = Cookbook(
+            {
+                "clamav": {"0.103.0": ["openssl", "libxml2"]},
+                "openssl": {"3.0.0": ["zlib>=1.2.12"]},
+                "libxml2": {"2.9.10": ["zlib<1.2.12"]},
+                "zlib": {"1.2.12": [], "1.2.11": []},
+            }
+        )
+
+        with pytest.raises(Unsatisfiable) as exc_info:
+            cookbook.solve("clamav")
+
+        explanation = str(exc_info.value)
+        assert "zlib-1.2.12 doesn't satisfy zlib<1.2.12, required by scrapbook:libxml2-2.9.10" in explanation
+        assert "zlib-1.2.11 doesn't satisfy zlib>=1.2.12, required by scrapbook:openssl-3.0.0" in explanation
+
+    def test_missing_item_explained(self):
+        cookbook = Cookbook({"clamav": {"0.103.0": ["nope>=1.0"]}})
+
+        with pytest.raises(Unsatisfiable) as exc_info:
+            cookbook.solve("clamav")
+
+        explanation = str(exc_info.value)
+        assert "No versions of the nope recipe are available to satisfy nope>=1.0, required by scrapbook:clamav-0.103.0" in explanation
+
+    def test_benchmark_backjumping(self):
+        # Many unrelated recipes are chosen between the choice that caused a conflict, and the
+        # recipe that finds it. Chronological backtracking would try every combination of them.
+        num_recipes = 2000
+        recipes = {f"lib{i}": {"3.0": [], "2.0": [], "1.0": []} for i in range(num_recipes)}
+        recipes["openssl"] = {"3.0.0": ["zlib>=1.2.12"], "1.1.1": ["zlib"]}
+        recipes["libxml2"] = {"2.9.10": ["zlib<1.2.12"]}
+        recipes["zlib"] = {"1.2.12": [], "1.2.11": []}
+        cookbook = Cookbook(recipes)
+
+        start = time.time()
+        solution = cookbook.solve("openssl", *[f"lib{i}" for i in range(num_recipes)], "libxml2")
+        elapsed = time.time() - start
+
+        assert solution["openssl"] == "1.1.1"
+        assert solution["zlib"] == "1.2.11"
+        assert all(solution[f"lib{i}"] == "3.0" for i in range(num_recipes))
+        assert elapsed < BENCHMARK_SECONDS
+
+    def test_benchmark_deep_graph(self):
+        # A deep graph where each recipe depends on the next few, and the newest versions of the
+        # recipe at the bottom conflict with a requirement from the recipe at the top.
+        num_recipes = 1000
+        last = f"lib{num_recipes - 1}"
+        recipes = {}
+        for i in range(num_recipes):
+            dependencies = [f"lib{j}" for j in range(i + 1, min(i + 4, num_recipes))]
+            recipes[f"lib{i}"] = {f"{v}.0": list(dependencies) for v in range(5, 0, -1)}
+        for v in range(5, 1, -1):
+            recipes["lib0"][f"{v}.0"].append(f"{last}<2.0")
+            recipes[f"lib{num_recipes - 2}"][f"{v}.0"].append(f"{last}>=2.0")
+        cookbook = Cookbook(recipes)
+
+        start = time.time()
+        solution = cookbook.solve("lib0")
+        elapsed = time.time() - start
+
+        assert len(solution) == num_recipes
+        assert solution["lib0"] == "5.0"
+        assert solution[f"lib{num_recipes - 2}"] == "1.0"
+        assert solution[last] == "1.0"
+        assert elapsed < BENCHMARK_SECONDS
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
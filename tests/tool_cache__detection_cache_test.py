@@ -0,0 +1,160 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for the tool detection cache
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from mussels.mussels import Mussels
+from mussels.tool import BaseTool
+from mussels.utils.tool_cache import *
+
+TOOL_NAME = "msl-test-tool"
+
+# An old timestamp, so any change to a file or directory is seen as a change.
+OLD_TIME_NS = 1000000000 * 1000000000
+
+
+def tool_class(checks: dict, version: str = "1.0") -> type:
+    return type(
+        "test_tool",
+        (BaseTool,),
+        {"name": TOOL_NAME, "version": version, "platforms": {"Posix": checks, "Windows": checks}},
+    )
+
+
+class TestClass(unittest.TestCase):
+    def setUp(self):
+        self.path_tmp = Path(tempfile.mkdtemp(prefix="msl-test-"))
+        self.bin_dir = self.path_tmp / "bin"
+        self.bin_dir.mkdir()
+        os.utime(str(self.bin_dir), ns=(OLD_TIME_NS, OLD_TIME_NS))
+
+        self.cache_path = str(self.path_tmp / "cache" / "tools.json")
+
+        self.environ = mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(str(self.path_tmp))
+
+    def install_tool(self) -> str:
+        executable = self.bin_dir / TOOL_NAME
+        executable.write_text("#!/bin/sh\necho 'msl test tool'\n")
+        executable.chmod(executable.stat().st_mode | stat.S_IXUSR)
+        return str(executable)
+
+    def detect(self, cache: ToolDetectionCache, tool: BaseTool) -> bool:
+        found = tool.detect()
+        cache.store(tool, found)
+        return found
+
+    def test_result_reused(self):
+        self.install_tool()
+        tool = tool_class({"path_checks": [TOOL_NAME]})(str(self.path_tmp))
+
+        cache = ToolDetectionCache(self.cache_path)
+        assert cache.lookup(tool) == None
+        assert self.detect(cache, tool)
+        cache.save()
+
+        # A new process reads the cache file.
+        cache = ToolDetectionCache(self.cache_path)
+        assert cache.lookup(tool) == {"found": True, "tool_path": ""}
+
+    def test_installed_tool_noticed(self):
+        tool = tool_class({"path_checks": [TOOL_NAME]})(str(self.path_tmp))
+
+        cache = ToolDetectionCache(self.cache_path)
+        assert not self.detect(cache, tool)
+        assert cache.lookup(tool) == {"found": False, "tool_path": ""}
+
+        self.install_tool()
+        assert cache.lookup(tool) == None
+
+    def test_changed_executable_noticed(self):
+        executable = self.install_tool()
+        os.utime(executable, ns=(OLD_TIME_NS, OLD_TIME_NS))
+        tool = tool_class(
+            {"command_checks": [{"command": f"{TOOL_NAME} --version", "output_has": "msl test tool"}]}
+        )(str(self.path_tmp))
+
+        cache = ToolDetectionCache(self.cache_path)
+        assert self.detect(cache, tool)
+        assert cache.lookup(tool) != None
+
+        # e.g. the tool was upgraded.
+        os.utime(executable)
+        assert cache.lookup(tool) == None
+
+    def test_file_checks(self):
+        tool_file = self.path_tmp / "opt" / TOOL_NAME
+        tool = tool_class({"file_checks": [str(tool_file)]})(str(self.path_tmp))
+
+        cache = ToolDetectionCache(self.cache_path)
+        assert not self.detect(cache, tool)
+
+        tool_file.parent.mkdir()
+        tool_file.write_text("")
+        assert cache.lookup(tool) == None
+
+        assert self.detect(cache, tool)
+        assert cache.lookup(tool) == {"found": True, "tool_path": str(tool_file.parent)}
+
+    def test_definition_and_path_in_key(self):
+        self.install_tool()
+        tool = tool_class({"path_checks": [TOOL_NAME]})(str(self.path_tmp))
+
+        cache = ToolDetectionCache(self.cache_path)
+        self.detect(cache, tool)
+
+        assert cache.lookup(tool_class({"path_checks": [TOOL_NAME]}, version="2.0")(str(self.path_tmp))) == None
+
+        with mock.patch.dict(os.environ, {"PATH": str(self.path_tmp)}):
+            assert cache.lookup(tool) == None
+
+    def test_mussels_detect_tools(self):
+        self.install_tool()
+        classes = [
+            tool_class({"path_checks": [TOOL_NAME]}),
+            tool_class({"path_checks": ["msl-missing-tool"]}, version="2.0"),
+        ]
+
+        my_mussels = Mussels(data_dir=str(self.path_tmp / "data"))
+        detect = BaseTool.detect
+        with mock.patch.object(BaseTool, "detect", autospec=True, side_effect=detect) as mock_detect:
+            assert my_mussels._detect_tools([cls(str(self.path_tmp)) for cls in classes]) == [True, False]
+            assert mock_detect.call_count == 2
+
+            # Detected again by a later build.
+            my_mussels = Mussels(data_dir=str(self.path_tmp / "data"))
+            assert my_mussels._detect_tools([cls(str(self.path_tmp)) for cls in classes]) == [True, False]
+            assert mock_detect.call_count == 2
+
+        assert os.path.isfile(str(self.path_tmp / "data" / "cache" / "tools.json"))
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,85 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for parsed version strings
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import unittest
+
+import pytest
+
+from mussels.utils.versions import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_parse_version_interned(self):
+        assert parse_version("1.2.3") is parse_version("1.2.3")
+        assert parse_version(parse_version("1.2.3")) is parse_version("1.2.3")
+
+    def test_version_is_a_string(self):
+        version = parse_version("1.0.2g")
+
+        assert version == "1.0.2g"
+        assert {"1.0.2g": True}[version]
+        assert f"openssl-{version}" == "openssl-1.0.2g"
+
+    def test_version_order(self):
+        versions = ["1.10.0", "1.0.2g", "0.102.0", "1.1.1c", "1.9", "0.101.0-beta", "1.0.2"]
+
+        assert sorted(versions, key=parse_version) == [
+            "0.101.0-beta",
+            "0.102.0",
+            "1.0.2",
+            "1.0.2g",
+            "1.1.1c",
+            "1.9",
+            "1.10.0",
+        ]
+        assert sorted(versions, key=parse_version) == sorted(versions, key=version_keys)
+
+        # Versions compare with plain strings, too.
+        assert parse_version("1.10") > "1.9"
+        assert "1.9" < parse_version("1.10")
+
+    def test_version_order_is_total(self):
+        # These have the same parts, but they're different versions.
+        assert parse_version("1.0") != parse_version("01.0")
+        assert parse_version("01.0") < parse_version("1.0")
+        assert not parse_version("1.0") < parse_version("01.0")
+
+    def test_sort_cookbook_by_version(self):
+        sorted_items = sort_cookbook_by_version({"wheeple": {"1.9": None, "1.10": None, "1.0.2g": None}})
+
+        assert sorted_items["wheeple"] == ["1.10", "1.9", "1.0.2g"]
+        assert all(type(version) == Version for version in sorted_items["wheeple"])
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])
@@ -0,0 +1,126 @@
+"""
+Copyright (C) 2019-2020 Cisco Systems, Inc. and/or its affiliates. All rights reserved.
+
+Tests for the memoized version resolver
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import copy
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from mussels.utils.versions import *
+
+
+class TestClass(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.sorted_items = {
+            "wheeple": [
+                {"version": "2.0.0", "cookbooks": {"tectonic": {"Posix": ["host"]}}},
+                {"version": "1.0.1", "cookbooks": {"tectonic": {"Posix": ["host"]}, "scrapbook": {"Posix": ["host"]}}},
+                {"version": "1.0.0", "cookbooks": {"scrapbook": {"Posix": ["x64"]}}},
+            ],
+            "minnow": [
+                {"version": "0.2.0", "cookbooks": {"scrapbook": {"Posix": ["host"]}}},
+                {"version": "0.1.11", "cookbooks": {"scrapbook": {"Posix": ["host"]}}},
+            ],
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_same_as_get_item_version(self):
+        requirements = [
+            ("wheeple<2.0.0", ""),
+            ("wheeple", ""),
+            ("scrapbook:wheeple>=1.0.0", ""),
+            ("wheeple>1.0.0", "host"),
+            ("minnow", "host"),
+            ("scrapbook:minnow@0.1.11", ""),
+        ]
+
+        resolver = VersionResolver(copy.deepcopy(self.sorted_items))
+        pruned_items = copy.deepcopy(self.sorted_items)
+
+        for requirement, target in requirements:
+            assert resolver.resolve(requirement, target) == get_item_version(
+                requirement, pruned_items, target
+            )
+
+        for name in pruned_items:
+            assert resolver.candidates(name) == pruned_items[name]
+
+    def test_sorted_items_not_modified(self):
+        sorted_items = copy.deepcopy(self.sorted_items)
+        resolver = VersionResolver(sorted_items)
+
+        assert resolver.resolve("wheeple==1.0.1") == NVC("wheeple", "1.0.1", "tectonic")
+        assert sorted_items == self.sorted_items
+
+        # The requirement limited the candidates to a single version from a single cookbook.
+        assert resolver.candidates("wheeple") == [
+            {"version": "1.0.1", "cookbooks": {"tectonic": {"Posix": ["host"]}}}
+        ]
+
+        # Applying the state prunes sorted_items, like get_item_version() does.
+        resolver.apply()
+        assert sorted_items["wheeple"] == resolver.candidates("wheeple")
+
+    def test_requirements_whittle_down_candidates(self):
+        resolver = VersionResolver(self.sorted_items)
+
+        assert resolver.resolve("wheeple<2.0.0") == NVC("wheeple", "1.0.1", "tectonic")
+        assert resolver.resolve("wheeple") == NVC("wheeple", "1.0.1", "tectonic")
+
+        # 1.0.0 has no host target, and 2.0.0 was ruled out.
+        with pytest.raises(Exception):
+            resolver.resolve("wheeple>1.0.1", "host")
+
+        # Spaces around the cookbook and the version requirement are allowed.
+        assert resolver.resolve("scrapbook: minnow < 0.1.12") == NVC("minnow", "0.1.11", "scrapbook")
+
+    def test_unknown_item(self):
+        resolver = VersionResolver(self.sorted_items)
+
+        with pytest.raises(Exception):
+            resolver.resolve("sasquatch")
+
+    def test_memoized(self):
+        resolver = VersionResolver(self.sorted_items)
+
+        with mock.patch.object(
+            VersionResolver, "_resolve", autospec=True, side_effect=VersionResolver._resolve
+        ) as resolve:
+            first = resolver.resolve("wheeple>=1.0.0", "host")
+            assert resolve.call_count == 1
+
+            # The same requirement from the same state is looked up, not resolved again.
+            for _ in range(100):
+                assert resolver.resolve("wheeple>=1.0.0", "host") == first
+            assert resolve.call_count == 1
+
+
+if __name__ == "__main__":
+    pytest.main(args=["-v", os.path.abspath(__file__)])